@@ -0,0 +1,72 @@
+"""
+Simulates timers and rate-limited sends on a FakeClock, so millions of events run as fast as the code allows without
+any real sleeping. Run with: python -m benchmarks.clock [event count]
+"""
+import random
+import sys
+import time
+from unittest.mock import patch
+
+from utils.clock import FakeClock
+from utils.send_queue import SendQueue, TokenBucket
+from utils.timing import Timer
+
+
+def bench_timers(count):
+    """
+    Starts count timers spread over an hour, cancels and resets some of them and advances the clock a second at a
+    time until they've all completed.
+    :param count: int - How many timers to start
+    :return: int - How many callbacks ran
+    """
+    clock = FakeClock()
+    completed = []
+    with patch.object(Timer, 'clock', clock), patch.object(Timer, 'heap', []):
+        Timer.stale_entries = 0
+        timers = [Timer(random.uniform(0, 3600), lambda: completed.append(None)) for _ in range(count)]
+        for timer in random.sample(timers, count // 10):
+            timer.cancel()
+        for timer in random.sample(timers, count // 10):
+            timer.set(random.uniform(0, 3600))
+
+        while Timer.next_deadline() is not None:
+            clock.advance(1)
+            Timer.check_timers()
+
+    return len(completed)
+
+
+def bench_send_queue(count, channel_count=1000):
+    """
+    Queues count messages over channel_count channels a few at a time and sends them as the rate limits allow,
+    advancing the clock a tenth of a second at a time.
+    :param count: int - How many messages to queue
+    :param channel_count: int - How many channels they're spread over
+    :return: int - How many messages were sent
+    """
+    clock = FakeClock()
+    send_queue = SendQueue(lambda lane_key: [TokenBucket(20, 30)], clock=clock)
+
+    sent = 0
+    queued = 0
+    while queued < count or len(send_queue):
+        for _ in range(min(100, count - queued)):
+            send_queue.put('PRIVMSG #{} :message {}'.format(random.randrange(channel_count), queued),
+                           'channel{}'.format(queued % channel_count))
+            queued += 1
+        sent += len(send_queue.pop_ready())
+        clock.advance(0.1)
+
+    return sent
+
+
+def run(count):
+    for name, bench in [('timers', bench_timers), ('send queue', bench_send_queue)]:
+        start_time = time.perf_counter()
+        events = bench(count)
+        elapsed = time.perf_counter() - start_time
+        print('{}: {} events in {:.2f}s ({:.0f} events/s)'.format(name, events, elapsed, events / elapsed))
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000)
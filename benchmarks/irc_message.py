@@ -0,0 +1,69 @@
+"""
+Compares parsing chat lines with IRCMessage against the split-based parser it replaced. Run with:
+python -m benchmarks.irc_message [line count]
+"""
+import sys
+import timeit
+
+from utils.irc_message import IRCMessage
+
+
+CHAT_LINE = (
+    '@badges=subscriber/12,premium/1;color=#8A2BE2;display-name=Pleb;emotes=25:0-4;flags=;id=b34ccfc7-4977-403a-'
+    '8a94-33c6bac34fb8;mod=0;room-id=12345678;subscriber=1;tmi-sent-ts=1507246572675;turbo=0;user-id=11111111;'
+    'user-type= :pleb!pleb@pleb.tmi.twitch.tv PRIVMSG #sometwitchuser :Kappa just chatting, not a command')
+COMMAND_LINE = CHAT_LINE.replace(':Kappa just chatting, not a command', ':!quest')
+
+
+def split_parse_tags(raw_tags):
+    """
+    The parser IRCMessage replaced, kept for comparison.
+    """
+    display_name = None
+    is_mod = False
+    is_sub = False
+    for raw_tag in raw_tags.split(';'):
+        raw_tag_split = raw_tag.split('=')
+
+        key = raw_tag_split[0]
+        value = raw_tag_split[1]
+
+        if key == 'display-name':
+            display_name = value
+        elif key == 'mod' and value == '1':
+            is_mod = True
+        elif key == 'subscriber' and value == '1':
+            is_sub = True
+
+    return display_name, is_mod, is_sub
+
+
+def split_parse_msg(raw_msg):
+    raw_msg_tokens = raw_msg.split(maxsplit=4)
+    display_name, is_mod, is_sub = split_parse_tags(raw_msg_tokens[0][1:])
+    return display_name, raw_msg_tokens[3][1:], raw_msg_tokens[4][1:], is_mod, is_sub
+
+
+def message_parse_msg(raw_msg):
+    message = IRCMessage(raw_msg)
+    return message.display_name, message.target[1:], message.trailing, message.is_mod, message.is_sub
+
+
+def message_check_command(raw_msg):
+    # Most chat lines are thrown away once they turn out not to be commands
+    message = IRCMessage(raw_msg)
+    if message.trailing.startswith('!'):
+        return message.display_name, message.is_mod, message.is_sub
+
+
+def run(count):
+    assert split_parse_msg(COMMAND_LINE) == message_parse_msg(COMMAND_LINE)
+
+    for name, parse in [('split parser', split_parse_msg), ('IRCMessage, all fields', message_parse_msg),
+                        ('IRCMessage, command check', message_check_command)]:
+        elapsed = timeit.timeit(lambda: parse(CHAT_LINE), number=count)
+        print('{}: {:.2f} us/line'.format(name, elapsed / count * 1000000))
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 200000)
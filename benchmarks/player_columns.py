@@ -0,0 +1,50 @@
+"""
+Fills a ColumnarQuestPlayerManager with generated players, then times rewarding parties and building leaderboards
+over all of them. Run with: python -m benchmarks.player_columns [player count]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+from unittest.mock import patch
+
+from quest_bot.columnar_player_manager import ColumnarQuestPlayerManager
+from quest_bot.player import Player
+import settings
+
+
+def timed(function, repeat=1):
+    """
+    :param function: Function - What to time
+    :param repeat: int - How many times to run it
+    :return: float - How many seconds each run took on average
+    """
+    start_time = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - start_time) / repeat
+
+
+def run(count, party_size=100):
+    with tempfile.TemporaryDirectory() as temp_dir, \
+            patch.object(settings, 'STORAGE_BACKEND', 'json'), \
+            patch.object(settings, 'PLAYER_DATA_PATH', os.path.join(temp_dir, 'players')), \
+            patch.object(settings, 'PLAYER_JOURNAL_PATH', os.path.join(temp_dir, 'players.journal')):
+        player_manager = ColumnarQuestPlayerManager(None, flush_on_timer=False)
+        for index in range(count):
+            name = 'player{}'.format(index)
+            player_manager.columns.add(name, Player(name, exp=random.randrange(500), gold=random.randrange(10000)))
+
+        party = ['player{}'.format(random.randrange(count)) for _ in range(party_size)]
+        print('reward party of {}: {:.1f}us'.format(party_size, timed(
+            lambda: player_manager.reward(party, gold=10, exp=1, item='Sword'), repeat=100) * 1000000))
+        print('penalize party of {}: {:.1f}us'.format(party_size, timed(
+            lambda: player_manager.penalize(party, gold=5, exp=1, item='Sword'), repeat=100) * 1000000))
+        print('top 10 gold of {}: {:.1f}ms'.format(count, timed(lambda: player_manager.top_gold(10)) * 1000))
+        print('level histogram of {}: {:.1f}ms'.format(count, timed(player_manager.level_histogram) * 1000))
+        player_manager.journal.close()
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000)
@@ -0,0 +1,90 @@
+"""
+Writes the same generated players as a JSON directory and as a binary snapshot, then compares how long each takes to
+write, how much space it uses and how long startup takes to list or load every player.
+Run with: python -m benchmarks.player_snapshot [player count]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+from utils.storage import JSONDirectoryStore, SnapshotStore
+
+ITEM_NAMES = ['Sword', 'Shield', 'Potion', 'Mysterious Amulet', 'Golden Crown', 'Ancient Coin', 'Dragon Scale']
+
+
+def make_players(count):
+    """
+    :param count: int - How many players to make
+    :return: dict<str, dict> - Player data like QuestPlayerManager saves, by lowercase name
+    """
+    players = {}
+    for index in range(count):
+        name = 'player{}'.format(index)
+        players[name] = {
+            'name': name,
+            'exp': random.randrange(100000),
+            'prestige': random.randrange(5),
+            'gold': random.randrange(10000),
+            'items': {item: random.randrange(1, 4) for item in random.sample(ITEM_NAMES, random.randrange(3))}
+        }
+    return players
+
+
+def disk_usage(path):
+    """
+    :param path: str - A file or directory
+    :return: int - How many bytes it takes up on disk, counting the unused end of each block
+    """
+    if os.path.isfile(path):
+        return os.stat(path).st_blocks * 512
+    return sum(os.stat(os.path.join(path, filename)).st_blocks * 512 for filename in os.listdir(path))
+
+
+def timed(function):
+    """
+    :param function: Function - What to time
+    :return: float - How many seconds it took
+    """
+    start_time = time.perf_counter()
+    function()
+    return time.perf_counter() - start_time
+
+
+def run(count):
+    players = make_players(count)
+    with tempfile.TemporaryDirectory() as temp_dir:
+        json_path = os.path.join(temp_dir, 'players')
+        os.makedirs(json_path)
+        snapshot_path = os.path.join(temp_dir, 'players.snapshot')
+
+        def write(store):
+            with store.batch():
+                for name, data in players.items():
+                    store.save(name, data)
+
+        def timed_on_new_store(make_store, function):
+            # Each step opens its own store like a restarted bot would, counted in the time, and closes it afterwards
+            stores = []
+
+            def open_and_run():
+                stores.append(make_store())
+                function(stores[0])
+            try:
+                return timed(open_and_run)
+            finally:
+                for store in stores:
+                    store.close()
+
+        for label, make_store, path in [('json', lambda: JSONDirectoryStore(json_path), json_path),
+                                        ('snapshot', lambda: SnapshotStore(snapshot_path), snapshot_path)]:
+            write_time = timed_on_new_store(make_store, write)
+            names_time = timed_on_new_store(make_store, lambda store: store.names())
+            load_time = timed_on_new_store(make_store, lambda store: list(store.load_all()))
+            print('{}: write {:.2f}s, {:.1f} MB on disk, list names {:.3f}s, load all {:.2f}s'.format(
+                label, write_time, disk_usage(path) / 1024 / 1024, names_time, load_time))
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
@@ -1,5 +1,4 @@
 import settings
-from utils.command_set import CommandSet
 
 
 class Quest:
@@ -7,14 +6,14 @@ class Quest:
         self.quest_manager = quest_manager
 
         self.party = quest_manager.party
-        self.commands = CommandSet()
 
         # Quest segment ordering
         self.starting_segment = None
         self.current_segment = None
 
     def advance(self, next_segment=None):
-        self.commands.clear_children()
+        # The next segment binds its own commands, and nothing can be typed while a segment times out
+        self.quest_manager.commands.unbind()
 
         # Create the next segment of the quest as needed
         if next_segment:
@@ -3,7 +3,8 @@ import random
 from .quest_state import QuestState
 from .quests import QUEST_LIST
 import settings
-from utils.command_set import CommandSet
+from utils.command_set import CommandBinding, CommandSet, EMPTY_COMMAND_SET
+from utils.send_queue import SendPriority
 from utils.timing import Timer
 
 
@@ -11,6 +12,19 @@ class QuestManager:
     """
     Manages the quest currently running in a given channel.
     """
+    # Commands for each state, shared by every quest manager. Handlers take the quest manager before the display name.
+    # Active quests bind the commands of their current segment instead
+    state_commands = {
+        QuestState.ready: CommandSet(exact_match_commands={
+            '!quest': lambda quest_manager, display_name: quest_manager.create_party(display_name)}),
+        QuestState.disabled: CommandSet(exact_match_commands={
+            '!quest': lambda quest_manager, display_name: quest_manager.disabled_message(display_name)}),
+        QuestState.on_cooldown: CommandSet(exact_match_commands={
+            '!quest': lambda quest_manager, display_name: quest_manager.recharging_message(display_name)}),
+        QuestState.forming_party: CommandSet(exact_match_commands={
+            '!quest': lambda quest_manager, display_name: quest_manager.join_quest(display_name)})
+    }
+
     def __init__(self, channel):
         self.channel = channel
         self.channel_settings = self.channel.channel_manager.channel_settings[self.channel.owner]
@@ -19,7 +33,7 @@ class QuestManager:
         self.party = []
         self.quest_timer = None
         self.quest_state = QuestState.ready
-        self.commands = CommandSet()
+        self.commands = CommandBinding()
 
         # Channel is guaranteed to be initialized at this point
         if self.channel_settings['quest_enabled']:
@@ -27,6 +41,14 @@ class QuestManager:
         else:
             self.disable_questing()
 
+    def set_quest_state(self, quest_state):
+        """
+        Moves to another state and switches to that state's shared commands.
+        :param quest_state: QuestState - The new state
+        """
+        self.quest_state = quest_state
+        self.commands.bind(self.state_commands.get(quest_state, EMPTY_COMMAND_SET), self)
+
     def start_quest_advance_timer(self, duration=settings.QUEST_DURATION):
         """
         Starts a timer until the quest advances.
@@ -49,9 +71,7 @@ class QuestManager:
         Enables quest party formation.
         """
         self.kill_quest_advance_timer()
-        self.quest_state = QuestState.ready
-        self.commands = CommandSet(exact_match_commands={
-            '!quest': self.create_party})
+        self.set_quest_state(QuestState.ready)
 
     def disable_questing(self):
         """
@@ -60,17 +80,13 @@ class QuestManager:
         """
         self.kill_quest_advance_timer()
 
-        self.quest_state = QuestState.disabled
-        self.commands = CommandSet(exact_match_commands={
-            '!quest': self.disabled_message})
+        self.set_quest_state(QuestState.disabled)
 
     def quest_cooldown(self):
         """
         Puts quest mode on cooldown.
         """
-        self.quest_state = QuestState.on_cooldown
-        self.commands = CommandSet(exact_match_commands={
-            '!quest': self.recharging_message})
+        self.set_quest_state(QuestState.on_cooldown)
         self.start_quest_advance_timer(self.channel_settings['quest_cooldown'])
 
     def quest_advance(self):
@@ -89,9 +105,8 @@ class QuestManager:
         Starts a random quest depending on the number of party members.
         :param quest: Quest - The quest that we are preparing
         """
-        self.quest_state = QuestState.active
+        self.set_quest_state(QuestState.active)
         self.quest = quest
-        self.commands = CommandSet(children={self.quest.commands})
         self.quest.advance(self.quest.starting_segment)
 
     def disabled_message(self, display_name):
@@ -100,26 +115,27 @@ class QuestManager:
         :param display_name: str - The user that requested quest mode.
         """
         self.channel.send_msg(
-            'Sorry {}, questing is currently disabled. Ask a mod to type !queston to re-enable questing.'.format(
-                display_name))
+            'Sorry {}, questing is currently disabled. Ask a mod to type !queston to re-enable questing.',
+            SendPriority.info, coalesce_key='disabled', coalesce_name=display_name)
 
     def recharging_message(self, display_name):
         """
         Tells users that !quest is currently on cooldown.
         :param display_name: str - The user that requested quest mode.
         """
-        self.channel.send_msg('Sorry {}, quests take {} seconds to recharge. ({} seconds remaining.)'.format(
-            display_name, self.channel_settings['quest_cooldown'], self.quest_timer.remaining()))
+        # Leave the name slot in the template so repeats can be merged into one message
+        self.channel.send_msg(
+            'Sorry {}, quests take {} seconds to recharge. ({} seconds remaining.)'.format(
+                '{}', self.channel_settings['quest_cooldown'], self.quest_timer.remaining()),
+            SendPriority.info, coalesce_key='recharging', coalesce_name=display_name)
 
     def create_party(self, display_name):
         """
         Creates a party with the given player as the leader.
         :param display_name: str - The user that started the quest.
         """
-        self.quest_state = QuestState.forming_party
+        self.set_quest_state(QuestState.forming_party)
         self.party = [display_name]
-        self.commands = CommandSet(exact_match_commands={
-            '!quest': self.join_quest})
 
         self.channel.send_msg(display_name + ' wants to attempt a quest. Type "!quest" to join!')
 
@@ -1,9 +1,13 @@
 from random import choice, random, sample
 
-from utils.command_set import CommandSet
+from utils.command_set import EMPTY_COMMAND_SET
 
 
 class QuestSegment:
+    # Commands available to players in this segment, shared by every instance of the segment. Handlers take the
+    # segment before the display name
+    commands = EMPTY_COMMAND_SET
+
     def __init__(self, quest):
         self.quest = quest
         self.quest_manager = self.quest.quest_manager
@@ -12,16 +16,14 @@ class QuestSegment:
         self.bot = self.channel_manager.bot
         self.player_manager = self.bot.player_manager
 
-        self.commands = None
-
         self.set_commands()
         self.__update_commands()
 
     def set_commands(self):
         """
-        Sets the commands available to players when they reach this quest segment. By default, nothing. Override this!
+        Picks the commands available to players when they reach this quest segment. By default, the shared commands
+        of the segment class. Override this only for commands that depend on the quest!
         """
-        self.commands = CommandSet()
 
     def play(self):
         """
@@ -37,9 +39,9 @@ class QuestSegment:
 
     def __update_commands(self):
         """
-        Adds our command set as a child of the quest's command set.
+        Binds our command set to the quest manager, with this segment as the owner of its handlers.
         """
-        self.quest.commands.add_command_set(self.commands)
+        self.quest_manager.commands.bind(self.commands, self)
 
     def advance(self, next_segment):
         """
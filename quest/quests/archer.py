@@ -25,11 +25,10 @@ class Archer(Quest):
 
 
 class Start(QuestSegment):
-    def set_commands(self):
-        self.commands = CommandSet(exact_match_commands={
-            '!left': lambda display_name: self.move(display_name, 'left'),
-            '!right': lambda display_name: self.move(display_name, 'right')
-        })
+    commands = CommandSet(exact_match_commands={
+        '!left': lambda segment, display_name: segment.move(display_name, 'left'),
+        '!right': lambda segment, display_name: segment.move(display_name, 'right')
+    })
 
     def play(self):
         msg = ('{} and {} are pinned down by a Noxian archer! '
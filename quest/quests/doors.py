@@ -19,11 +19,10 @@ class Doors(Quest):
 
 
 class Start(QuestSegment):
-    def set_commands(self):
-        self.commands = CommandSet(exact_match_commands={
-            '!left': self.enter,
-            '!right': self.enter
-        })
+    commands = CommandSet(exact_match_commands={
+        '!left': lambda segment, display_name: segment.enter(display_name),
+        '!right': lambda segment, display_name: segment.enter(display_name)
+    })
 
     def play(self):
         msg = ('While running from a massive frost troll, {} finds two doors. '
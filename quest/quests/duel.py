@@ -9,6 +9,7 @@ GOLD_REWARD = 300
 GOLD_VARIANCE = 27
 EXP_REWARD = 3
 EXP_PACIFIST_REWARD = 5
+DUEL_WORDS = ['!attack', '!fight', '!strike', '!charge']
 
 
 class Duel(Quest):
@@ -18,14 +19,20 @@ class Duel(Quest):
         self.starting_segment = Start
 
         # Randomize the duel word so you can't macro it
-        self.duel_word = choice(['!attack', '!fight', '!strike', '!charge'])
+        self.duel_word = choice(DUEL_WORDS)
 
 
 class Start(QuestSegment):
-    def set_commands(self):
-        self.commands = CommandSet(exact_match_commands={
-            self.quest.duel_word: self.attack
+    # One shared command set per duel word
+    duel_commands = {
+        duel_word: CommandSet(exact_match_commands={
+            duel_word: lambda segment, display_name: segment.attack(display_name)
         })
+        for duel_word in DUEL_WORDS
+    }
+
+    def set_commands(self):
+        self.commands = self.duel_commands[self.quest.duel_word]
 
     def play(self):
         msg = (
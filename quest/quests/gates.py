@@ -25,13 +25,12 @@ class Gates(Quest):
 
 
 class Start(QuestSegment):
-    def set_commands(self):
-        self.commands = CommandSet(exact_match_commands={
-            '!north': lambda display_name: self.guard(display_name, 'north'),
-            '!south': lambda display_name: self.guard(display_name, 'south'),
-            '!east': lambda display_name: self.guard(display_name, 'east'),
-            '!west': lambda display_name: self.guard(display_name, 'west')
-        })
+    commands = CommandSet(exact_match_commands={
+        '!north': lambda segment, display_name: segment.guard(display_name, 'north'),
+        '!south': lambda segment, display_name: segment.guard(display_name, 'south'),
+        '!east': lambda segment, display_name: segment.guard(display_name, 'east'),
+        '!west': lambda segment, display_name: segment.guard(display_name, 'west')
+    })
 
     def play(self):
         msg = (
@@ -28,11 +28,10 @@ class Monster(Quest):
 
 
 class Start(QuestSegment):
-    def set_commands(self):
-        self.commands = CommandSet(exact_match_commands={
-            '!attack': self.attack,
-            '!flee': self.flee
-        })
+    commands = CommandSet(exact_match_commands={
+        '!attack': lambda segment, display_name: segment.attack(display_name),
+        '!flee': lambda segment, display_name: segment.flee(display_name)
+    })
 
     def play(self):
         msg = (
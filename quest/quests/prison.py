@@ -23,12 +23,13 @@ class Prison(Quest):
 
 class Start(QuestSegment):
     def set_commands(self):
+        # The commands are the names of the party, so they can't be shared
         commands = {}
         for party_member in self.quest.party[1:]:
             # Due to party_member changing every iteration, we have to copy the value of party_member
             # to something else, or the same reference will be used for every iteration
             commands['!{}'.format(party_member.lower())] = (
-                lambda display_name, target=party_member: self.pick(display_name, target))
+                lambda segment, display_name, target=party_member: segment.pick(display_name, target))
         self.commands = CommandSet(exact_match_commands=commands)
 
     def play(self):
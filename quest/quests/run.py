@@ -22,6 +22,7 @@ DROP_ITEM = 'Massive Fang'
 MONSTER_NAME = 'Vilemaw'
 MONSTER_LEVEL = settings.LEVEL_CAP * 3
 LEVEL_VARIANCE = settings.LEVEL_CAP / 2
+ESCAPE_WORDS = ['!run', '!flee', '!hide', '!escape', '!stealth']
 
 
 class Run(Quest):
@@ -31,7 +32,7 @@ class Run(Quest):
         self.starting_segment = Start
 
         # Randomize the escape word so it can't be copy-pasted
-        self.escape_word = choice(['!run', '!flee', '!hide', '!escape', '!stealth'])
+        self.escape_word = choice(ESCAPE_WORDS)
         # People that have already escaped
         self.escaped = []
 
@@ -40,10 +41,16 @@ class Run(Quest):
 
 
 class Start(QuestSegment):
-    def set_commands(self):
-        self.commands = CommandSet(exact_match_commands={
-            self.quest.escape_word: self.escape
+    # One shared command set per escape word
+    escape_commands = {
+        escape_word: CommandSet(exact_match_commands={
+            escape_word: lambda segment, display_name: segment.escape(display_name)
         })
+        for escape_word in ESCAPE_WORDS
+    }
+
+    def set_commands(self):
+        self.commands = self.escape_commands[self.quest.escape_word]
 
     def play(self):
         msg = '{0} are all running away from a rampaging {1}! Quick, type {2} to get away!'.format(
@@ -85,12 +92,11 @@ class Start(QuestSegment):
 
 
 class BossBattle(QuestSegment):
-    def set_commands(self):
-        self.commands = CommandSet(exact_match_commands={
-            '!front': lambda display_name: self.attack(display_name, 'front'),
-            '!left': lambda display_name: self.attack(display_name, 'left'),
-            '!right': lambda display_name: self.attack(display_name, 'right')
-        })
+    commands = CommandSet(exact_match_commands={
+        '!front': lambda segment, display_name: segment.attack(display_name, 'front'),
+        '!left': lambda segment, display_name: segment.attack(display_name, 'left'),
+        '!right': lambda segment, display_name: segment.attack(display_name, 'right')
+    })
 
     def play(self):
         self.channel.send_msg(
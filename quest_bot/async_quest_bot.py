@@ -0,0 +1,9 @@
+from .quest_bot import QuestBot
+from twitch.async_twitch_bot import AsyncTwitchBot
+
+
+class AsyncQuestBot(QuestBot, AsyncTwitchBot):
+    """
+    Quest bot that runs on an asyncio event loop. Command handling is identical to QuestBot.
+    """
+    pass
@@ -0,0 +1,238 @@
+from array import array
+from bisect import bisect_right
+from collections import Counter
+from functools import partial
+import heapq
+
+from .player import Player, PlayerData
+from .quest_player_manager import QuestPlayerManager
+import settings
+
+
+def number(value):
+    """
+    :param value: int or float - A value read from a column
+    :return: int or float - The value, as an int if it's a whole number, so it's shown and stored as it was before
+    """
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def column_property(column):
+    """
+    :param column: str - The PlayerColumns attribute the field is kept in
+    :return: property - A field of a PlayerRow that reads and writes its row of the column
+    """
+    def get_value(self):
+        return number(getattr(self.columns, column)[self.row])
+
+    def set_value(self, value):
+        getattr(self.columns, column)[self.row] = value
+
+    return property(get_value, set_value)
+
+
+class PlayerColumns:
+    """
+    The data of every player, a row per player and a column per field. Numbers are kept in arrays instead of objects,
+    so a column can be updated or scanned for many players in one tight loop.
+    """
+    def __init__(self):
+        # dict<str, int> - The row of each player, by lowercase name
+        self.rows = {}
+        self.names = []
+        self.exp = array('d')
+        self.prestige = array('q')
+        self.gold = array('d')
+        # The items of each player, NO_ITEMS for most of them
+        self.items = []
+
+    def __len__(self):
+        return len(self.names)
+
+    def add(self, username, player):
+        """
+        Adds a row for a player. Rows are never removed.
+        :param username: str - The lowercase name of the player
+        :param player: PlayerData - The player's data
+        :return: int - The new row
+        """
+        row = len(self.names)
+        self.rows[username] = row
+        self.names.append(player.name)
+        self.exp.append(player.exp)
+        self.prestige.append(player.prestige)
+        self.gold.append(player.gold)
+        self.items.append(player.items)
+        return row
+
+
+class PlayerRow(PlayerData):
+    """
+    A single player's row of PlayerColumns, used like a Player.
+    """
+    __slots__ = ('columns', 'row')
+
+    name = column_property('names')
+    exp = column_property('exp')
+    prestige = column_property('prestige')
+    gold = column_property('gold')
+    items = column_property('items')
+
+    def __init__(self, columns, row):
+        """
+        :param columns: PlayerColumns - Where the player's data is kept
+        :param row: int - The player's row
+        """
+        self.columns = columns
+        self.row = row
+
+
+class ColumnarQuestPlayerManager(QuestPlayerManager):
+    """
+    A QuestPlayerManager that keeps every player in PlayerColumns. Every stored player is read at startup so
+    leaderboards cover everyone. Rewards and penalties for a list of players update each column in one pass over
+    their rows, instead of running every raw store action once per player.
+    """
+    def __init__(self, bot, flush_on_timer=True):
+        """
+        :param bot: TwitchBot - The bot the players are in, or None if it isn't tied to one
+        :param flush_on_timer: bool - Whether changes are journaled by a timer on the bot's update loop. If False,
+                                      whoever owns this has to call flush itself
+        """
+        self.columns = PlayerColumns()
+
+        super().__init__(bot, flush_on_timer=flush_on_timer)
+
+    def load_player_data(self):
+        """
+        Reads every player in persistent storage into the columns, then replays any changes that were made after they
+        were stored.
+        """
+        self.unloaded_players = {}
+        for data in self.store.load_all():
+            if not data.get('name'):
+                continue
+            username = data['name'].lower()
+            if username not in self.columns.rows:
+                self.columns.add(username, Player.from_data(username, data))
+
+        self.replay_journal()
+
+    def create_player(self, username, stored_data):
+        """
+        Gets the row of a player the first time they're used, adding one for a new player.
+        :param username: str - The lowercase name of the player
+        :param stored_data: dict - The stored player data, or None if the player was never stored
+        :return: PlayerRow - The player
+        """
+        row = self.columns.rows.get(username)
+        if row is None:
+            row = self.columns.add(username, Player.from_data(username, stored_data))
+        return PlayerRow(self.columns, row)
+
+    def add_gold_rows(self, rows, gold, prestige_benefits):
+        """
+        Gives gold to the players in some rows, the same way add_gold does.
+        :param rows: list<int> - The rows of the players you are modifying
+        :param gold: float - How much gold to give each player
+        :param prestige_benefits: bool - Whether this gold increase is affected by prestige bonuses
+        """
+        gold_column = self.columns.gold
+        prestige_column = self.columns.prestige
+        # Don't magnify negative amounts of gold
+        amplify = prestige_benefits and gold > 0
+        for row in rows:
+            value = gold_column[row] + (gold * (1 + prestige_column[row] * settings.PRESTIGE_GOLD_AMP) if amplify
+                                        else gold)
+            gold_column[row] = value if value > 0 else 0
+
+        names = self.columns.names
+        self.pending_events.extend(['gold', names[row].lower(), number(gold_column[row])] for row in rows)
+
+    def add_exp_rows(self, rows, exp):
+        """
+        Gives exp to the players in some rows.
+        :param rows: list<int> - The rows of the players you are modifying
+        :param exp: float - How much exp to give each player
+        """
+        exp_column = self.columns.exp
+        for row in rows:
+            exp_column[row] += exp
+
+        names = self.columns.names
+        self.pending_events.extend(['exp', names[row].lower(), number(exp_column[row])] for row in rows)
+
+    def change_items(self, players, item, change):
+        """
+        Gives or takes items from players. Players never end up with less than none of an item.
+        :param players: list<PlayerRow> - The players you are modifying
+        :param item: str or list<str> - The name of the item(s)
+        :param change: int - 1 to give each item, -1 to take it
+        """
+        items = [item] if isinstance(item, str) else item
+        for player in players:
+            for single_item in items:
+                # If we don't have the item, do nothing
+                if change < 0 and single_item not in player.items:
+                    continue
+                player.set_item(single_item, player.items.get(single_item, 0) + change)
+                self.record_event('item', player.name, single_item, player.items.get(single_item, 0))
+
+    def reward(self, username, gold=0, exp=0, item=None, prestige_benefits=True):
+        """
+        Gives gold and exp to the specified player(s).
+        :param username: str or list<str> - The player(s) who you are modifying
+        :param gold: float - How much gold to give that player
+        :param exp: float - How much exp to give that player
+        """
+        if isinstance(username, str):
+            super().reward(username, gold=gold, exp=exp, item=item, prestige_benefits=prestige_benefits)
+            return
+
+        players = [self.players[user] for user in username]
+        rows = [player.row for player in players]
+        self.add_gold_rows(rows, gold, prestige_benefits)
+        self.add_exp_rows(rows, exp)
+        if item:
+            self.change_items(players, item, 1)
+        self.save_players([player.name for player in players])
+
+    def penalize(self, username, gold=0, exp=0, item=None, prestige_benefits=True):
+        """
+        Takes gold and exp from the specified player(s).
+        :param username: str or list<str> - The player(s) who you are modifying
+        :param gold: float - How much gold to take from that player
+        :param exp: float - How much exp to take from that player
+        """
+        if isinstance(username, str):
+            super().penalize(username, gold=gold, exp=exp, item=item, prestige_benefits=prestige_benefits)
+            return
+
+        players = [self.players[user] for user in username]
+        rows = [player.row for player in players]
+        self.add_gold_rows(rows, -gold, prestige_benefits)
+        self.add_exp_rows(rows, -exp)
+        if item:
+            self.change_items(players, item, -1)
+        self.save_players([player.name for player in players])
+
+    def top_gold(self, count):
+        """
+        Finds the players with the most gold.
+        :param count: int - How many players to find
+        :return: list<tuple<str, float>> - The name and gold of each player, most gold first
+        """
+        gold = self.columns.gold
+        rows = heapq.nlargest(count, range(len(gold)), key=gold.__getitem__)
+        return [(self.columns.names[row], number(gold[row])) for row in rows]
+
+    def level_histogram(self):
+        """
+        Counts the players at each level.
+        :return: Counter<int, int> - How many players there are, by level
+        """
+        # The same as exp_to_level, with a binary search instead of a scan. Level is one less than the position found
+        positions = Counter(map(partial(bisect_right, settings.EXP_LEVELS), self.columns.exp))
+        return Counter({position - 1: count for position, count in positions.items()})
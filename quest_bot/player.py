@@ -0,0 +1,138 @@
+from sys import intern
+
+
+class NoItems(dict):
+    """
+    The items of every player who has none. Shared, so players without items don't each carry an empty dict, and
+    read-only so it can't be filled by accident.
+    """
+    __slots__ = ()
+
+    def __setitem__(self, key, value):
+        raise TypeError('Players without items share NO_ITEMS, use Player.set_item instead')
+
+    def setdefault(self, key, default=None):
+        raise TypeError('Players without items share NO_ITEMS, use Player.set_item instead')
+
+    def update(self, *args, **kwargs):
+        raise TypeError('Players without items share NO_ITEMS, use Player.set_item instead')
+
+    def __reduce__(self):
+        # Copies and pickles sent between processes come back as the shared instance
+        return 'NO_ITEMS'
+
+
+NO_ITEMS = NoItems()
+
+
+class PlayerData:
+    """
+    What every kind of player record has in common: its fields, how it changes items and how it's stored. Can still
+    be read and written like the dict it replaces, like player['gold'], for code that hasn't moved to the attributes.
+    """
+    __slots__ = ()
+    # Every key of the stored data, in the order it's written
+    fields = ('name', 'exp', 'prestige', 'gold', 'items')
+
+    def to_data(self):
+        """
+        :return: dict - A copy of the player's data to store, sharing nothing with the player
+        """
+        return {
+            'name': self.name,
+            'exp': self.exp,
+            'prestige': self.prestige,
+            'gold': self.gold,
+            'items': dict(self.items)
+        }
+
+    def set_item(self, item, quantity):
+        """
+        Sets how many of an item the player has, removing it at 0 or less.
+        :param item: str - The name of the item
+        :param quantity: int - How many of the item the player has now
+        """
+        if quantity > 0:
+            if self.items is NO_ITEMS:
+                self.items = {}
+            # Item names come from a short list of quests, so every player with an item can share its name
+            self.items[intern(item)] = quantity
+        elif item in self.items:
+            del self.items[item]
+            if not self.items:
+                self.items = NO_ITEMS
+
+    def __getitem__(self, key):
+        if key not in self.fields:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __setitem__(self, key, value):
+        if key not in self.fields:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def __contains__(self, key):
+        return key in self.fields
+
+    def __iter__(self):
+        return iter(self.fields)
+
+    def keys(self):
+        return list(self.fields)
+
+    def get(self, key, default=None):
+        return getattr(self, key) if key in self.fields else default
+
+    def __eq__(self, other):
+        if isinstance(other, PlayerData):
+            other = other.to_data()
+        if isinstance(other, dict):
+            return self.to_data() == other
+        return NotImplemented
+
+    # Players are changed in place, so they can't be hashed
+    __hash__ = None
+
+    def __repr__(self):
+        return '{}({!r})'.format(type(self).__name__, self.to_data())
+
+
+class Player(PlayerData):
+    """
+    A player's quest data. Much smaller than a dict per player, and players without items share NO_ITEMS.
+    """
+    __slots__ = PlayerData.fields
+
+    def __init__(self, name, exp=0, prestige=0, gold=0, items=NO_ITEMS):
+        """
+        :param name: str - The player's name
+        :param exp: float - How much exp the player has
+        :param prestige: int - How many times the player has prestiged
+        :param gold: float - How much gold the player has
+        :param items: dict<str, int> - How many of each item the player has, or NO_ITEMS
+        """
+        self.name = name
+        self.exp = exp
+        self.prestige = prestige
+        self.gold = gold
+        self.items = items
+
+    @classmethod
+    def from_data(cls, name, data):
+        """
+        Makes a player from stored data. Keys that aren't player fields are ignored.
+        :param name: str - The player's name, unless the stored data has one
+        :param data: dict - The stored player data, or None for a new player
+        :return: Player - The player
+        """
+        player = cls(name)
+        if data is None:
+            return player
+
+        for key in ('name', 'exp', 'prestige', 'gold'):
+            if key in data:
+                setattr(player, key, data[key])
+        for item, quantity in (data.get('items') or {}).items():
+            player.set_item(item, quantity)
+        return player
@@ -0,0 +1,80 @@
+from multiprocessing import util
+from multiprocessing.managers import BaseManager
+import threading
+import time
+
+from .columnar_player_manager import ColumnarQuestPlayerManager
+from .quest_player_manager import QuestPlayerManager
+import settings
+
+
+# Only ever created in the player state process
+shared_player_manager = None
+
+
+def get_player_manager():
+    """
+    Gets the one player manager that every worker process shares, loading it the first time it's needed.
+    :return: LockedPlayerManager - The player manager
+    """
+    global shared_player_manager
+    if shared_player_manager is None:
+        # Whispers are sent by the workers, so the shared player manager has no bot of its own. Nothing runs timers
+        # in this process, so changed players are written by a thread instead, and once more when the process exits
+        player_manager_type = ColumnarQuestPlayerManager if settings.COLUMNAR_PLAYERS else QuestPlayerManager
+        shared_player_manager = LockedPlayerManager(player_manager_type(None, flush_on_timer=False))
+        threading.Thread(target=flush_loop, args=(shared_player_manager,), name='player-flush', daemon=True).start()
+        util.Finalize(shared_player_manager, shared_player_manager.flush, exitpriority=10)
+    return shared_player_manager
+
+
+class LockedPlayerManager:
+    """
+    The shared player manager as it's served to the workers. Every worker connection is served on its own thread and
+    the flush thread runs beside them, so every call holds the same lock, and changes to a player or the journal can't
+    interleave and get lost.
+    """
+    def __init__(self, player_manager):
+        """
+        :param player_manager: QuestPlayerManager - The player manager to share
+        """
+        self.player_manager = player_manager
+        self.lock = threading.RLock()
+
+    def __dir__(self):
+        # The methods the workers' proxies expose are found through dir. Only public ones are served
+        return [name for name in dir(self.player_manager) if not name.startswith('_')]
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+
+        attribute = getattr(self.player_manager, name)
+        if not callable(attribute):
+            return attribute
+
+        def locked_call(*args, **kwargs):
+            with self.lock:
+                return attribute(*args, **kwargs)
+        return locked_call
+
+
+def flush_loop(player_manager):
+    """
+    Writes changed players every PLAYER_SAVE_DELAY seconds, forever.
+    :param player_manager: LockedPlayerManager - The player manager to flush
+    """
+    while True:
+        time.sleep(settings.PLAYER_SAVE_DELAY)
+        player_manager.flush()
+
+
+class PlayerStateManager(BaseManager):
+    """
+    Runs the single owner of all player data in its own process. Worker processes connect to it over a local socket
+    and call the player manager through a proxy, so every change to a player happens in one place.
+    """
+    pass
+
+
+PlayerStateManager.register('player_manager', callable=get_player_manager)
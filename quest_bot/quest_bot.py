@@ -1,15 +1,19 @@
+from .columnar_player_manager import ColumnarQuestPlayerManager
 from .quest_channel_manager import QuestChannelManager
 from .quest_player_manager import QuestPlayerManager
 import settings
 from twitch.twitch_bot import TwitchBot
 from utils.command_set import CommandSet
 from utils.logger import log
+from utils.send_queue import SendPriority
 
 
 class QuestBot(TwitchBot):
     """
     Bot with commands for quest mode.
     """
+    channel_manager_type = QuestChannelManager
+
     def __init__(self, bot_name, owner_name, oauth):
         """
         :param bot_name: str - The bot's username
@@ -20,10 +24,10 @@ class QuestBot(TwitchBot):
 
     def initialize(self):
         log('Initializing channel manager...')
-        self.channel_manager = QuestChannelManager(self)
+        self.channel_manager = self.channel_manager_type(self)
 
         log('Initializing player manager...')
-        self.player_manager = QuestPlayerManager(self)
+        self.player_manager = self.create_player_manager()
 
         # Commands for direct whispers to the bot
         self.whisper_commands = CommandSet(exact_match_commands={
@@ -36,17 +40,26 @@ class QuestBot(TwitchBot):
             '!prestige': self.try_prestige
         })
 
+    def create_player_manager(self):
+        """
+        :return: QuestPlayerManager - The player manager that keeps every player's quest stats
+        """
+        if settings.COLUMNAR_PLAYERS:
+            return ColumnarQuestPlayerManager(self)
+        return QuestPlayerManager(self)
+
     def faq_whisper(self, display_name):
         if not display_name:
             return
         self.send_whisper(
             display_name, 'Information and an FAQ on Xelabot can be found at: ' +
-            'https://github.com/xelaadryth/Xelabot/blob/master/faq.txt')
+            'https://github.com/xelaadryth/Xelabot/blob/master/faq.txt', SendPriority.info)
 
     def stats_whisper(self, display_name):
         if not display_name:
             return
-        self.player_manager.whisper_stats(display_name)
+        # The player manager may live in another process, so only the message is built there
+        self.send_whisper(display_name, self.player_manager.stats_msg(display_name))
 
     def try_prestige(self, display_name):
         if not display_name:
@@ -3,6 +3,7 @@ from copy import deepcopy
 from quest.quest_manager import QuestManager
 import settings
 from twitch.channel import Channel
+from utils.send_queue import SendPriority
 
 
 class QuestChannel(Channel):
@@ -30,17 +31,18 @@ class QuestChannel(Channel):
             self.channel_manager.set_quest_cooldown(self.owner, int(cooldown))
         except (IndexError, ValueError):
             self.channel_manager.bot.send_whisper(
-                display_name, 'Invalid usage! Sample usage: !questcooldown 90')
+                display_name, 'Invalid usage! Sample usage: !questcooldown 90', SendPriority.info)
 
-    def check_commands(self, display_name, msg, is_mod, is_sub):
+    def dispatch_commands(self, display_name, command, params, is_mod, is_sub):
         """
-        Connect to other command lists whose requirements are met.
+        Run the handlers of every command list whose requirements are met.
         :param display_name: str - The display name of the command sender
-        :param msg: str - The full message that the user sent that starts with "!"
-        :param is_mod: bool - Whether the sender is a mod
-        :param is_sub: bool - Whether the sender is a sub
+        :param command: str - The lowercase command word, starting with "!"
+        :param params: str - The rest of the message
+        :param is_mod: bool - Whether the sender is a mod or the channel owner
+        :param is_sub: bool - Whether the sender is a sub or the channel owner
         """
-        super().check_commands(display_name, msg, is_mod, is_sub)
+        super().dispatch_commands(display_name, command, params, is_mod, is_sub)
 
         # Check quest commands
-        self.quest_manager.commands.execute_command(display_name, msg)
+        self.quest_manager.commands.dispatch(display_name, command, params)
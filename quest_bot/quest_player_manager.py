@@ -1,7 +1,11 @@
-from copy import deepcopy
+import threading
 
+from .player import Player
 import settings
 from twitch.player_manager import PlayerManager
+from utils.journal import Journal
+from utils.logger import log_error
+from utils.timing import Timer
 
 
 class QuestPlayerManager(PlayerManager):
@@ -10,6 +14,7 @@ class QuestPlayerManager(PlayerManager):
     Properties of raw store actions:
         - Call username.lower()
         - Touch self.players with that name
+        - Record the values they set as events for the journal
         - Do not save to file
 
     Properties of store actions:
@@ -26,13 +31,19 @@ class QuestPlayerManager(PlayerManager):
 
     Note that both store actions and raw store actions qualify for this.
     """
-    default_player = deepcopy(PlayerManager.default_player)
-    default_player.update({
-        'exp': 0,
-        'prestige': 0,
-        'gold': 0,
-        'items': {}
-    })
+    def __init__(self, bot, flush_on_timer=True):
+        """
+        :param bot: TwitchBot - The bot the players are in, or None if it isn't tied to one
+        :param flush_on_timer: bool - Whether changes are journaled by a timer on the bot's update loop. If False,
+                                      whoever owns this has to call flush itself
+        """
+        # Changes go to the journal every flush, and players only go to persistent storage when it's compacted.
+        # Events hold the values that were set rather than the change, so replaying one twice is harmless
+        self.journal = Journal(settings.PLAYER_JOURNAL_PATH)
+        self.pending_events = []
+        self.snapshot_thread = None
+
+        super().__init__(bot, flush_on_timer=flush_on_timer)
 
     def __add_gold(self, username, gold, prestige_benefits=True):
         """
@@ -41,13 +52,13 @@ class QuestPlayerManager(PlayerManager):
         :param gold: float - How much gold to give that player
         :param prestige_benefits: bool - Whether this gold increase is affected by prestige bonuses
         """
+        player = self.players[username]
         # Don't magnify negative amounts of gold
         if prestige_benefits and gold > 0:
-            gold *= 1 + self.players[username]['prestige'] * settings.PRESTIGE_GOLD_AMP
+            gold *= 1 + player.prestige * settings.PRESTIGE_GOLD_AMP
 
-        self.players[username]['gold'] += gold
-        if self.players[username]['gold'] < 0:
-            self.players[username]['gold'] = 0
+        player.gold = max(player.gold + gold, 0)
+        self.record_event('gold', username, player.gold)
 
     def add_gold(self, username, gold, prestige_benefits=True):
         """
@@ -65,7 +76,9 @@ class QuestPlayerManager(PlayerManager):
         :param username: str - The player who you are modifying
         :param exp: float - How much exp to give that player
         """
-        self.players[username]['exp'] += exp
+        player = self.players[username]
+        player.exp += exp
+        self.record_event('exp', username, player.exp)
 
     def add_exp(self, username, exp):
         """
@@ -87,10 +100,9 @@ class QuestPlayerManager(PlayerManager):
             for single_item in item:
                 self.__add_item(username, single_item)
         else:
-            if item not in self.players[username]['items']:
-                self.players[username]['items'][item] = 1
-            else:
-                self.players[username]['items'][item] += 1
+            player = self.players[username]
+            player.set_item(item, player.items.get(item, 0) + 1)
+            self.record_event('item', username, item, player.items[item])
 
     def add_item(self, username, item):
         """
@@ -112,12 +124,11 @@ class QuestPlayerManager(PlayerManager):
             for single_item in item:
                 self.__remove_item(username, single_item)
         else:
+            player = self.players[username]
             # If we don't have the item, do nothing
-            if item in self.players[username]['items']:
-                self.players[username]['items'][item] -= 1
-
-                if self.players[username]['items'][item] <= 0:
-                    del self.players[username]['items'][item]
+            if item in player.items:
+                player.set_item(item, player.items[item] - 1)
+                self.record_event('item', username, item, player.items.get(item, 0))
 
     def remove_item(self, username, item):
         """
@@ -196,14 +207,14 @@ class QuestPlayerManager(PlayerManager):
         Gets how much gold a given player has.
         :param username: str - The player who you are modifying
         """
-        return self.players[username]['gold']
+        return self.players[username].gold
 
     def get_exp(self, username):
         """
         Gets how much exp a given player has.
         :param username: str - The player who you are modifying
         """
-        return self.players[username]['exp']
+        return self.players[username].exp
 
     @staticmethod
     def exp_to_level(exp):
@@ -218,23 +229,21 @@ class QuestPlayerManager(PlayerManager):
         Gets what level a given player is.
         :param username: str - The player who you are modifying
         """
-        exp = self.players[username]['exp']
-
-        return self.exp_to_level(exp)
+        return self.exp_to_level(self.players[username].exp)
 
     def get_prestige(self, username):
         """
         Gets what prestige level a given player is.
         :param username: str - The player who you are modifying
         """
-        return self.players[username]['prestige']
+        return self.players[username].prestige
 
     def get_items(self, username):
         """
         Gets the items of a given player.
         :param username: str - The player who you are modifying
         """
-        return self.players[username]['items']
+        return self.players[username].items
 
     def prestige(self, username):
         """
@@ -242,11 +251,14 @@ class QuestPlayerManager(PlayerManager):
         :param username: str - The player who you are modifying
         :return: bool - True if successfully prestiged, False if no change
         """
-        if self.players[username]['exp'] >= settings.EXP_LEVELS[settings.LEVEL_CAP] and (
-                self.players[username]['gold'] >= settings.PRESTIGE_COST):
-            self.players[username]['exp'] -= settings.EXP_LEVELS[settings.LEVEL_CAP]
-            self.players[username]['gold'] -= settings.PRESTIGE_COST
-            self.players[username]['prestige'] += 1
+        player = self.players[username]
+        if player.exp >= settings.EXP_LEVELS[settings.LEVEL_CAP] and player.gold >= settings.PRESTIGE_COST:
+            player.exp -= settings.EXP_LEVELS[settings.LEVEL_CAP]
+            player.gold -= settings.PRESTIGE_COST
+            player.prestige += 1
+            self.record_event('exp', username, player.exp)
+            self.record_event('gold', username, player.gold)
+            self.record_event('prestige', username, player.prestige)
             self.save_player(username)
             return True
         else:
@@ -266,29 +278,124 @@ class QuestPlayerManager(PlayerManager):
         msg = msg.rstrip(', ')
         return msg
 
+    def stats_msg(self, username):
+        """
+        Describes a player's relevant stats.
+        :param username: str - The player who is requesting stat information
+        :return: str - The stats message
+        """
+        player = self.players[username]
+        return '{}Level: {} ({} Exp), Gold: {}{}'.format(
+            'Prestige: {}, '.format(player.prestige) if player.prestige else '',
+            self.get_level(username), round(player.exp, 1), round(player.gold, 1),
+            ', Items: {}'.format(self.list_items(player.items)) if player.items else '')
+
     def whisper_stats(self, username):
         """
         Whispers a player their relevant stats.
         :param username: str - The player who is requesting stat information
         """
+        self.bot.send_whisper(username, self.stats_msg(username))
+
+    def save_players(self, usernames):
+        """
+        Marks several players' data to be saved to persistent storage. Deletes items with quantity 0 or less. Every
+        save_player goes through here too.
+        :param usernames: list<str> - The players whose data you want to save
+        """
+        for username in usernames:
+            player = self.players[username]
+            remove_items = [item for item, quantity in player.items.items() if quantity <= 0]
+            for remove_item in remove_items:
+                player.set_item(remove_item, 0)
+                self.record_event('item', username, remove_item, 0)
+
+        super().save_players(usernames)
+
+    def create_player(self, username, stored_data):
+        """
+        Makes the record of a player the first time they're used.
+        :param username: str - The lowercase name of the player
+        :param stored_data: dict - The stored player data, or None if the player was never stored
+        :return: Player - The player
+        """
+        return Player.from_data(username, stored_data)
+
+    def record_event(self, kind, username, *values):
+        """
+        Queues a change to a player to be appended to the journal with the next flush.
+        :param kind: str - gold, exp or prestige with the value they were set to, or item with the item and quantity
+        :param username: str - The player who was changed
+        :param values: The values that were set
+        """
+        self.pending_events.append([kind, username.lower()] + list(values))
+
+    def apply_event(self, event):
+        """
+        Sets the values from a journaled change again, and marks the player to be stored with the next snapshot.
+        :param event: list - The kind, the player and the values that were set
+        """
+        kind, username = event[0], event[1]
         player = self.players[username]
-        msg = '{}Level: {} ({} Exp), Gold: {}{}'.format(
-            'Prestige: {}, '.format(player['prestige']) if player['prestige'] else '',
-            self.get_level(username), round(player['exp'], 1), round(player['gold'], 1),
-            ', Items: {}'.format(self.list_items(player['items'])) if player['items'] else '')
-        self.bot.send_whisper(username, msg)
+        if kind == 'item':
+            player.set_item(event[2], event[3])
+        elif kind in ('gold', 'exp', 'prestige'):
+            setattr(player, kind, event[2])
+        else:
+            raise ValueError('Unknown event kind {}'.format(kind))
+        self.dirty_players[username] = None
 
-    def save_player(self, username):
+    def replay_journal(self):
         """
-        Saves a specific player's data to persistent storage. Deletes items with quantity 0 or less.
-        :param username: str - The player whose data you want to save
+        Reapplies every change in the journal on top of the stored players.
         """
-        # Remove duplicate items. Doesn't use a dict comprehension because items is a custom dict type
-        remove_items = []
-        for item, quantity in self.players[username]['items'].items():
-            if quantity <= 0:
-                remove_items.append(item)
-        for remove_item in remove_items:
-            del self.players[username]['items'][remove_item]
+        for event in self.journal.replay():
+            try:
+                self.apply_event(event)
+            except Exception as e:
+                log_error('Failed to replay journal event {}'.format(event), e)
+
+    def flush(self):
+        """
+        Appends every change since the last flush to the journal, waiting for the disk only once. Once the journal
+        grows past PLAYER_JOURNAL_MAX_SIZE, it's compacted.
+        """
+        self.flush_timer = None
+
+        events, self.pending_events = self.pending_events, []
+        try:
+            self.journal.append(events)
+        except Exception as e:
+            log_error('Failed to append to the player journal', e)
+            self.pending_events = events + self.pending_events
+            if self.flush_on_timer:
+                self.flush_timer = Timer(settings.PLAYER_SAVE_DELAY, self.flush)
+            return
+
+        if self.journal.size() >= settings.PLAYER_JOURNAL_MAX_SIZE:
+            self.compact()
+
+    def compact(self):
+        """
+        Moves the journal aside and stores a copy of every player it changed on a background thread. The old journal
+        is removed once they're all stored, so the next start only replays what changed after this.
+        """
+        if self.snapshot_thread is not None and self.snapshot_thread.is_alive():
+            return
+
+        # Copied now, so the thread doesn't see changes that are going into the new journal
+        dirty_players, self.dirty_players = self.dirty_players, {}
+        snapshot = [(username, self.players[username].to_data()) for username in dirty_players]
+        self.journal.rotate()
+
+        self.snapshot_thread = threading.Thread(target=self.write_snapshot, args=(snapshot,), name='player-snapshot')
+        self.snapshot_thread.start()
 
-        super().save_player(username)
+    def write_snapshot(self, snapshot):
+        """
+        Stores copies of players and removes the journal they came from. If any fail, the journal is kept and is
+        compacted again along with the next one.
+        :param snapshot: list<tuple<str, dict>> - The name and a copy of the data of each player
+        """
+        if self.write_players(snapshot):
+            self.journal.remove_rotated()
@@ -0,0 +1,72 @@
+from .quest_channel_manager import QuestChannelManager
+from utils.connection_pool import stable_hash
+from utils.logger import log
+
+
+def channel_worker(channel_name, worker_count):
+    """
+    Gets which worker process owns a channel. Every process agrees without having to ask each other.
+    :param channel_name: str - The channel to look up
+    :param worker_count: int - How many worker processes there are
+    :return: int - The index of the worker that owns the channel
+    """
+    return stable_hash(channel_name.lower()) % worker_count
+
+
+class WorkerChannelManager(QuestChannelManager):
+    """
+    Keeps track of the channels owned by one worker process. Joining or leaving a channel owned by another worker is
+    passed on to that worker, which is the only one that saves its settings.
+    """
+    def owns(self, channel_name):
+        """
+        Whether this worker owns a channel.
+        :param channel_name: str - The channel to check
+        :return: bool - True if the channel is joined and saved by this worker
+        """
+        return channel_worker(channel_name, len(self.bot.inboxes)) == self.bot.worker_index
+
+    def join_channel(self, channel_name):
+        """
+        Joins a new channel and sets it for auto-join, or asks the worker that owns it to.
+        :param channel_name: str - The channel you want to join and add
+        """
+        if self.owns(channel_name):
+            super().join_channel(channel_name)
+        else:
+            self.bot.inboxes[channel_worker(channel_name, len(self.bot.inboxes))].put(('join', channel_name))
+
+    def leave_channel(self, channel_name):
+        """
+        Leaves a channel and turns off auto_join, or asks the worker that owns it to.
+        :param channel_name: str - The owner of the channel you want to remove
+        """
+        if self.owns(channel_name):
+            super().leave_channel(channel_name)
+        else:
+            self.bot.inboxes[channel_worker(channel_name, len(self.bot.inboxes))].put(('leave', channel_name))
+
+    def enable_auto_join(self, channel_name):
+        """
+        Bot will join the given channel on bot startup. Only the owning worker saves the setting.
+        :param channel_name: str - The owner of the channel who you are changing settings for
+        """
+        if self.owns(channel_name):
+            super().enable_auto_join(channel_name)
+
+    def disable_auto_join(self, channel_name):
+        """
+        Bot will not join the given channel anymore. Only the owning worker saves the setting.
+        :param channel_name: str - The owner of the channel who you are changing settings for
+        """
+        if self.owns(channel_name):
+            super().disable_auto_join(channel_name)
+
+    def join_all_auto_join(self):
+        """
+        Join all channels owned by this worker that have auto_join enabled.
+        """
+        for channel_name, channel_data in self.channel_settings.items():
+            if channel_data['auto_join'] and self.owns(channel_name):
+                log('Joining channel: {}...'.format(channel_name))
+                self.bot.join_channel(channel_name)
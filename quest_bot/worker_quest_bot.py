@@ -0,0 +1,106 @@
+import queue
+
+from .async_quest_bot import AsyncQuestBot
+from .player_state import PlayerStateManager
+from .quest_bot import QuestBot
+from .worker_channel_manager import WorkerChannelManager
+import settings
+from utils.logger import log_error
+from utils.timing import Timer
+
+
+def shared_rate_limits():
+    """
+    :return: list<tuple<int, float>> - Every account-wide rate limit the workers split between them, as (limit,
+                                       period) pairs
+    """
+    return [(settings.IRC_SEND_LIMIT, settings.IRC_SEND_PERIOD),
+            (settings.IRC_MOD_SEND_LIMIT, settings.IRC_SEND_PERIOD),
+            (settings.IRC_JOIN_LIMIT, settings.IRC_JOIN_PERIOD)] + settings.IRC_WHISPER_LIMITS
+
+
+def max_workers():
+    """
+    Every worker needs at least one token of each account-wide rate limit, and a worker's share can't be stretched
+    over a longer window without letting the workers burst past the limit together.
+    :return: int - The most worker processes the account-wide rate limits can be split between
+    """
+    return min(limit for limit, _ in shared_rate_limits())
+
+
+class WorkerQuestBot(QuestBot):
+    """
+    Quest bot that runs as one of several worker processes. It only joins the channels it owns, shares player data
+    with the other workers through the player state process and handles whispers only if it's the first worker.
+    """
+    channel_manager_type = WorkerChannelManager
+
+    def __init__(self, bot_name, owner_name, oauth, worker_index, inboxes, player_state_address):
+        """
+        :param bot_name: str - The bot's username
+        :param owner_name: str - The owner's username
+        :param oauth: str - The bot's oauth
+        :param worker_index: int - Which worker this is
+        :param inboxes: list<multiprocessing.Queue> - Join and leave requests for each worker, by index
+        :param player_state_address: str - Where the player state process is listening
+        """
+        if len(inboxes) > max_workers():
+            raise ValueError('Account-wide rate limits can only be split between {} workers, not {}.'.format(
+                max_workers(), len(inboxes)))
+
+        self.worker_index = worker_index
+        self.inboxes = inboxes
+        self.player_state = PlayerStateManager(address=player_state_address)
+
+        super().__init__(bot_name, owner_name, oauth)
+
+        # Account-wide rate limits are split evenly between the workers, rounding down so they never add up to more
+        for bucket in [self.send_bucket, self.mod_send_bucket, self.join_queue.bucket] + self.whisper_send_buckets:
+            bucket.capacity //= len(self.inboxes)
+
+    def create_player_manager(self):
+        """
+        :return: AutoProxy - The player manager in the player state process, shared with every other worker
+        """
+        self.player_state.connect()
+        return self.player_state.player_manager()
+
+    def connect(self):
+        """
+        Connect to the IRC server, join the channels this worker owns and start checking for requests from other
+        workers.
+        """
+        super().connect()
+        Timer(settings.WORKER_INBOX_POLL, self.check_inbox)
+
+    def check_inbox(self):
+        """
+        Joins and leaves the channels other workers asked this one to, then checks again later.
+        """
+        try:
+            while True:
+                action, channel_name = self.inboxes[self.worker_index].get_nowait()
+                if action == 'join':
+                    self.channel_manager.join_channel(channel_name)
+                elif action == 'leave':
+                    self.channel_manager.leave_channel(channel_name)
+        except queue.Empty:
+            pass
+        except Exception as e:
+            log_error('Worker inbox error', e)
+
+        Timer(settings.WORKER_INBOX_POLL, self.check_inbox)
+
+    def receiving_primary(self):
+        """
+        Twitch delivers whispers to every worker's connections, so only the first worker handles them.
+        :return: bool - True if this is the first worker and the message came in on its primary connection
+        """
+        return self.worker_index == 0 and super().receiving_primary()
+
+
+class AsyncWorkerQuestBot(WorkerQuestBot, AsyncQuestBot):
+    """
+    Worker quest bot that runs on an asyncio event loop.
+    """
+    pass
@@ -25,6 +25,19 @@ LOG_TO_FILE = False
 AUTO_RESTART_ON_CRASH = False
 # Lets other people use a shared instance of your bot in their channel; disable if bot gets laggy
 ENABLE_REQUEST_JOIN = True
+# Run the bot on an asyncio event loop so send and join cooldowns never hold up handling chat
+USE_ASYNCIO = False
+# How many bot processes supervisor.py spreads channels over; 0 uses one per CPU core. Account-wide rate limits are
+# split between them, so there can't be more than the smallest limit, 3 whispers per second
+WORKER_PROCESSES = 0
+# Where player and channel data is kept: 'json' for a file per player and channel, 'sqlite' for one database, or
+# 'snapshot' for one compact binary file per kind of data that starts fastest with many players but can't be used with
+# supervisor.py.
+# Switching away from 'json' copies the existing files over the first time
+STORAGE_BACKEND = 'json'
+# Keep player stats in columns and read every player at startup, so rewarding whole parties and leaderboards stay fast
+# with a very large number of players
+COLUMNAR_PLAYERS = False
 
 ########################################################################################################################
 # URL and file names for hosting associated bot files
@@ -47,15 +60,37 @@ CHATTERS_URL = 'https://tmi.twitch.tv/group/user/{}/chatters'
 IRC_SERVER = 'irc.twitch.tv'
 IRC_PORT = 6667
 IRC_POLL_TIMEOUT = 0.5
-IRC_RECV_SIZE = 1024
-# If Twitch sends a bunch of messages at once, it chunks it into multiple sends that may be delayed
-IRC_CHUNK_DELAY = 0.15
-# Whisper rate-limit is actually 3 per second, 100 per minute (0.6 seconds) but we share the same cooldown
-# TODO: Faster mod cooldowns
-# Rate-limit protection: 20 commands within 30 second period, or 1.5 second sleep time for non-mods
-IRC_SEND_COOLDOWN = 1.6
-# Rate-limit protection: 50 JOINs per 15 seconds, or 0.3 sleep time
-IRC_JOIN_SLEEP_TIME = 0.35
+# Large enough to drain everything the OS has buffered in one read; partial lines are kept until completed
+IRC_RECV_SIZE = 65536
+# Rate-limit protection: 20 commands within 30 second period for non-mods
+IRC_SEND_LIMIT = 20
+IRC_SEND_PERIOD = 30
+# Rate-limit protection: 100 commands within 30 second period in channels where the bot is a mod or the broadcaster,
+# tracked per channel from USERSTATE
+IRC_MOD_SEND_LIMIT = 100
+# Rate-limit protection: whispers have their own limits of 3 per second and 100 per minute, as (limit, period) pairs
+IRC_WHISPER_LIMITS = [(3, 1), (100, 60)]
+# Seconds a queued message of each priority may wait before it's dropped instead of sent late; results never expire
+IRC_SEND_DEADLINES = {
+    'whisper': 60,
+    'info': 10
+}
+# Seconds a repeatable message like a cooldown notice waits for more people to merge into it before it's sent
+IRC_COALESCE_WINDOW = 1
+# Seconds after sending a message during which the exact same message is suppressed; Twitch drops these anyway
+IRC_DUPLICATE_WINDOW = 30
+# Rate-limit protection: 50 JOINs per 15 seconds, counting every channel in a multi-channel JOIN
+IRC_JOIN_LIMIT = 50
+IRC_JOIN_PERIOD = 15
+# Longest line the IRC server accepts, including the line ending
+IRC_MAX_LINE_LENGTH = 512
+# Channels are spread over several connections by consistent hashing; a new connection opens for every this many
+IRC_CHANNELS_PER_CONNECTION = 200
+IRC_MAX_CONNECTIONS = 8
+# Points per connection on the hash ring; more points spread channels more evenly
+IRC_HASH_REPLICAS = 64
+# How often a worker process checks for channels another worker asked it to join or leave
+WORKER_INBOX_POLL = 1
 
 ########################################################################################################################
 # Local file paths
@@ -66,6 +101,14 @@ ERROR_FILENAME = 'error.txt'
 DATA_FOLDER = 'data'
 PLAYER_DATA_PATH = os.path.join(DATA_FOLDER, 'players')
 CHANNEL_DATA_PATH = os.path.join(DATA_FOLDER, 'channels')
+DATABASE_PATH = os.path.join(DATA_FOLDER, 'xelabot.db')
+# Every change to a player is appended here, and players are only stored once it grows past the max size in bytes
+PLAYER_JOURNAL_PATH = os.path.join(DATA_FOLDER, 'players.journal')
+PLAYER_JOURNAL_MAX_SIZE = 1024 * 1024
+# Added to the name of a data folder once it's been copied into the database
+MIGRATED_SUFFIX = '.migrated'
+# Changed players are written together in one batch at most this many seconds after the first change, and on shutdown
+PLAYER_SAVE_DELAY = 10
 
 ########################################################################################################################
 # Temp files
@@ -104,6 +147,10 @@ DEFAULT_SETTINGS_JSON = OrderedDict([
         ('ENABLE_REQUEST_JOIN', ENABLE_REQUEST_JOIN),
         ('AUTO_UPDATE_EXECUTABLE', AUTO_UPDATE_EXECUTABLE),
         ('AUTO_RESTART_ON_CRASH', AUTO_RESTART_ON_CRASH),
+        ('USE_ASYNCIO', USE_ASYNCIO),
+        ('WORKER_PROCESSES', WORKER_PROCESSES),
+        ('STORAGE_BACKEND', STORAGE_BACKEND),
+        ('COLUMNAR_PLAYERS', COLUMNAR_PLAYERS),
         ('LOG_TO_FILE', LOG_TO_FILE)
     ]))]
 )
@@ -115,22 +162,42 @@ def load_settings_file():
             temp_settings_json = json.load(read_file, object_pairs_hook=OrderedDict)
 
         # Iterate over known variable names and change all the module's variables to the ones from file, if any
-        module = sys.modules[__name__]
         settings_json = OrderedDict([
             (REQUIRED_STRING, OrderedDict()),
             (OPTIONAL_STRING, OrderedDict())
         ])
         for key, value in DEFAULT_SETTINGS_JSON[REQUIRED_STRING].items():
-            newest_value = temp_settings_json[REQUIRED_STRING].get(key, value)
-            setattr(module, key, newest_value)
-            settings_json[REQUIRED_STRING][key] = newest_value
+            settings_json[REQUIRED_STRING][key] = temp_settings_json[REQUIRED_STRING].get(key, value)
         for key, value in DEFAULT_SETTINGS_JSON[OPTIONAL_STRING].items():
-            newest_value = temp_settings_json[OPTIONAL_STRING].get(key, value)
-            setattr(module, key, temp_settings_json[OPTIONAL_STRING].get(key, value))
-            settings_json[OPTIONAL_STRING][key] = newest_value
+            settings_json[OPTIONAL_STRING][key] = temp_settings_json[OPTIONAL_STRING].get(key, value)
+        apply_settings(settings_json)
     else:
         settings_json = DEFAULT_SETTINGS_JSON
 
     # Write to file to make sure we have the latest data
     with open(SETTINGS_FILENAME, 'w') as write_file:
         json.dump(settings_json, write_file, indent=4)
+
+
+def current_settings():
+    """
+    Gets the dynamically loaded settings as they are now, to hand to another process.
+    :return: OrderedDict - The settings, in the same layout as the settings file
+    """
+    module = sys.modules[__name__]
+    return OrderedDict([
+        (section, OrderedDict([(key, getattr(module, key)) for key in DEFAULT_SETTINGS_JSON[section]]))
+        for section in [REQUIRED_STRING, OPTIONAL_STRING]
+    ])
+
+
+def apply_settings(settings_json):
+    """
+    Changes the module's variables to the given settings without touching the settings file. Used by processes
+    started by another one that already read the file, since only one process may write it.
+    :param settings_json: OrderedDict - The settings, in the same layout as the settings file
+    """
+    module = sys.modules[__name__]
+    for section in [REQUIRED_STRING, OPTIONAL_STRING]:
+        for key, value in settings_json[section].items():
+            setattr(module, key, value)
@@ -0,0 +1,104 @@
+import multiprocessing
+import os
+import time
+
+from quest_bot.player_state import PlayerStateManager
+from quest_bot.worker_quest_bot import AsyncWorkerQuestBot, max_workers, WorkerQuestBot
+import settings
+from utils.cmd import exit_on_terminate, pause
+from utils.logger import log, log_error
+from utils.storage import migrate_stores
+from xelabot import clear_temp_files
+
+
+def run_worker(worker_index, inboxes, player_state_address, settings_json):
+    """
+    Runs one worker bot until it crashes. Runs in its own process.
+    :param worker_index: int - Which worker this is
+    :param inboxes: list<multiprocessing.Queue> - Join and leave requests for each worker, by index
+    :param player_state_address: str - Where the player state process is listening
+    :param settings_json: OrderedDict - The settings the supervisor loaded
+    """
+    # Processes may be started fresh instead of forked, so the settings are handed over instead of inherited. The
+    # settings file is never read again here, since the supervisor may be rewriting it
+    settings.apply_settings(settings_json)
+
+    bot_type = AsyncWorkerQuestBot if settings.USE_ASYNCIO else WorkerQuestBot
+    bot = bot_type(settings.BOT_NAME, settings.BROADCASTER_NAME, settings.BOT_OAUTH, worker_index, inboxes,
+                   player_state_address)
+    bot.connect()
+    bot.run()
+
+
+def start_worker(worker_index, inboxes, player_state_address):
+    """
+    Starts a worker process.
+    :param worker_index: int - Which worker to start
+    :param inboxes: list<multiprocessing.Queue> - Join and leave requests for each worker, by index
+    :param player_state_address: str - Where the player state process is listening
+    :return: multiprocessing.Process - The running worker
+    """
+    log('Starting worker {}...'.format(worker_index))
+    worker = multiprocessing.Process(target=run_worker,
+                                     args=(worker_index, inboxes, player_state_address, settings.current_settings()),
+                                     name='xelabot-worker-{}'.format(worker_index))
+    worker.start()
+    return worker
+
+
+def run_supervisor():
+    """
+    Starts the player state process and a worker process per core, up to what the rate limits allow, each owning a
+    share of the channels. Restarts workers that crash if AUTO_RESTART_ON_CRASH is set, and stops once none are left
+    running.
+    """
+    # Every process would keep its own copy of a snapshot and overwrite the others' records whenever it saves
+    if settings.STORAGE_BACKEND == 'snapshot':
+        raise ValueError('STORAGE_BACKEND snapshot only works with a single process, use sqlite with supervisor.py.')
+
+    worker_count = settings.WORKER_PROCESSES or min(os.cpu_count() or 1, max_workers())
+    if worker_count > max_workers():
+        raise ValueError('WORKER_PROCESSES is {}, but account-wide rate limits can only be split between {} workers.'
+                         .format(worker_count, max_workers()))
+
+    # Every process opens storage, so only this one may migrate it
+    migrate_stores()
+
+    log('Starting player state...')
+    player_state = PlayerStateManager()
+    # Gets the same settings as the workers, without reading the settings file
+    player_state.start(settings.apply_settings, (settings.current_settings(),))
+
+    inboxes = [multiprocessing.Queue() for _ in range(worker_count)]
+    workers = [start_worker(worker_index, inboxes, player_state.address) for worker_index in range(worker_count)]
+
+    try:
+        while any(worker is not None for worker in workers):
+            time.sleep(5)
+
+            for worker_index, worker in enumerate(workers):
+                if worker is None or worker.is_alive():
+                    continue
+
+                log('Worker {} exited with code {}.'.format(worker_index, worker.exitcode))
+                if settings.AUTO_RESTART_ON_CRASH:
+                    workers[worker_index] = start_worker(worker_index, inboxes, player_state.address)
+                else:
+                    workers[worker_index] = None
+    finally:
+        for worker in workers:
+            if worker is not None and worker.is_alive():
+                worker.terminate()
+        player_state.shutdown()
+
+
+if __name__ == '__main__':
+    multiprocessing.freeze_support()
+    exit_on_terminate()
+    clear_temp_files()
+    settings.load_settings_file()
+    try:
+        run_supervisor()
+    except Exception as e:
+        log_error('Supervisor crashed', e)
+    pause()
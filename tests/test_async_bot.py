@@ -0,0 +1,68 @@
+import asyncio
+import unittest
+from unittest.mock import MagicMock, patch
+
+from twitch.async_twitch_bot import AsyncTwitchBot
+
+
+class TestAsyncTwitchBot(unittest.TestCase):
+    def setUp(self):
+        channel_save_patcher = patch('twitch.channel_manager.ChannelManager.save_channel_data')
+        channel_load_patcher = patch('twitch.channel_manager.ChannelManager.load_channel_data')
+        for patcher in [channel_save_patcher, channel_load_patcher]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        with patch('twitch.twitch_bot.PlayerManager', return_value=MagicMock()):
+            self.bot = AsyncTwitchBot('BotName', 'OwnerName', 'oauth:something')
+        self.addCleanup(self.bot.loop.close)
+
+        self.written = []
+        self.connection = self.bot.pool.primary
+        self.connection.writer = MagicMock()
+        self.connection.writer.write.side_effect = lambda data: self.written.append(data)
+        self.connection.writer.drain = MagicMock(side_effect=lambda: asyncio.sleep(0))
+
+    def feed_reader(self, data):
+        async def create_reader():
+            reader = asyncio.StreamReader()
+            reader.feed_data(data)
+            reader.feed_eof()
+            return reader
+        self.connection.reader = self.bot.loop.run_until_complete(create_reader())
+
+    def test_handles_lines_while_sends_wait(self):
+        for _ in range(self.bot.send_bucket.capacity):
+            self.bot.send_bucket.consume(float('inf'))
+        self.bot.send_msg('channel', 'Stuck behind the rate limit')
+        self.feed_reader(b'PING :tmi.twitch.tv\r\nPING :tmi.')
+
+        self.assertRaises(Exception, self.bot.run)
+        self.assertEqual(self.written, [b'PONG :tmi.twitch.tv\r\n'])
+
+    def test_events_on_bot_loop(self):
+        async def wait_for_send():
+            waiting = self.bot.loop.create_task(self.bot.send_ready.wait())
+            await asyncio.sleep(0)
+            self.bot.send_raw('PRIVMSG #channel :hello', 'channel')
+            await asyncio.wait_for(waiting, 1)
+            self.bot.timers_changed.set()
+            await asyncio.wait_for(self.bot.timers_changed.wait(), 1)
+
+        self.bot.send_ready.clear()
+        self.bot.loop.run_until_complete(wait_for_send())
+        self.assertTrue(self.bot.send_ready.is_set())
+
+    def test_joins_batched(self):
+        self.bot.join_channel('first')
+        self.bot.join_channel('second')
+        self.assertEqual(len(self.bot.join_queue), 2)
+        self.assertEqual(self.written, [], 'Joins should wait for the event loop.')
+
+        self.feed_reader(b'')
+        self.assertRaises(Exception, self.bot.run)
+        self.assertEqual(self.written, [b'JOIN #first,#second\r\n'])
+
+
+if __name__ == '__main__':
+    unittest.main()
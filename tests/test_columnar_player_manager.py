@@ -0,0 +1,80 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+
+from quest_bot.columnar_player_manager import ColumnarQuestPlayerManager
+from quest_bot.player import NO_ITEMS
+from quest_bot.quest_player_manager import QuestPlayerManager
+import settings
+from utils.storage import JSONDirectoryStore
+
+
+class TestColumnarPlayerManager(unittest.TestCase):
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        player_path = os.path.join(temp_dir.name, 'players')
+        os.makedirs(player_path)
+        store = JSONDirectoryStore(player_path)
+        store.save('stored_player', {'name': 'Stored_Player', 'gold': 500, 'exp': 12, 'prestige': 1,
+                                     'items': {'Sword': 2}})
+        store.save('poor_player', {'name': 'poor_player', 'gold': 1.5})
+
+        for name, value in [('PLAYER_DATA_PATH', player_path), ('STORAGE_BACKEND', 'json'),
+                            ('PLAYER_JOURNAL_PATH', os.path.join(temp_dir.name, 'players.journal'))]:
+            patcher = patch.object(settings, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.player_manager = ColumnarQuestPlayerManager(MagicMock())
+        self.addCleanup(self.player_manager.journal.close)
+        self.expected_manager = QuestPlayerManager(MagicMock())
+        self.addCleanup(self.expected_manager.journal.close)
+
+    def test_loads_everyone(self):
+        self.assertEqual(len(self.player_manager.columns), 2)
+        self.assertEqual(self.player_manager.players, {})
+        self.assertEqual(self.player_manager.get_gold('STORED_PLAYER'), 500)
+        self.assertEqual(self.player_manager.get_items('stored_player'), {'Sword': 2})
+        self.assertIs(self.player_manager.get_items('new_player'), NO_ITEMS)
+        self.assertEqual(len(self.player_manager.columns), 3)
+        self.assertEqual(self.player_manager.stats_msg('stored_player'),
+                         self.expected_manager.stats_msg('stored_player'))
+
+    def test_matches_quest_player_manager(self):
+        party = ['Stored_Player', 'poor_player', 'New_Player', 'new_player']
+        for player_manager in [self.player_manager, self.expected_manager]:
+            player_manager.reward(party, gold=100, exp=5, item=['Shield', 'Sword'])
+            player_manager.penalize(party[1:], gold=300, exp=1, item=['Sword', 'Missing'])
+            player_manager.reward('poor_player', gold=7, item='Gem')
+
+        for username in ['stored_player', 'poor_player', 'new_player']:
+            self.assertEqual(self.player_manager.players[username], self.expected_manager.players[username])
+        self.assertEqual(self.player_manager.dirty_players, self.expected_manager.dirty_players)
+
+        # Items left at 0 or less by anything are cleaned up by every save
+        for player_manager in [self.player_manager, self.expected_manager]:
+            player_manager.players['poor_player'].items['Gem'] = 0
+            player_manager.reward(['poor_player'])
+            self.assertNotIn('Gem', player_manager.get_items('poor_player'))
+
+        self.player_manager.flush()
+        replayed_manager = ColumnarQuestPlayerManager(MagicMock())
+        self.addCleanup(replayed_manager.journal.close)
+        for username in ['stored_player', 'poor_player', 'new_player']:
+            self.assertEqual(replayed_manager.players[username], self.expected_manager.players[username])
+
+    def test_aggregates(self):
+        self.player_manager.reward(['player1', 'player2'], gold=50, exp=settings.EXP_LEVELS[5])
+        self.assertEqual(self.player_manager.top_gold(2), [('Stored_Player', 500), ('player1', 50)])
+        self.assertEqual(self.player_manager.top_gold(10)[-1], ('poor_player', 1.5))
+
+        histogram = self.player_manager.level_histogram()
+        self.assertEqual(histogram, {self.player_manager.exp_to_level(0): 1,
+                                     self.player_manager.exp_to_level(12): 1,
+                                     self.player_manager.exp_to_level(settings.EXP_LEVELS[5]): 2})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+import gc
+import unittest
+from unittest.mock import MagicMock
+
+from utils.command_set import CommandBinding, CommandSet
+
+
+class TestCommandSet(unittest.TestCase):
+    def setUp(self):
+        self.calls = []
+        self.parent = CommandSet(
+            exact_match_commands={'!a': lambda name: self.calls.append(('parent exact', name))},
+            starts_with_commands={'!a': lambda name, params: self.calls.append(('parent starts', params))})
+        self.children = [CommandSet(exact_match_commands={
+            '!a': lambda name, index=index: self.calls.append(('child', index))}) for index in range(5)]
+        for child in self.children:
+            self.parent.add_command_set(child)
+
+    def test_ordered_dispatch(self):
+        self.parent.execute_command('Player', '!A some params')
+        self.assertEqual(self.calls, [('parent exact', 'Player'), ('parent starts', 'some params')] +
+                         [('child', index) for index in range(5)])
+
+    def test_compiled_once(self):
+        self.parent.execute_command('Player', '!a')
+        table = self.parent.table
+        self.parent.execute_command('Player', '!b')
+        self.assertIs(self.parent.table, table, 'Table should be reused until the tree changes.')
+        self.assertEqual(len(table['!a']), 7)
+
+    def test_invalidated_by_changes(self):
+        grandchild = CommandSet(exact_match_commands={'!b': MagicMock()})
+        self.parent.execute_command('Player', '!b')
+
+        self.children[0].add_command_set(grandchild)
+        self.parent.execute_command('Player', '!b')
+        grandchild.exact_match_commands['!b'].assert_called_once_with('Player')
+
+        self.children[0].remove_command_set(grandchild)
+        self.parent.execute_command('Player', '!b')
+        self.assertEqual(grandchild.exact_match_commands['!b'].call_count, 1)
+
+        self.parent.clear_children()
+        self.assertEqual(self.children[0].parents, [])
+        self.children[1].add_commands(exact_match_commands={'!c': MagicMock()})
+        self.parent.execute_command('Player', '!a')
+        self.assertEqual(self.calls, [('parent exact', 'Player'), ('parent starts', '')])
+
+    def test_handler_error(self):
+        self.parent.add_commands(exact_match_commands={'!a': MagicMock(side_effect=ValueError)})
+        self.parent.execute_command('Player', '!a')
+        self.assertEqual(len(self.calls), 6, 'Other handlers should still run after one fails.')
+
+    def test_binding(self):
+        shared = CommandSet(exact_match_commands={'!a': MagicMock()}, starts_with_commands={'!b': MagicMock()})
+        first_owner = object()
+        second_owner = object()
+        binding = CommandBinding(shared, first_owner)
+
+        binding.execute_command('Player', '!a')
+        shared.exact_match_commands['!a'].assert_called_once_with(first_owner, 'Player')
+
+        binding.bind(shared, second_owner)
+        binding.execute_command('Player', '!b some params')
+        shared.starts_with_commands['!b'].assert_called_once_with(second_owner, 'Player', 'some params')
+
+        binding.unbind()
+        binding.execute_command('Player', '!a')
+        self.assertEqual(shared.exact_match_commands['!a'].call_count, 1)
+
+    def test_registered_words(self):
+        self.assertTrue(CommandSet.is_registered('!a'))
+        self.assertFalse(CommandSet.is_registered('!registered'))
+
+        command_set = CommandSet(exact_match_commands={'!registered': MagicMock()})
+        other_set = CommandSet(exact_match_commands={'!registered': MagicMock()})
+        command_set.add_commands(starts_with_commands={'!registered': MagicMock(), '!added': MagicMock()})
+        self.assertTrue(CommandSet.is_registered('!registered'))
+        self.assertTrue(CommandSet.is_registered('!added'))
+
+        del command_set
+        gc.collect()
+        self.assertTrue(CommandSet.is_registered('!registered'), 'Another set still has the word.')
+        self.assertFalse(CommandSet.is_registered('!added'))
+
+        del other_set
+        gc.collect()
+        self.assertFalse(CommandSet.is_registered('!registered'))
+
+
+if __name__ == '__main__':
+    unittest.main()
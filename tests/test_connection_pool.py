@@ -0,0 +1,67 @@
+import unittest
+from unittest.mock import MagicMock
+
+from utils.connection_pool import ConnectionPool
+
+
+class TestConnectionPool(unittest.TestCase):
+    def setUp(self):
+        self.pool = ConnectionPool(self.create_connection, 10, 4, 64)
+        self.pool.add_connection()
+
+    @staticmethod
+    def create_connection(index):
+        connection = MagicMock()
+        connection.index = index
+        return connection
+
+    def assign_all(self, channel_names):
+        moves = []
+        for channel_name in channel_names:
+            moves.extend(self.pool.assign(channel_name))
+        return moves
+
+    def test_single_connection(self):
+        self.assertEqual(self.assign_all(['channel{}'.format(i) for i in range(10)]), [])
+        self.assertEqual(len(self.pool.connections), 1)
+        self.assertIs(self.pool.owner('anything'), self.pool.primary)
+
+    def test_grows_with_minimal_moves(self):
+        channel_names = ['channel{}'.format(i) for i in range(40)]
+        self.assign_all(channel_names[:30])
+        self.assertEqual(len(self.pool.connections), 3)
+        owners = dict(self.pool.channel_connections)
+
+        moves = self.assign_all(channel_names[30:])
+        self.assertEqual(len(self.pool.connections), 4)
+        for channel_name, old_connection in moves:
+            self.assertIs(owners[channel_name], old_connection)
+            self.assertIs(self.pool.channel_connections[channel_name], self.pool.connections[3],
+                          'Channels should only move to the new connection.')
+        self.assertEqual(len(moves), len([channel_name for channel_name in channel_names[:30]
+                                          if self.pool.owner(channel_name) is self.pool.connections[3]]))
+
+    def test_max_connections(self):
+        self.assign_all(['channel{}'.format(i) for i in range(100)])
+        self.assertEqual(len(self.pool.connections), 4)
+
+    def test_shrinks_with_hysteresis(self):
+        channel_names = ['channel{}'.format(i) for i in range(21)]
+        self.assign_all(channel_names)
+        self.assertEqual(len(self.pool.connections), 3)
+        third_connection = self.pool.connections[2]
+
+        self.pool.unassign(channel_names.pop())
+        self.pool.unassign(channel_names.pop())
+        self.assertEqual(len(self.pool.connections), 3, 'Should not shrink right at the boundary.')
+
+        while len(channel_names) > 15:
+            self.pool.unassign(channel_names.pop())
+        self.assertEqual(len(self.pool.connections), 2)
+        third_connection.close.assert_called_once_with()
+        for channel_name in channel_names:
+            self.assertIn(self.pool.channel_connections[channel_name], self.pool.connections)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import socket
+import unittest
+from unittest.mock import MagicMock, patch
+
+from utils.clock import FakeClock
+from utils.irc_bot import IRCBot
+from utils.line_buffer import LineBuffer
+from utils.timing import Timer
+
+
+class TestLineBuffer(unittest.TestCase):
+    def setUp(self):
+        self.line_buffer = LineBuffer()
+
+    def test_complete_lines(self):
+        lines = self.line_buffer.feed(b'PING :tmi.twitch.tv\r\n:a!a@a.tmi.twitch.tv PRIVMSG #a :!quest\r\n')
+        self.assertEqual(lines, ['PING :tmi.twitch.tv', ':a!a@a.tmi.twitch.tv PRIVMSG #a :!quest'])
+        self.assertEqual(len(self.line_buffer.buffer), 0)
+
+    def test_partial_line(self):
+        self.assertEqual(self.line_buffer.feed(b':a!a@a.tmi.twitch.tv PRIVMSG #a :!qu'), [])
+        self.assertEqual(self.line_buffer.feed(b'est\r\nPI'), [':a!a@a.tmi.twitch.tv PRIVMSG #a :!quest'])
+        self.assertEqual(self.line_buffer.feed(b'NG :tmi.twitch.tv\r'), [])
+        self.assertEqual(self.line_buffer.feed(b'\n'), ['PING :tmi.twitch.tv'])
+
+    def test_split_multibyte_character(self):
+        encoded = 'PRIVMSG #a :éé\r\n'.encode('UTF-8')
+        split_index = encoded.index(b'\xc3') + 1
+        self.assertEqual(self.line_buffer.feed(encoded[:split_index]), [])
+        self.assertEqual(self.line_buffer.feed(encoded[split_index:]), ['PRIVMSG #a :éé'])
+
+
+class TestIRCBot(unittest.TestCase):
+    def setUp(self):
+        self.socket_mock = MagicMock()
+        with patch('utils.irc_connection.socket.socket', return_value=self.socket_mock):
+            self.bot = IRCBot('BotName', 'OwnerName', 'oauth:something')
+
+    def test_wait_until_deadline(self):
+        clock = FakeClock(100)
+        self.bot.clock = self.bot.send_queue.clock = clock
+        with patch.object(Timer, 'heap', []), patch.object(Timer, 'clock', clock):
+            self.assertIsNone(self.bot.recv_timeout(), 'Idle bot should wait for input.')
+
+            Timer(12, MagicMock())
+            self.assertEqual(self.bot.recv_timeout(), 12)
+            clock.advance(2)
+            self.assertEqual(self.bot.recv_timeout(), 10)
+
+            self.bot.send_raw('PRIVMSG #channel :hi')
+            self.assertEqual(self.bot.recv_timeout(), 0)
+
+    def test_recv_timeout(self):
+        self.socket_mock.recv.side_effect = socket.timeout
+        self.assertIsNone(self.bot.pool.primary.recv())
+
+    def test_recv_split_message(self):
+        self.socket_mock.recv.side_effect = [b'PING :tmi.tw', b'itch.tv\r\n']
+        self.assertEqual(self.bot.pool.primary.recv(), [])
+        self.assertEqual(self.bot.pool.primary.recv(), ['PING :tmi.twitch.tv'])
+
+    def test_recv_broken_connection(self):
+        self.socket_mock.recv.return_value = b''
+        self.assertRaises(Exception, self.bot.pool.primary.recv)
+
+
+if __name__ == '__main__':
+    unittest.main()
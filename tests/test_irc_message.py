@@ -0,0 +1,54 @@
+import unittest
+
+from utils.irc_message import IRCMessage
+
+
+class TestIRCMessage(unittest.TestCase):
+    def test_privmsg(self):
+        message = IRCMessage(
+            '@badges=moderator/1,subscriber/12;color=#00FF7F;display-name=CoolMod;emotes=;mod=1;room-id=12345678;'
+            'subscriber=1;turbo=0;user-id=87654321;user-type=mod :coolmod!coolmod@coolmod.tmi.twitch.tv '
+            'PRIVMSG #sometwitchuser :!quest now :)')
+
+        self.assertEqual(message.command, 'PRIVMSG')
+        self.assertEqual(message.nick, 'coolmod')
+        self.assertEqual(message.target, '#sometwitchuser')
+        self.assertEqual(message.trailing, '!quest now :)')
+        self.assertEqual(message.display_name, 'CoolMod')
+        self.assertTrue(message.is_mod)
+        self.assertTrue(message.is_sub)
+        self.assertEqual(message.user_id, '87654321')
+        self.assertEqual(message.badges, {'moderator': '1', 'subscriber': '12'})
+        self.assertEqual(message.tag('emotes'), '')
+        self.assertIsNone(message.tag('missing'))
+        self.assertIsNone(message.tag('user'), 'Only whole keys should match.')
+
+    def test_escaped_values(self):
+        message = IRCMessage(r'@system-msg=5\sraiders\:\shi\;key=a=b=c;flag;display-name= :x!x@x PRIVMSG #a :hi')
+
+        self.assertEqual(message.tag('system-msg'), '5 raiders; hi', 'Trailing lone backslash is dropped.')
+        self.assertEqual(message.tag('key'), 'a=b=c')
+        self.assertEqual(message.tag('flag'), '')
+        self.assertEqual(message.display_name, 'x', 'Empty display name should fall back to the nickname.')
+
+    def test_no_tags_or_prefix(self):
+        message = IRCMessage('PING :tmi.twitch.tv')
+        self.assertEqual(message.command, 'PING')
+        self.assertEqual(message.prefix, '')
+        self.assertIsNone(message.target)
+        self.assertEqual(message.trailing, 'tmi.twitch.tv')
+        self.assertIsNone(message.tag('mod'))
+
+        message = IRCMessage(':tmi.twitch.tv 353 bot = #channel :a b c')
+        self.assertEqual(message.command, '353')
+        self.assertEqual(message.params, ['bot', '=', '#channel'])
+        self.assertEqual(message.target, 'bot')
+
+        message = IRCMessage('@mod=1 :tmi.twitch.tv USERSTATE #channel')
+        self.assertEqual(message.target, '#channel')
+        self.assertIsNone(message.trailing)
+        self.assertTrue(message.is_mod)
+
+
+if __name__ == '__main__':
+    unittest.main()
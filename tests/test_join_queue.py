@@ -0,0 +1,40 @@
+import unittest
+
+from utils.join_queue import JoinQueue
+from utils.send_queue import TokenBucket
+
+
+class TestJoinQueue(unittest.TestCase):
+    def setUp(self):
+        self.join_queue = JoinQueue(TokenBucket(3, 15), 30)
+
+    def test_batched(self):
+        for channel_name in ['a', 'b', 'a', 'c', 'd']:
+            self.join_queue.put(channel_name)
+        self.assertEqual(len(self.join_queue), 4, 'Duplicate joins should be ignored.')
+
+        channel_names = self.join_queue.pop_channels(0)
+        self.assertEqual(channel_names, ['a', 'b', 'c'])
+        self.assertEqual(self.join_queue.pack(channel_names), ['JOIN #a,#b,#c'])
+        self.assertEqual(self.join_queue.next_ready_time(0), 15)
+        self.assertEqual(self.join_queue.pop_channels(14), [])
+        self.assertEqual(self.join_queue.pop_channels(15), ['d'])
+        self.assertIsNone(self.join_queue.next_ready_time(15))
+
+    def test_line_length(self):
+        self.join_queue.max_line_length = 32
+        join_msgs = self.join_queue.pack(['channel_one', 'channel_two', 'three'])
+        self.assertEqual(join_msgs, ['JOIN #channel_one,#channel_two', 'JOIN #three'])
+        for join_msg in join_msgs:
+            self.assertLessEqual(len(join_msg) + 2, 32)
+
+    def test_discard(self):
+        self.join_queue.put('a')
+        self.join_queue.put('b')
+        self.join_queue.discard('a')
+        self.join_queue.discard('missing')
+        self.assertEqual(self.join_queue.pop_channels(0), ['b'])
+
+
+if __name__ == '__main__':
+    unittest.main()
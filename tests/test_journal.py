@@ -0,0 +1,54 @@
+import os
+import tempfile
+import unittest
+
+from utils.journal import Journal
+
+
+class TestJournal(unittest.TestCase):
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.journal = Journal(os.path.join(temp_dir.name, 'data', 'players.journal'))
+        self.addCleanup(self.journal.close)
+
+    def test_append(self):
+        self.assertEqual(list(self.journal.replay()), [])
+        self.journal.append([])
+        self.assertFalse(os.path.exists(self.journal.path), 'Nothing to append should not create the journal.')
+
+        self.journal.append([['gold', 'player1', 5], ['item', 'player1', 'ItemName', 1]])
+        self.journal.append([['exp', 'player2', 2.5]])
+        self.assertEqual(list(self.journal.replay()), [
+            ['gold', 'player1', 5], ['item', 'player1', 'ItemName', 1], ['exp', 'player2', 2.5]])
+        self.assertEqual(self.journal.size(), os.path.getsize(self.journal.path))
+
+    def test_rotate(self):
+        self.journal.append([['gold', 'player1', 5]])
+        self.journal.rotate()
+        self.assertEqual(self.journal.size(), 0)
+        self.journal.append([['gold', 'player1', 6]])
+        self.assertEqual(list(self.journal.replay()), [['gold', 'player1', 5], ['gold', 'player1', 6]])
+
+        # A rotated journal that's still around is added to, not replaced
+        self.journal.rotate()
+        self.journal.append([['gold', 'player1', 7]])
+        self.assertEqual(list(self.journal.replay()),
+                         [['gold', 'player1', 5], ['gold', 'player1', 6], ['gold', 'player1', 7]])
+
+        self.journal.remove_rotated()
+        self.assertEqual(list(self.journal.replay()), [['gold', 'player1', 7]])
+
+    def test_torn_record(self):
+        self.journal.append([['gold', 'player1', 5]])
+        self.journal.close()
+        with open(self.journal.path, 'a') as journal_file:
+            journal_file.write('["gold","player1",12')
+
+        self.assertEqual(list(self.journal.replay()), [['gold', 'player1', 5]])
+        self.journal.append([['gold', 'player1', 6]])
+        self.assertEqual(list(self.journal.replay()), [['gold', 'player1', 5], ['gold', 'player1', 6]])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,20 +1,34 @@
+import os
+import pickle
+import tempfile
 import unittest
 from unittest.mock import MagicMock, patch
 
+from quest_bot.player import NO_ITEMS
 from quest_bot.quest_player_manager import QuestPlayerManager
 import settings
+from utils.clock import FakeClock
+from utils.timing import Timer
 
 
 class TestPlayerManager(unittest.TestCase):
     def setUp(self):
         player_save_patcher = patch('twitch.player_manager.PlayerManager.save_player_data')
         player_load_patcher = patch('twitch.player_manager.PlayerManager.load_player_data')
-        for patcher in [player_save_patcher, player_load_patcher]:
+        self.clock = FakeClock()
+        clock_patcher = patch.object(Timer, 'clock', self.clock)
+        heap_patcher = patch.object(Timer, 'heap', [])
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        journal_patcher = patch.object(settings, 'PLAYER_JOURNAL_PATH', os.path.join(temp_dir.name, 'players.journal'))
+        for patcher in [player_save_patcher, player_load_patcher, clock_patcher, heap_patcher, journal_patcher]:
             patcher.start()
             self.addCleanup(patcher.stop)
+        self.save_mock = QuestPlayerManager.save_player_data
 
         bot = MagicMock()
         self.player_manager = QuestPlayerManager(bot)
+        self.addCleanup(self.player_manager.journal.close)
 
         self.existing_player = 'Existing_Player'
         self.new_player = 'New_Player'
@@ -94,6 +108,107 @@ class TestPlayerManager(unittest.TestCase):
         self.assertNotIn(item, items)
         self.assertNotIn(missing_item, items)
 
+    def test_player_record(self):
+        player = self.player_manager.players[self.new_player]
+        self.assertIs(player.items, NO_ITEMS)
+        with self.assertRaises(TypeError):
+            player['items']['ItemName'] = 1
+
+        self.player_manager.add_item(self.new_player, ''.join(['Item', 'Name']))
+        self.player_manager.add_item(self.existing_player, 'ItemName')
+        self.assertIs(next(iter(player.items)), next(iter(self.player_manager.get_items(self.existing_player))),
+                      'Item names are shared between players.')
+        self.player_manager.remove_item(self.new_player, 'ItemName')
+        self.assertIs(player.items, NO_ITEMS)
+
+        # Still works like the dict it replaced
+        player['gold'] = 5
+        self.assertEqual(player['gold'], 5)
+        self.assertEqual(player.get('unknown_key', 1), 1)
+        self.assertEqual(player, {'name': 'new_player', 'exp': 0, 'prestige': 0, 'gold': 5, 'items': {}})
+        self.assertIs(pickle.loads(pickle.dumps(player)).items, NO_ITEMS)
+
+    def test_lazy_loading(self):
+        self.player_manager.store = MagicMock()
+        self.player_manager.store.load.return_value = {'name': 'Stored_Player', 'gold': 500, 'unknown_key': 1}
+        self.player_manager.unloaded_players = {'stored_player': 'Stored_Player'}
+
+        self.assertEqual(self.player_manager.get_gold(self.new_player), 0)
+        self.player_manager.store.load.assert_not_called()
+
+        self.assertEqual(self.player_manager.get_gold('STORED_PLAYER'), 500)
+        self.assertEqual(self.player_manager.get_exp('stored_player'), 0)
+        self.player_manager.store.load.assert_called_once_with('Stored_Player')
+        self.assertNotIn('unknown_key', self.player_manager.players['stored_player'])
+        self.assertEqual(self.player_manager.unloaded_players, {})
+
+    def test_write_behind(self):
+        self.player_manager.reward([self.existing_player, self.new_player], gold=10, exp=1)
+        self.player_manager.add_item(self.new_player, 'ItemName')
+        self.assertEqual(self.player_manager.journal.size(), 0)
+
+        self.clock.advance(settings.PLAYER_SAVE_DELAY - 1)
+        Timer.check_timers()
+        self.assertEqual(self.player_manager.journal.size(), 0)
+
+        self.clock.advance(1)
+        Timer.check_timers()
+        self.assertEqual(list(self.player_manager.journal.replay()), [
+            ['gold', 'existing_player', 256],
+            ['gold', 'existing_player', 266],
+            ['exp', 'existing_player', 1],
+            ['gold', 'new_player', 10],
+            ['exp', 'new_player', 1],
+            ['item', 'new_player', 'ItemName', 1]
+        ])
+        self.assertEqual(self.player_manager.pending_events, [])
+        self.assertIsNone(self.player_manager.flush_timer)
+        self.save_mock.assert_not_called()
+
+    def test_replay(self):
+        self.player_manager.reward(self.new_player, gold=settings.PRESTIGE_COST, exp=settings.EXP_LEVELS[-1],
+                                   item=['ItemName', 'OtherItem'])
+        self.player_manager.prestige(self.new_player)
+        self.player_manager.penalize(self.new_player, item='OtherItem')
+        self.player_manager.flush()
+
+        other_player_manager = QuestPlayerManager(MagicMock())
+        self.addCleanup(other_player_manager.journal.close)
+        other_player_manager.replay_journal()
+        self.assertEqual(other_player_manager.players, self.player_manager.players)
+        self.assertEqual(list(other_player_manager.dirty_players), [self.existing_player.lower(),
+                                                                    self.new_player.lower()])
+
+    def test_compaction(self):
+        self.player_manager.add_exp(self.new_player, 5)
+        with patch.object(settings, 'PLAYER_JOURNAL_MAX_SIZE', 1):
+            self.player_manager.flush()
+            self.player_manager.snapshot_thread.join()
+        self.assertEqual([call[0] for call in self.save_mock.call_args_list], [
+            (self.existing_player.lower(), self.player_manager.players[self.existing_player]),
+            (self.new_player.lower(), self.player_manager.players[self.new_player])
+        ])
+        self.assertEqual(self.player_manager.journal.size(), 0)
+        self.assertFalse(os.path.exists(self.player_manager.journal.rotated_path))
+
+        self.player_manager.add_exp(self.new_player, 5)
+        self.player_manager.flush()
+        self.assertEqual(list(self.player_manager.journal.replay()), [['exp', 'new_player', 10]])
+
+    def test_failed_snapshot(self):
+        self.save_mock.side_effect = [OSError, None, None]
+        with patch.object(settings, 'PLAYER_JOURNAL_MAX_SIZE', 1):
+            self.player_manager.flush()
+            self.player_manager.snapshot_thread.join()
+            self.assertIn(self.existing_player.lower(), self.player_manager.dirty_players, 'Failed writes are retried.')
+            self.assertTrue(os.path.exists(self.player_manager.journal.rotated_path))
+
+            self.player_manager.add_exp(self.new_player, 5)
+            self.player_manager.flush()
+            self.player_manager.snapshot_thread.join()
+        self.assertEqual(self.save_mock.call_count, 3)
+        self.assertEqual(self.player_manager.dirty_players, {})
+        self.assertFalse(os.path.exists(self.player_manager.journal.rotated_path))
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,53 @@
+from multiprocessing.managers import public_methods
+import threading
+import unittest
+
+from quest_bot.columnar_player_manager import ColumnarQuestPlayerManager
+from quest_bot.player_state import LockedPlayerManager
+
+
+class FakePlayerManager:
+    def __init__(self, test):
+        self._test = test
+        self.gold = 0
+
+    def add_gold(self, gold):
+        # Nothing else can get the lock while a call is running
+        acquired = []
+        thread = threading.Thread(target=lambda: acquired.append(self._test.locked_player_manager.lock.acquire(False)))
+        thread.start()
+        thread.join()
+        self._test.assertEqual(acquired, [False])
+
+        self.gold += gold
+        return self.gold
+
+    def _private(self):
+        pass
+
+
+class TestPlayerState(unittest.TestCase):
+    def setUp(self):
+        self.player_manager = FakePlayerManager(self)
+        self.locked_player_manager = LockedPlayerManager(self.player_manager)
+
+    def test_exposed(self):
+        self.assertEqual(public_methods(self.locked_player_manager), ['add_gold'])
+        with self.assertRaises(AttributeError):
+            self.locked_player_manager._private()
+
+    def test_columnar_aggregates_exposed(self):
+        player_manager = ColumnarQuestPlayerManager.__new__(ColumnarQuestPlayerManager)
+        exposed = public_methods(LockedPlayerManager(player_manager))
+        self.assertIn('top_gold', exposed)
+        self.assertIn('level_histogram', exposed)
+
+    def test_calls_locked(self):
+        self.assertEqual(self.locked_player_manager.add_gold(5), 5)
+        self.assertEqual(self.locked_player_manager.gold, 5)
+        self.assertTrue(self.locked_player_manager.lock.acquire(False))
+        self.locked_player_manager.lock.release()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,6 +2,7 @@ import unittest
 from unittest.mock import MagicMock, patch
 patch.object = patch.object
 
+import settings
 from twitch.twitch_bot import TwitchBot
 
 
@@ -21,7 +22,7 @@ class TestQuestBot(unittest.TestCase):
         self.player_manager_mock = MagicMock()
 
         with patch('twitch.twitch_bot.PlayerManager', return_value=self.player_manager_mock):
-            with patch('utils.irc_bot.socket.socket', return_value=self.socket_mock):
+            with patch('utils.irc_connection.socket.socket', return_value=self.socket_mock):
                 self.bot = TwitchBot('BotName', 'OwnerName', 'oauth:something')
 
     def test_login(self):
@@ -71,6 +72,53 @@ class TestQuestBot(unittest.TestCase):
 
         self.assertEqual(pong_mock.call_count, 1, 'Pong not sent after receiving ping.')
 
+    def test_fast_reject(self):
+        self.bot.channel_manager.enable_auto_join('somechannel')
+        channel = self.bot.channel_manager.channels['somechannel']
+        channel.check_commands = MagicMock()
+        tags = '@badges=;color=;display-name=Pleb;mod=0;subscriber=0;user-type= '
+
+        with patch('twitch.twitch_bot.IRCMessage') as message_mock:
+            self.bot.handle_msg(tags + ':pleb!pleb@pleb.tmi.twitch.tv PRIVMSG #somechannel :Just chatting :)')
+            self.bot.handle_msg(tags + ':pleb!pleb@pleb.tmi.twitch.tv PRIVMSG #unknownchannel :!quest')
+            message_mock.assert_not_called()
+        self.assertEqual(self.bot.lines_fast_rejected, 2)
+
+        self.bot.handle_msg(tags + ':pleb!pleb@pleb.tmi.twitch.tv PRIVMSG #somechannel :!quest')
+        self.bot.handle_msg(':tmi.twitch.tv NOTICE #somechannel :Talk PRIVMSG #somechannel :text')
+        channel.check_commands.assert_called_once_with('Pleb', '!quest', False, False)
+        self.assertEqual(self.bot.lines_received, 4)
+        self.assertEqual(self.bot.lines_fast_rejected, 2)
+
+    def test_unknown_command(self):
+        self.bot.channel_manager.enable_auto_join('somechannel')
+        channel = self.bot.channel_manager.channels['somechannel']
+        channel.check_commands = MagicMock()
+        prefix = '@display-name=Pleb;mod=0;subscriber=0 :pleb!pleb@pleb.tmi.twitch.tv PRIVMSG #somechannel :'
+
+        self.bot.handle_msg(prefix + '!uptime')
+        channel.check_commands.assert_not_called()
+
+        self.bot.handle_msg(prefix + '!QUEST')
+        channel.check_commands.assert_called_once_with('Pleb', '!QUEST', False, False)
+
+    def test_mod_send_budget(self):
+        self.assertTrue(self.bot.is_mod('botname'), 'Bot is always the broadcaster of its own channel.')
+        self.assertFalse(self.bot.is_mod('somechannel'))
+        self.assertEqual(self.bot.send_buckets('somechannel')[0].capacity, settings.IRC_SEND_LIMIT)
+
+        self.bot.handle_msg('@badges=moderator/1;color=;display-name=BotName;emote-sets=0;mod=1;subscriber=0;'
+                            'user-type=mod :tmi.twitch.tv USERSTATE #somechannel')
+        self.assertTrue(self.bot.is_mod('somechannel'))
+        self.assertEqual(self.bot.send_buckets('somechannel')[0].capacity, settings.IRC_MOD_SEND_LIMIT)
+        self.assertNotIn(self.bot.send_bucket, self.bot.send_buckets('somechannel'))
+        self.assertEqual(self.bot.send_buckets('otherchannel')[0].capacity, settings.IRC_SEND_LIMIT)
+
+        self.bot.handle_msg('@badges=;color=;display-name=BotName;emote-sets=0;mod=0;subscriber=0;'
+                            'user-type= :tmi.twitch.tv USERSTATE #somechannel')
+        self.assertFalse(self.bot.is_mod('somechannel'))
+        self.assertEqual(self.bot.send_buckets('somechannel')[0].capacity, settings.IRC_SEND_LIMIT)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -75,6 +75,17 @@ class TestQuestManager(unittest.TestCase):
         self.assertSequenceEqual(quest.party, [self.player1, self.player2, self.player3])
         self.assertIn(type(quest), QUEST_LIST[3])
 
+    def test_shared_commands(self):
+        other_quest_manager = QuestManager(MagicMock())
+        self.quest_manager.enable_questing()
+        other_quest_manager.enable_questing()
+        self.assertIs(self.quest_manager.commands.command_set, other_quest_manager.commands.command_set)
+
+        self.quest_manager.commands.execute_command(self.player1, '!quest')
+        self.assertIs(self.quest_manager.commands.command_set,
+                      QuestManager.state_commands[QuestState.forming_party])
+        self.assertIs(other_quest_manager.quest_state, QuestState.ready)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,121 @@
+import unittest
+
+from utils.send_queue import CONTROL_LANE, SendPriority, SendQueue, TokenBucket
+
+
+class TestTokenBucket(unittest.TestCase):
+    def test_burst_then_window(self):
+        bucket = TokenBucket(3, 30)
+        for now in [0, 1, 2]:
+            self.assertEqual(bucket.next_available_time(now), now)
+            bucket.consume(now)
+
+        self.assertEqual(bucket.next_available_time(3), 30, 'First token returns a full period after it was spent.')
+        self.assertEqual(bucket.next_available_time(30), 30)
+        bucket.consume(30)
+        self.assertEqual(bucket.next_available_time(30), 31)
+
+    def test_lowered_capacity(self):
+        bucket = TokenBucket(3, 30)
+        for now in [0, 1, 2]:
+            bucket.consume(now)
+        bucket.capacity = 1
+        self.assertEqual(bucket.next_available_time(3), 32, 'Every extra spent token must return first.')
+
+
+class TestSendQueue(unittest.TestCase):
+    def pop_ready(self, now):
+        return [msg_str for _, msg_str in self.send_queue.pop_ready(now)]
+
+    def setUp(self):
+        self.shared_bucket = TokenBucket(2, 10)
+        self.whisper_bucket = TokenBucket(1, 1)
+        self.send_queue = SendQueue(
+            lambda lane_key: [self.whisper_bucket] if lane_key == 'whisper' else [self.shared_bucket],
+            deadlines={SendPriority.info: 5}, coalesce_window=1, duplicate_window=30)
+
+    def test_empty(self):
+        self.assertEqual(self.pop_ready(0), [])
+        self.assertIsNone(self.send_queue.next_ready_time(0))
+
+    def test_rate_limited(self):
+        for msg_str in ['a', 'b', 'c']:
+            self.send_queue.put(msg_str, 'channel')
+
+        self.assertEqual(self.pop_ready(0), ['a', 'b'])
+        self.assertEqual(self.send_queue.next_ready_time(0), 10)
+        self.assertEqual(self.pop_ready(9), [])
+        self.assertEqual(self.pop_ready(10), ['c'])
+        self.assertIsNone(self.send_queue.next_ready_time(10))
+
+    def test_lanes_independent(self):
+        for msg_str in ['a', 'b', 'c']:
+            self.send_queue.put(msg_str, 'channel')
+        self.send_queue.put('w1', 'whisper')
+        self.send_queue.put('w2', 'whisper')
+
+        self.assertEqual(self.send_queue.pop_ready(0), [('channel', 'a'), ('channel', 'b'), ('whisper', 'w1')])
+        self.assertEqual(self.send_queue.next_ready_time(0), 1)
+        self.assertEqual(self.pop_ready(1), ['w2'])
+        self.assertEqual(len(self.send_queue), 1)
+
+    def test_priority(self):
+        self.send_queue.put('info', 'channel', SendPriority.info, now=0)
+        self.send_queue.put('result1', 'channel', SendPriority.result, now=0)
+        self.send_queue.put('result2', 'other_channel', SendPriority.result, now=0)
+        self.send_queue.put('PONG', CONTROL_LANE, SendPriority.pong, now=0)
+
+        self.assertEqual(self.pop_ready(0), ['PONG', 'result1', 'result2'])
+        self.assertEqual(len(self.send_queue), 1, 'Info message should wait for the rate limit.')
+
+    def test_stale_dropped(self):
+        self.send_queue.put('result1', 'channel', SendPriority.result, now=0)
+        self.send_queue.put('result2', 'channel', SendPriority.result, now=0)
+        self.send_queue.put('info', 'channel', SendPriority.info, now=0)
+        self.send_queue.put('result3', 'channel', SendPriority.result, now=0)
+
+        self.assertEqual(self.pop_ready(0), ['result1', 'result2'])
+        self.assertEqual(self.pop_ready(10), ['result3'])
+        self.assertEqual(self.pop_ready(20), [], 'Info message should have gone stale.')
+        self.assertEqual(self.send_queue.dropped, 1)
+        self.assertEqual(len(self.send_queue), 0)
+
+    def test_coalesce(self):
+        for name, now in [('A', 0), ('B', 0.5), ('A', 0.6), ('C', 0.9)]:
+            self.send_queue.put('Sorry {}, on cooldown ({} left).'.format('{}', 10 - now), 'channel',
+                                SendPriority.info, now=now, coalesce_key='cooldown', coalesce_name=name)
+        self.send_queue.put('Sorry {}, on cooldown.', 'other_channel', SendPriority.info, now=0,
+                            coalesce_key='cooldown', coalesce_name='D')
+
+        self.assertEqual(self.pop_ready(0.9), [], 'Should wait for more repeats to coalesce.')
+        self.assertEqual(self.pop_ready(1),
+                         ['Sorry A, B, and C, on cooldown (9.1 left).', 'Sorry D, on cooldown.'])
+        self.assertEqual(self.send_queue.coalesced, 3)
+
+    def test_duplicates_suppressed(self):
+        self.send_queue.put('Try whispering', 'whisper', SendPriority.info, now=0)
+        self.send_queue.put('Try whispering', 'whisper', SendPriority.info, now=0)
+        self.assertEqual(self.pop_ready(0), ['Try whispering'])
+
+        self.send_queue.put('Try whispering', 'whisper', SendPriority.info, now=2)
+        self.assertEqual(self.pop_ready(2), [], 'Recently sent message should be suppressed.')
+        self.send_queue.put('Try whispering', 'channel', SendPriority.info, now=2)
+        self.assertEqual(self.pop_ready(2), ['Try whispering'], 'Other lanes are independent.')
+        self.assertEqual(self.send_queue.coalesced, 2)
+
+        self.send_queue.put('PONG', CONTROL_LANE, SendPriority.pong, now=2)
+        self.assertEqual(self.pop_ready(2), ['PONG'])
+        self.send_queue.put('PONG', CONTROL_LANE, SendPriority.pong, now=3)
+        self.assertEqual(self.pop_ready(3), ['PONG'], 'Control messages are never suppressed.')
+
+        self.send_queue.put('X has won the duel!', 'channel', SendPriority.result, now=12)
+        self.send_queue.put('X has won the duel!', 'channel', SendPriority.result, now=12)
+        self.assertEqual(self.pop_ready(12), ['X has won the duel!', 'X has won the duel!'],
+                         'Repeated results are never suppressed.')
+
+        self.send_queue.put('Try whispering', 'whisper', SendPriority.info, now=31)
+        self.assertEqual(self.pop_ready(31), ['Try whispering'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,174 @@
+import os
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+import settings
+from utils.storage import (create_store, JSONDirectoryStore, migrate_stores, SnapshotStore, SQLiteStore,
+                           STALE_TEMP_AGE)
+
+
+class TestStorage(unittest.TestCase):
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.json_path = os.path.join(temp_dir.name, 'players')
+        self.database_path = os.path.join(temp_dir.name, 'xelabot.db')
+        self.snapshot_path = os.path.join(temp_dir.name, 'players.snapshot')
+
+        for name, value in [('DATABASE_PATH', self.database_path), ('STORAGE_BACKEND', 'sqlite')]:
+            patcher = patch.object(settings, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_json_round_trip(self):
+        store = JSONDirectoryStore(self.json_path)
+        self.assertEqual(list(store.load_all()), [])
+
+        with store.batch():
+            store.save('player1', {'name': 'player1', 'gold': 5})
+        store.save('player1', {'name': 'player1', 'gold': 10})
+        self.assertEqual(list(store.load_all()), [{'name': 'player1', 'gold': 10}])
+        self.assertEqual(store.names(), ['player1'])
+        self.assertEqual(store.load('player1'), {'name': 'player1', 'gold': 10})
+        self.assertIsNone(store.load('player2'))
+
+    def test_json_crash_recovery(self):
+        store = JSONDirectoryStore(self.json_path)
+        store.names()
+        store.save('player1', {'name': 'player1'})
+        self.assertEqual(os.listdir(self.json_path), ['player1.txt'], 'No temporary file should be left behind.')
+
+        for filename, contents in [('player2.txt', '{"name": "pla'), ('player3.txt', '[]'),
+                                   ('player4.txt.tmp', '{"name": "player4"}'), ('player5.txt.tmp', '{"name": "pl')]:
+            with open(os.path.join(self.json_path, filename), 'w') as write_file:
+                write_file.write(contents)
+        # Only temporary files too old to still be being written are removed
+        crashed_time = time.time() - STALE_TEMP_AGE - 1
+        os.utime(os.path.join(self.json_path, 'player4.txt.tmp'), (crashed_time, crashed_time))
+
+        self.assertEqual(list(store.load_all()), [{'name': 'player1'}])
+        self.assertEqual(sorted(os.listdir(self.json_path)),
+                         ['player1.txt', 'player2.txt.corrupt', 'player3.txt.corrupt', 'player5.txt.tmp'])
+        self.assertEqual(store.names(), ['player1'])
+
+    def test_sqlite_batch(self):
+        store = SQLiteStore(self.database_path, 'players')
+        self.addCleanup(store.close)
+
+        with store.batch():
+            store.save('player1', {'name': 'player1', 'gold': 5})
+            store.save('player2', {'name': 'player2', 'gold': 7})
+        store.save('player1', {'name': 'player1', 'gold': 10})
+
+        with self.assertRaises(ValueError):
+            with store.batch():
+                store.save('player3', {'name': 'player3'})
+                raise ValueError
+        self.assertEqual(sorted(data['gold'] for data in store.load_all()), [7, 10],
+                         'A batch that fails is rolled back as a whole.')
+
+        other_store = SQLiteStore(self.database_path, 'players')
+        self.addCleanup(other_store.close)
+        self.assertEqual(len(other_store.load_all()), 2)
+        self.assertEqual(sorted(other_store.names()), ['player1', 'player2'])
+        self.assertEqual(other_store.load('player2'), {'name': 'player2', 'gold': 7})
+        self.assertIsNone(other_store.load('player3'))
+        self.assertEqual(other_store.connect().execute('PRAGMA journal_mode').fetchone()[0], 'wal')
+
+    def test_migration(self):
+        os.makedirs(self.json_path)
+        json_store = JSONDirectoryStore(self.json_path)
+        json_store.save('Player1', {'name': 'Player1', 'gold': 5})
+        json_store.save('player2', {'name': 'player2', 'gold': 7})
+        json_store.save('nameless', {'gold': 9})
+
+        store = create_store('players', self.json_path)
+        self.addCleanup(store.close)
+        self.assertIsInstance(store, SQLiteStore)
+        self.assertEqual(sorted(data['name'] for data in store.load_all()), ['Player1', 'player2'])
+        self.assertFalse(os.path.exists(self.json_path))
+        self.assertTrue(os.path.isdir(self.json_path + settings.MIGRATED_SUFFIX))
+
+        # Only runs once, even if the folder comes back
+        os.makedirs(self.json_path)
+        json_store.save('player3', {'name': 'player3'})
+        other_store = create_store('players', self.json_path)
+        self.addCleanup(other_store.close)
+        self.assertEqual(len(other_store.load_all()), 2)
+
+    def test_migrate_stores(self):
+        os.makedirs(self.json_path)
+        JSONDirectoryStore(self.json_path).save('player1', {'name': 'Player1'})
+
+        with patch.object(settings, 'PLAYER_DATA_PATH', self.json_path), \
+                patch.object(settings, 'CHANNEL_DATA_PATH', os.path.join(os.path.dirname(self.json_path), 'channels')):
+            migrate_stores()
+        self.assertTrue(os.path.isdir(self.json_path + settings.MIGRATED_SUFFIX))
+
+        store = SQLiteStore(self.database_path, 'players')
+        self.addCleanup(store.close)
+        self.assertEqual(store.load_all(), [{'name': 'Player1'}])
+
+    def test_snapshot_round_trip(self):
+        store = SnapshotStore(self.snapshot_path)
+        self.addCleanup(store.close)
+        self.assertTrue(store.is_empty())
+
+        player1 = {'name': 'Player1', 'gold': 5, 'exp': 1.5, 'items': {'Sword': 1, 'Shield': 2}, 'flags': [None, True]}
+        with store.batch():
+            store.save('player1', player1)
+            store.save('player2', {'name': 'player2', 'gold': -7, 'items': {'Sword': 1}})
+        self.assertEqual(store.load('player1'), player1)
+
+        store.save('player2', {'name': 'player2', 'gold': 9, 'items': {}})
+        store.save('player3', {'name': 'pläyer3'})
+        with self.assertRaises(ValueError):
+            with store.batch():
+                store.save('player4', {'name': 'player4'})
+                raise ValueError
+
+        other_store = SnapshotStore(self.snapshot_path)
+        self.addCleanup(other_store.close)
+        self.assertEqual(other_store.names(), ['player1', 'player2', 'player3'])
+        self.assertEqual(other_store.load('player1'), player1, 'Unchanged records are copied over as they were.')
+        self.assertEqual(other_store.load('player2'), {'name': 'player2', 'gold': 9, 'items': {}})
+        self.assertEqual(other_store.load('player3'), {'name': 'pläyer3'})
+        self.assertIsNone(other_store.load('player4'))
+        self.assertEqual(len(other_store.load_all()), 3)
+        self.assertFalse(os.path.exists(self.snapshot_path + '.tmp'))
+
+    def test_snapshot_corrupt(self):
+        with open(self.snapshot_path, 'wb') as write_file:
+            write_file.write(b'not a snapshot at all, just some bytes')
+
+        store = SnapshotStore(self.snapshot_path)
+        self.addCleanup(store.close)
+        self.assertEqual(store.names(), [])
+        self.assertTrue(os.path.exists(self.snapshot_path + '.corrupt'))
+
+        store.save('player1', {'name': 'player1'})
+        with self.assertRaises(ValueError):
+            store.save('player2', {'name': 'player\0'})
+        self.assertEqual(store.names(), ['player1'])
+        reopened_store = SnapshotStore(self.snapshot_path)
+        self.addCleanup(reopened_store.close)
+        self.assertEqual(reopened_store.load_all(), [{'name': 'player1'}])
+
+    def test_snapshot_migration(self):
+        os.makedirs(self.json_path)
+        JSONDirectoryStore(self.json_path).save('player1', {'name': 'Player1', 'gold': 5})
+
+        with patch.object(settings, 'STORAGE_BACKEND', 'snapshot'), \
+                patch.object(settings, 'DATA_FOLDER', os.path.dirname(self.snapshot_path)):
+            store = create_store('players', self.json_path)
+        self.addCleanup(store.close)
+        self.assertIsInstance(store, SnapshotStore)
+        self.assertEqual(store.path, self.snapshot_path)
+        self.assertEqual(store.load_all(), [{'name': 'Player1', 'gold': 5}])
+        self.assertTrue(os.path.isdir(self.json_path + settings.MIGRATED_SUFFIX))
+
+
+if __name__ == '__main__':
+    unittest.main()
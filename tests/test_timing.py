@@ -0,0 +1,90 @@
+import unittest
+from unittest.mock import MagicMock, patch
+
+from utils.clock import FakeClock
+from utils.timing import Timer
+
+
+class TestTimer(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        clock_patcher = patch.object(Timer, 'clock', self.clock)
+        clock_patcher.start()
+        self.addCleanup(clock_patcher.stop)
+
+        heap_patcher = patch.object(Timer, 'heap', [])
+        heap_patcher.start()
+        self.addCleanup(heap_patcher.stop)
+        Timer.stale_entries = 0
+
+    def check_at(self, now):
+        self.clock.time = now
+        Timer.check_timers()
+
+    def test_order(self):
+        calls = []
+        for duration in [3, 1, 2, 1]:
+            Timer(duration, lambda duration=duration: calls.append(duration))
+
+        self.check_at(0.5)
+        self.assertEqual(calls, [], 'Timers complete only once their duration has passed.')
+        self.check_at(2.5)
+        self.assertEqual(calls, [1, 1, 2])
+        self.check_at(10)
+        self.assertEqual(calls, [1, 1, 2, 3])
+        self.assertEqual(Timer.heap, [])
+
+    def test_cancel(self):
+        callback = MagicMock()
+        timer = Timer(1, callback)
+        timer.cancel()
+        timer.cancel()
+
+        self.check_at(2)
+        callback.assert_not_called()
+        self.assertEqual(Timer.heap, [])
+        self.assertEqual(Timer.stale_entries, 0)
+
+    def test_set(self):
+        callback = MagicMock()
+        timer = Timer(10, callback)
+        self.clock.advance(1)
+        timer.set(2)
+        self.assertEqual(timer.remaining(), 2)
+
+        self.check_at(3.5)
+        callback.assert_called_once_with()
+
+        timer.set(1)
+        self.check_at(10)
+        self.assertEqual(callback.call_count, 1, 'Completed timers should not be revived.')
+
+    def test_canceled_by_earlier_callback(self):
+        second_callback = MagicMock()
+        second_timer = Timer(2, second_callback)
+        Timer(1, second_timer.cancel)
+
+        self.check_at(5)
+        second_callback.assert_not_called()
+
+    def test_next_deadline(self):
+        self.assertIsNone(Timer.next_deadline())
+        first_timer = Timer(1, MagicMock())
+        Timer(3, MagicMock())
+        self.assertEqual(Timer.next_deadline(), 1)
+
+        first_timer.cancel()
+        self.assertEqual(Timer.next_deadline(), 3)
+        self.check_at(3)
+        self.assertIsNone(Timer.next_deadline(), 'Timers complete exactly at their deadline.')
+
+    def test_stale_entries_compacted(self):
+        timer = Timer(1, MagicMock())
+        Timer(5, MagicMock())
+        for duration in range(10):
+            timer.set(duration + 2)
+        self.assertLessEqual(len(Timer.heap), 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
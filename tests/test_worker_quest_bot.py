@@ -0,0 +1,60 @@
+import queue
+import unittest
+from unittest.mock import MagicMock, patch
+
+from quest_bot.worker_channel_manager import channel_worker
+from quest_bot.worker_quest_bot import WorkerQuestBot
+
+
+class TestWorkerQuestBot(unittest.TestCase):
+    def setUp(self):
+        channel_save_patcher = patch('twitch.channel_manager.ChannelManager.save_channel_data')
+        channel_load_patcher = patch('twitch.channel_manager.ChannelManager.load_channel_data')
+        for patcher in [channel_save_patcher, channel_load_patcher]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.player_state_mock = MagicMock()
+        self.inboxes = [queue.Queue(), queue.Queue()]
+        with patch('quest_bot.worker_quest_bot.PlayerStateManager', return_value=self.player_state_mock):
+            with patch('utils.irc_connection.socket.socket', return_value=MagicMock()):
+                self.bot = WorkerQuestBot('BotName', 'OwnerName', 'oauth:something', 0, self.inboxes, 'address')
+
+        self.owned_channel = next(channel_name for channel_name in ['a', 'b', 'c', 'd', 'e', 'f']
+                                  if channel_worker(channel_name, 2) == 0)
+        self.other_channel = next(channel_name for channel_name in ['a', 'b', 'c', 'd', 'e', 'f']
+                                  if channel_worker(channel_name, 2) == 1)
+
+    def test_shared_player_manager(self):
+        self.player_state_mock.connect.assert_called_once_with()
+        self.assertIs(self.bot.player_manager, self.player_state_mock.player_manager.return_value)
+
+    def test_split_rate_limits(self):
+        self.assertEqual(self.bot.join_queue.bucket.capacity, 25)
+        self.assertEqual([bucket.capacity for bucket in self.bot.whisper_send_buckets], [1, 50])
+
+        with self.assertRaises(ValueError):
+            with patch('quest_bot.worker_quest_bot.PlayerStateManager'):
+                WorkerQuestBot('BotName', 'OwnerName', 'oauth:something', 0, [queue.Queue() for _ in range(4)],
+                               'address')
+
+    def test_join_routed_to_owner(self):
+        self.bot.channel_manager.join_channel(self.owned_channel)
+        self.bot.channel_manager.join_channel(self.other_channel)
+
+        self.assertEqual(list(self.bot.join_queue.channels), [self.owned_channel])
+        self.assertNotIn(self.other_channel, self.bot.channel_manager.channel_settings)
+        self.assertEqual(self.inboxes[1].get_nowait(), ('join', self.other_channel))
+
+    def test_inbox(self):
+        self.inboxes[0].put(('join', self.owned_channel))
+        with patch('quest_bot.worker_quest_bot.Timer') as timer_mock:
+            self.bot.check_inbox()
+
+        self.assertEqual(list(self.bot.join_queue.channels), [self.owned_channel])
+        self.assertTrue(self.bot.channel_manager.channel_settings[self.owned_channel]['auto_join'])
+        timer_mock.assert_called_once_with(1, self.bot.check_inbox)
+
+
+if __name__ == '__main__':
+    unittest.main()
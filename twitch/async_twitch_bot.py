@@ -0,0 +1,15 @@
+from .twitch_bot import TwitchBot
+from utils.async_irc_bot import AsyncIRCBot
+
+
+class AsyncTwitchBot(TwitchBot, AsyncIRCBot):
+    """
+    Twitch bot that runs on an asyncio event loop. Batched joins are sent by the send task.
+    """
+    def join_channel(self, channel_name):
+        """
+        Queue joining another Twitch channel and wake the send task to join it.
+        :param channel_name: str - The channel to join
+        """
+        super().join_channel(channel_name)
+        self.send_ready.set()
@@ -1,5 +1,6 @@
 import settings
 from utils.command_set import CommandSet
+from utils.send_queue import SendPriority
 
 
 class Channel:
@@ -13,12 +14,15 @@ class Channel:
             '!requestleave': self.request_leave
         })
 
-    def send_msg(self, msg):
+    def send_msg(self, msg, priority=SendPriority.result, coalesce_key=None, coalesce_name=None):
         """
         Makes the bot send a message in the current channel.
-        :param msg: str - The message to send.
+        :param msg: str - The message to send, or a template with a single {} if coalescing
+        :param priority: SendPriority - How urgent the message is
+        :param coalesce_key: hashable - Repeats with the same key in this channel are merged into one message
+        :param coalesce_name: str - The name to fill the template with, joined with the names of merged repeats
         """
-        self.channel_manager.bot.send_msg(self.owner, msg)
+        self.channel_manager.bot.send_msg(self.owner, msg, priority, coalesce_key, coalesce_name)
 
     def check_commands(self, display_name, msg, is_mod, is_sub):
         """
@@ -33,13 +37,26 @@ class Channel:
             is_mod = True
             is_sub = True
 
+        # Split the message once for every command set
+        command, params = CommandSet.tokenize(msg)
+        self.dispatch_commands(display_name, command, params, is_mod, is_sub)
+
+    def dispatch_commands(self, display_name, command, params, is_mod, is_sub):
+        """
+        Run the handlers of every command list whose requirements are met.
+        :param display_name: str - The display name of the command sender
+        :param command: str - The lowercase command word, starting with "!"
+        :param params: str - The rest of the message
+        :param is_mod: bool - Whether the sender is a mod or the channel owner
+        :param is_sub: bool - Whether the sender is a sub or the channel owner
+        """
         if is_mod:
-            self.mod_commands.execute_command(display_name, msg)
+            self.mod_commands.dispatch(display_name, command, params)
         else:
-            if self.mod_commands.has_command(msg):
-                self.channel_manager.bot.send_whisper(display_name, 'That\'s a mod-only command.')
+            if command in self.mod_commands.get_table():
+                self.channel_manager.bot.send_whisper(display_name, 'That\'s a mod-only command.', SendPriority.info)
 
-        self.commands.execute_command(display_name, msg)
+        self.commands.dispatch(display_name, command, params)
 
     def request_join(self, display_name):
         """
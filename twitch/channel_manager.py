@@ -1,10 +1,10 @@
 from copy import deepcopy
 import json
-import os
 import urllib.request
 
 from .channel import Channel
 from utils.logger import log, log_error
+from utils.storage import create_store
 
 
 import settings
@@ -66,6 +66,7 @@ class ChannelManager:
         self.bot = bot
         self.channels = self.ChannelDict(self)
         self.channel_settings = self.ChannelSettingsDict(self)
+        self.store = create_store('channels', settings.CHANNEL_DATA_PATH)
 
         self.load_channel_data()
 
@@ -74,13 +75,12 @@ class ChannelManager:
         Loads all valid channel settings data from persistent storage into the ChannelManager.
         """
         # Load up all the existing channel information
-        if not os.path.exists(settings.CHANNEL_DATA_PATH):
-            os.makedirs(settings.CHANNEL_DATA_PATH)
-        for filename in os.listdir(settings.CHANNEL_DATA_PATH):
-            with open(os.path.join(settings.CHANNEL_DATA_PATH, filename)) as read_file:
-                channel_data = json.load(read_file)
-
+        for channel_data in self.store.load_all():
             # 'name' is a required field
+            if 'name' not in channel_data:
+                log('Skipping channel data with no name: {}'.format(channel_data))
+                continue
+
             # On initial opening this is empty and just contains default values
             channel_settings = self.channel_settings[channel_data['name']]
 
@@ -88,16 +88,13 @@ class ChannelManager:
                 if key in channel_data:
                     channel_settings[key] = channel_data[key]
 
-    @staticmethod
-    def save_channel_data(channel_name, channel_data):
+    def save_channel_data(self, channel_name, channel_data):
         """
         Saves a specific channel to persistent storage.
         :param channel_name: str - The owner of the channel you want to save
         :param channel_data: dict - The channel data you are saving
         """
-        channel_name = channel_name.lower()
-        with open(os.path.join(settings.CHANNEL_DATA_PATH, channel_name + '.txt'), 'w') as channel_file:
-            json.dump(channel_data, channel_file, indent=4, sort_keys=True)
+        self.store.save(channel_name.lower(), channel_data)
 
     def save_channel(self, channel_name):
         """
@@ -1,9 +1,10 @@
 from copy import deepcopy
-import json
-import os
 
 
 import settings
+from utils.logger import log_error
+from utils.storage import create_store
+from utils.timing import Timer
 
 
 class PlayerManager:
@@ -13,8 +14,8 @@ class PlayerManager:
 
     class PlayerDict(dict):
         """
-        A dictionary that, when indexed at a non-existent player username, still returns a default player data
-        object that that can later be saved to persistent storage on edit.
+        A dictionary that, when indexed at a player username that isn't loaded yet, loads the player from persistent
+        storage, or returns a default player data object that can later be saved to persistent storage on edit.
         """
         def __init__(self, player_manager):
             super().__init__()
@@ -25,50 +26,136 @@ class PlayerManager:
             if player_name != lower_player_name:
                 return self[lower_player_name]
 
-            player_data = deepcopy(self.player_manager.default_player)
-            player_data['name'] = player_name
+            stored_data = self.player_manager.load_stored_player(player_name)
+            player_data = self.player_manager.create_player(player_name, stored_data)
             self[player_name] = player_data
 
             return player_data
 
-    def __init__(self, bot):
+    def __init__(self, bot, flush_on_timer=True):
+        """
+        :param bot: TwitchBot - The bot the players are in, or None if it isn't tied to one
+        :param flush_on_timer: bool - Whether changed players are written by a timer on the bot's update loop. If
+                                      False, whoever owns this has to call flush itself
+        """
         self.bot = bot
         self.players = self.PlayerDict(self)
+        self.store = create_store('players', settings.PLAYER_DATA_PATH)
+        # Names of stored players that aren't loaded yet, lowercase, to the name of their record. Players are only
+        # read the first time they're used, and new players never touch storage
+        self.unloaded_players = {}
+
+        # Names of players changed since they were last written, in the order they were first changed
+        self.dirty_players = {}
+        self.flush_on_timer = flush_on_timer
+        self.flush_timer = None
 
         self.load_player_data()
 
     def load_player_data(self):
         """
-        Loads all valid data from database into the PlayerManager.
+        Finds every player in persistent storage without reading any of them, then replays any changes that were
+        made after they were stored.
+        """
+        self.unloaded_players = {name.lower(): name for name in self.store.names()}
+        self.replay_journal()
+
+    def replay_journal(self):
+        """
+        Reapplies changes that were journaled but not yet stored when the bot last stopped. By default, changes are
+        only ever stored directly. Override this!
+        """
+
+    def load_stored_player(self, username):
+        """
+        Reads a player from persistent storage the first time they're used.
+        :param username: str - The lowercase name of the player
+        :return: dict - The stored player data, or None if the player was never stored
+        """
+        record_name = self.unloaded_players.pop(username, None)
+        if record_name is None:
+            return None
+
+        return self.store.load(record_name)
+
+    def create_player(self, username, stored_data):
+        """
+        Makes the data of a player the first time they're used, from a copy of default_player.
+        :param username: str - The lowercase name of the player
+        :param stored_data: dict - The stored player data, or None if the player was never stored
+        :return: dict - The player data, with only the keys of default_player
         """
-        # Load up all the existing channel information
-        if not os.path.exists(settings.PLAYER_DATA_PATH):
-            os.makedirs(settings.PLAYER_DATA_PATH)
-        for filename in os.listdir(settings.PLAYER_DATA_PATH):
-            with open(os.path.join(settings.PLAYER_DATA_PATH, filename)) as read_file:
-                player_data = json.load(read_file)
+        player_data = deepcopy(self.default_player)
+        player_data['name'] = username
 
-            player_settings = self.players[player_data['name']]
+        if stored_data is not None:
+            for key in player_data:
+                if key in stored_data:
+                    player_data[key] = stored_data[key]
 
-            for key in player_settings:
-                if key in player_data:
-                    player_settings[key] = player_data[key]
+        return player_data
 
-    @staticmethod
-    def save_player_data(username, data):
+    def save_player_data(self, username, data):
         """
         Saves a specific player's data to persistent storage.
         :param username: str - The player whose data you want to save
         :param data: dict - The player data you are saving
         """
-        with open(os.path.join(settings.PLAYER_DATA_PATH, username + '.txt'), 'w') as player_file:
-            json.dump(data, player_file, indent=4, sort_keys=True)
+        self.store.save(username, data)
 
     def save_player(self, username):
         """
-        Saves a specific player's data to persistent storage.
+        Marks a specific player's data to be saved to persistent storage with the next batch, at most
+        PLAYER_SAVE_DELAY seconds from now.
         :param username: str - The player whose data you want to save
         """
-        player = self.players[username]
+        self.save_players([username])
+
+    def save_players(self, usernames):
+        """
+        Marks several players' data to be saved to persistent storage with the next batch.
+        :param usernames: list<str> - The players whose data you want to save
+        """
+        # Names are stored lowercase, so every spelling of a name is the same record
+        for username in usernames:
+            self.dirty_players[username.lower()] = None
+
+        if self.flush_on_timer and self.flush_timer is None:
+            self.flush_timer = Timer(settings.PLAYER_SAVE_DELAY, self.flush)
+
+    def flush(self):
+        """
+        Writes every player changed since the last flush in one batch. Players that fail to write are kept for the
+        next flush.
+        """
+        self.flush_timer = None
+
+        # Swapped out first, so players changed while writing are kept for the next flush
+        dirty_players, self.dirty_players = self.dirty_players, {}
+        self.write_players([(username, self.players[username]) for username in dirty_players])
 
-        self.save_player_data(username, player)
+        if self.dirty_players and self.flush_on_timer:
+            self.flush_timer = Timer(settings.PLAYER_SAVE_DELAY, self.flush)
+
+    def write_players(self, players):
+        """
+        Saves players to persistent storage in one batch. Players that fail to write are marked to be saved again.
+        :param players: list<tuple<str, dict>> - The name and data of each player
+        :return: bool - True if every player was written
+        """
+        failed_players = []
+        try:
+            with self.store.batch():
+                for username, data in players:
+                    try:
+                        self.save_player_data(username, data)
+                    except Exception as e:
+                        log_error('Failed to save player {}'.format(username), e)
+                        failed_players.append(username)
+        except Exception as e:
+            log_error('Failed to save players', e)
+            failed_players = [username for username, _ in players]
+
+        for username in failed_players:
+            self.dirty_players[username] = None
+        return not failed_players
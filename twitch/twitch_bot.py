@@ -1,11 +1,16 @@
-import time
-
 from .channel_manager import ChannelManager
 from .player_manager import PlayerManager
 import settings
 from utils.command_set import CommandSet
 from utils.irc_bot import IRCBot
+from utils.irc_message import IRCMessage
+from utils.join_queue import JoinQueue
 from utils.logger import log, log_error
+from utils.send_queue import SendPriority, TokenBucket
+
+
+# Whispers are sent through the bot's own channel but have their own rate limits
+WHISPER_LANE = '/w'
 
 
 class TwitchBot(IRCBot):
@@ -19,12 +24,28 @@ class TwitchBot(IRCBot):
         :param oauth: str - The bot's oauth
         """
         super().__init__(bot_name, owner_name, oauth)
-        self.last_join_send_time = 0
+
+        # Channels are joined from the run loop in batches as the join rate limit allows
+        self.join_queue = JoinQueue(TokenBucket(settings.IRC_JOIN_LIMIT, settings.IRC_JOIN_PERIOD),
+                                    settings.IRC_MAX_LINE_LENGTH, self.clock)
+
+        # Channels where the bot is a mod or the broadcaster, as reported by USERSTATE
+        self.mod_channels = {bot_name.lower()}
+        # Each channel gets its own budget sized by whether we're a mod there
+        self.channel_send_buckets = {}
+        # Account-wide caps: every channel message counts against the mod limit, non-mod channels also against the
+        # non-mod limit (self.send_bucket)
+        self.mod_send_bucket = TokenBucket(settings.IRC_MOD_SEND_LIMIT, settings.IRC_SEND_PERIOD)
+        self.whisper_send_buckets = [TokenBucket(limit, period) for limit, period in settings.IRC_WHISPER_LIMITS]
 
         self.channel_manager = None
         self.player_manager = None
         self.whisper_commands = None
 
+        # How many lines came in, and how many of those were chat that was thrown away before being parsed
+        self.lines_received = 0
+        self.lines_fast_rejected = 0
+
         self.initialize()
 
     def initialize(self):
@@ -43,11 +64,6 @@ class TwitchBot(IRCBot):
         """
         super().connect()
 
-        # Enable twitch badges/tags
-        self.send_raw_instant('CAP REQ :twitch.tv/tags')
-        # Enable whisper receiving
-        self.send_raw_instant('CAP REQ :twitch.tv/commands')
-
         # If the user hasn't changed from defaults, error out
         if self.owner_name == settings.DEFAULT_SETTINGS_JSON[settings.REQUIRED_STRING]['BROADCASTER_NAME'] or (
                 self.nickname == settings.DEFAULT_SETTINGS_JSON[settings.REQUIRED_STRING]['BOT_NAME']):
@@ -59,50 +75,192 @@ class TwitchBot(IRCBot):
 
         self.channel_manager.join_all_auto_join()
 
-    def send_msg(self, channel_name, msg_str):
+    def login(self, connection):
+        """
+        Logs in on a newly opened connection and asks for Twitch's extra message info.
+        :param connection: IRCConnection - The connection to log in on
+        """
+        super().login(connection)
+
+        # Enable twitch badges/tags
+        connection.send('CAP REQ :twitch.tv/tags')
+        # Enable whisper receiving
+        connection.send('CAP REQ :twitch.tv/commands')
+
+    def shutdown(self):
+        """
+        Writes out any player changes that are still waiting for their batch.
         """
-        Send a message to a Twitch channel.
+        try:
+            if self.player_manager is not None:
+                self.player_manager.flush()
+        except Exception as e:
+            log_error('Failed to save players on shutdown', e)
+
+    def is_mod(self, channel_name):
+        """
+        Whether the bot is a mod or the broadcaster in a channel.
+        :param channel_name: str - The channel to check
+        :return: bool - True if the bot gets the mod rate limits in that channel
+        """
+        return channel_name in self.mod_channels
+
+    def set_mod(self, channel_name, is_mod):
+        """
+        Records the bot's mod status in a channel and resizes that channel's send budget to match.
+        :param channel_name: str - The channel the status applies to
+        :param is_mod: bool - Whether the bot is a mod or the broadcaster there
+        """
+        channel_name = channel_name.lower()
+        if is_mod == self.is_mod(channel_name):
+            return
+
+        if is_mod:
+            self.mod_channels.add(channel_name)
+        else:
+            self.mod_channels.discard(channel_name)
+        log('Mod status in #{}: {}'.format(channel_name, is_mod))
+
+        if channel_name in self.channel_send_buckets:
+            self.channel_send_buckets[channel_name].capacity = (
+                settings.IRC_MOD_SEND_LIMIT if is_mod else settings.IRC_SEND_LIMIT)
+        self.send_queue.update_lane(channel_name)
+
+    def channel_send_bucket(self, channel_name):
+        """
+        Gets the send budget of a single channel, creating it the first time it's needed.
+        :param channel_name: str - The channel to get the budget of
+        :return: TokenBucket - The channel's budget
+        """
+        bucket = self.channel_send_buckets.get(channel_name)
+        if bucket is None:
+            capacity = settings.IRC_MOD_SEND_LIMIT if self.is_mod(channel_name) else settings.IRC_SEND_LIMIT
+            bucket = TokenBucket(capacity, settings.IRC_SEND_PERIOD)
+            self.channel_send_buckets[channel_name] = bucket
+        return bucket
+
+    def send_buckets(self, lane_key):
+        """
+        Gets the rate limits that apply to messages sent to a channel, or to whispers.
+        :param lane_key: str - The channel name, or WHISPER_LANE
+        :return: list<TokenBucket> - Every bucket a message in that lane needs a token from
+        """
+        if lane_key == WHISPER_LANE:
+            return self.whisper_send_buckets
+        if self.is_mod(lane_key):
+            return [self.channel_send_bucket(lane_key), self.mod_send_bucket]
+        return [self.channel_send_bucket(lane_key), self.send_bucket, self.mod_send_bucket]
+
+    def send_msg(self, channel_name, msg_str, priority=SendPriority.result, coalesce_key=None, coalesce_name=None):
+        """
+        Queue a message to a Twitch channel.
         :param channel_name: str - The channel to post a message to
-        :param msg_str: str - The message to post
+        :param msg_str: str - The message to post, or a template with a single {} if coalescing
+        :param priority: SendPriority - How urgent the message is
+        :param coalesce_key: hashable - Repeats with the same key in this channel are merged into one message
+        :param coalesce_name: str - The name to fill the template with, joined with the names of merged repeats
         """
-        self.send_raw('PRIVMSG #{} :{}'.format(channel_name, msg_str))
+        channel_name = channel_name.lower()
+        self.send_raw('PRIVMSG #{} :{}'.format(channel_name, msg_str), channel_name, priority,
+                      coalesce_key, coalesce_name)
 
-    def send_whisper(self, target_name, msg_str):
+    def send_whisper(self, target_name, msg_str, priority=SendPriority.whisper):
         """
-        Send a whisper to a user.
+        Queue a whisper to a user.
         :param target_name: str - The user to whisper
         :param msg_str: str - The message to whisper
+        :param priority: SendPriority - How urgent the message is
         """
         target_name = target_name.lower()
         # It doesn't matter what channel we use to send whispers, but our own channel is safest
-        self.send_msg(self.nickname, '/w {} {}'.format(target_name, msg_str))
+        self.send_raw(
+            'PRIVMSG #{} :/w {} {}'.format(self.nickname.lower(), target_name, msg_str), WHISPER_LANE, priority)
 
-    def join_channel(self, channel_name):
+    def connection_for(self, lane_key):
         """
-        Join another Twitch channel.
-        :param channel_name: str - The channel to join
+        Gets the connection that messages in a lane should be sent on. Whispers go out with our own channel.
+        :param lane_key: hashable - A channel name, WHISPER_LANE or a control lane for a specific connection
+        :return: IRCConnection - The connection to send on
         """
-        # Wait until the cooldown is over
-        required_wait_time = settings.IRC_JOIN_SLEEP_TIME - (time.time() - self.last_join_send_time)
-        if required_wait_time > 0:
-            time.sleep(required_wait_time)
+        if lane_key == WHISPER_LANE:
+            lane_key = self.nickname.lower()
+        return super().connection_for(lane_key)
 
-        self.send_raw_instant('JOIN #' + channel_name)
+    def move_channel(self, channel_name, old_connection):
+        """
+        Moves a channel that the pool reassigned to a different connection by leaving it on the old one and joining
+        it again on the new one.
+        :param channel_name: str - The channel that moved
+        :param old_connection: IRCConnection - The connection it was joined on
+        """
+        # Connections removed from the pool are already closed, which leaves every channel on them
+        if not old_connection.closed:
+            old_connection.send('PART #' + channel_name)
+        self.join_queue.put(channel_name)
 
-        # Block further joins until we set the send_join_cooldown event
-        self.last_join_send_time = time.time()
+    def flush_joins(self):
+        """
+        Joins as many queued channels as the join rate limit allows, each on the connection the pool assigns it to.
+        """
+        channel_names = self.join_queue.pop_channels()
+        if not channel_names:
+            return
 
-    def leave_channel(self, channel_name):
+        batch = set(channel_names)
+        for channel_name in channel_names:
+            for moved_name, old_connection in self.pool.assign(channel_name):
+                # Channels in this batch haven't been joined anywhere yet
+                if moved_name not in batch:
+                    self.move_channel(moved_name, old_connection)
+
+        connection_channels = {}
+        for channel_name in channel_names:
+            connection = self.pool.channel_connections[channel_name]
+            connection_channels.setdefault(connection, []).append(channel_name)
+        for connection, connection_channel_names in connection_channels.items():
+            for join_msg in self.join_queue.pack(connection_channel_names):
+                connection.send(join_msg)
+
+    def flush_send_queue(self):
+        """
+        Sends every queued message and batch of joins that the rate limits currently allow.
         """
-        Join another Twitch channel.
+        self.flush_joins()
+
+        super().flush_send_queue()
+
+    def next_send_time(self):
+        """
+        Gets when the next queued message or join can be sent.
+        :return: float - The time the next message or join can be sent, or None if nothing is queued
+        """
+        next_times = [next_time for next_time in [self.join_queue.next_ready_time(), super().next_send_time()]
+                      if next_time is not None]
+        return min(next_times) if next_times else None
+
+    def join_channel(self, channel_name):
+        """
+        Queue joining another Twitch channel. Returns immediately; the join is sent with others in a batch.
         :param channel_name: str - The channel to join
         """
-        self.send_raw_instant('PART #' + channel_name)
+        self.join_queue.put(channel_name.lower())
+
+    def leave_channel(self, channel_name):
+        """
+        Leave another Twitch channel.
+        :param channel_name: str - The channel to leave
+        """
+        channel_name = channel_name.lower()
+        self.join_queue.discard(channel_name)
+        self.connection_for(channel_name).send('PART #' + channel_name)
+        for moved_name, old_connection in self.pool.unassign(channel_name):
+            self.move_channel(moved_name, old_connection)
 
     @staticmethod
-    def parse_tags(raw_tags):
+    def parse_msg(message):
         """
-        Given raw tags, parse them and return some crucial user info. Looks something like this:
+        Given an IRC message that is either a whisper or a channel message, parse out useful information. Tags look
+        something like this:
 
             badges=broadcaster/1,turbo/1;color=#573894;display-name=BroadcastingDude;emotes=;mod=0;room-id=12345678;
                 subscriber=0;turbo=1;user-id=12345678;user-type=
@@ -110,58 +268,18 @@ class TwitchBot(IRCBot):
             badges=moderator/1;color=#00FF7F;display-name=CoolMod;emotes=;mod=1;room-id=12345678;subscriber=0;
                 turbo=0;user-id=87654321;user-type=mod
 
-            badges=;color=#8A2BE2;display-name=Pleb;emotes=;mod=0;room-id=12345678;subscriber=0;turbo=0;
-                user-id=11111111;user-type=
-
-        :param raw_tags: str - The first token of the IRC message, without the @ symbol
-        :return: tuple<str, bool, bool> - A tuple of user info: (display_name, is_mod, is_sub)
-        """
-        display_name = None
-        is_mod = False
-        is_sub = False
-        for raw_tag in raw_tags.split(';'):
-            raw_tag_split = raw_tag.split('=')
-
-            key = raw_tag_split[0]
-            value = raw_tag_split[1]
-
-            if key == 'display-name':
-                display_name = value
-            elif key == 'mod' and value == '1':
-                is_mod = True
-            elif key == 'subscriber' and value == '1':
-                is_sub = True
-
-        return display_name, is_mod, is_sub
-
-    @staticmethod
-    def parse_msg(raw_msg):
-        """
-        Given a raw IRC message that is either a whisper or a channel message, parse out useful information.
-        :param raw_msg: str - The IRC raw message that includes the type PRIVMSG or WHISPER
+        :param message: IRCMessage - The IRC message with the type PRIVMSG or WHISPER
         :return: tuple<str, str, str, bool, bool> - A tuple of user info:
                  (Display_Name, channel/whisper target, message, is_mod, is_sub)
         """
-        try:
-            raw_msg_tokens = raw_msg.split(maxsplit=4)
+        target_name = message.target
+        # Channel messages have channel name starting with '#', whispers have no symbol
+        if target_name.startswith('#'):
+            target_name = target_name[1:]
 
-            display_name, is_mod, is_sub = TwitchBot.parse_tags(raw_msg_tokens[0][1:])
+        return message.display_name, target_name, message.trailing, message.is_mod, message.is_sub
 
-            # If we fail to get the display name for whatever reason, get it from the raw IRC message
-            if not display_name:
-                display_name = raw_msg_tokens[1].split('!')[0][1:]
-            target_name = raw_msg_tokens[3]
-            # Channel messages have channel name starting with '#', whispers have no symbol
-            if target_name.startswith('#'):
-                target_name = target_name[1:]
-            msg = raw_msg_tokens[4][1:]
-
-            return display_name, target_name, msg, is_mod, is_sub
-        except Exception as e:
-            log_error('Unable to parse message "{}"'.format(raw_msg), e)
-            return None
-
-    def handle_channel_msg(self, raw_msg):
+    def handle_channel_msg(self, message):
         """
         Given a raw IRC message identified as a channel message, handle it as necessary. Looks something like this:
 
@@ -170,14 +288,18 @@ class TwitchBot(IRCBot):
             @badges=;color=#8A2BE2;display-name=Pleb;emotes=;mod=0;room-id=12345678;subscriber=0;turbo=0;
                 user-id=11111111;user-type= :pleb!pleb@pleb.tmi.twitch.tv PRIVMSG #sometwitchuser :Normal user.
 
-        :param raw_msg: str - The IRC raw message that includes the type PRIVMSG
+        :param message: IRCMessage - The IRC message with the type PRIVMSG
         """
-        display_name, channel_name, msg, is_mod, is_sub = self.parse_msg(raw_msg)
+        display_name, channel_name, msg, is_mod, is_sub = self.parse_msg(message)
 
         # All channel commands start with '!'
         if msg[0] != '!':
             return
 
+        # Drop commands that no command set anywhere has, like those meant for other bots
+        if not CommandSet.is_registered(CommandSet.tokenize(msg)[0]):
+            return
+
         # Skip the message if it's from an invalid channel; Xelabot should only be listening to channels it's in.
         if channel_name not in self.channel_manager.channel_settings:
             log('Skipping message from channel not added to Channel Manager: #' + channel_name)
@@ -187,9 +309,24 @@ class TwitchBot(IRCBot):
         self.channel_manager.channels[channel_name].check_commands(display_name, msg, is_mod, is_sub)
 
         if msg in self.whisper_commands.exact_match_commands:
-            self.send_whisper(display_name, 'Try whispering that command to Xelabot instead!')
+            self.send_whisper(display_name, 'Try whispering that command to Xelabot instead!', SendPriority.info)
+
+    def handle_user_state(self, message):
+        """
+        Given a raw IRC message identified as the bot's own user state in a channel, record whether it is a mod there.
+        Looks something like this:
+
+            @badges=moderator/1;color=;display-name=Xelabot;emote-sets=0;mod=1;subscriber=0;user-type=mod
+                :tmi.twitch.tv USERSTATE #sometwitchuser
 
-    def handle_whisper(self, raw_msg):
+        :param message: IRCMessage - The IRC message with the type USERSTATE
+        """
+        channel_name = message.target[1:]
+
+        # The broadcaster badge doesn't set the mod tag, but the bot is always the broadcaster of its own channel
+        self.set_mod(channel_name, message.is_mod or channel_name == self.nickname.lower())
+
+    def handle_whisper(self, message):
         """
         Given a raw IRC message identified as a whisper, handle it as necessary. Looks something like this:
 
@@ -198,9 +335,9 @@ class TwitchBot(IRCBot):
             @badges=;color=#8A2BE2;display-name=Pleb;emotes=;message-id=2;thread-id=12348765_56784321;turbo=0;
                 user-id=11111111;user-type= :pleb!pleb@pleb.tmi.twitch.tv WHISPER xelabot :This is a whisper.
 
-        :param raw_msg: str - The IRC raw message that includes the type WHISPER
+        :param message: IRCMessage - The IRC message with the type WHISPER
         """
-        display_name, whisper_target, msg, is_mod, is_sub = self.parse_msg(raw_msg)
+        display_name, whisper_target, msg, is_mod, is_sub = self.parse_msg(message)
 
         if whisper_target.lower() != self.nickname.lower():
             log('Invalid whisper target: {}'.format(whisper_target))
@@ -208,24 +345,63 @@ class TwitchBot(IRCBot):
 
         self.whisper_commands.execute_command(display_name, msg)
 
+    def receiving_primary(self):
+        """
+        Whether the message being handled arrived on the primary connection. Twitch delivers whispers on every
+        connection, so they're only handled once from there.
+        :return: bool - True unless the message came in on another connection of the pool
+        """
+        return self.receiving_connection is None or self.receiving_connection is self.pool.primary
+
+    def is_ignored_chat(self, raw_msg):
+        """
+        Checks whether a raw line is a channel message that can't be a command, without parsing tags, lowercasing or
+        splitting it. Only the position of the command and the first character of the chat message are looked at.
+        :param raw_msg: str - The IRC raw message
+        :return: bool - True if the line is chat that doesn't start with '!' or is from a channel we don't handle
+        """
+        # Skip past the tags and the prefix, neither of which can contain a space
+        command_start = 0
+        if raw_msg.startswith('@'):
+            command_start = raw_msg.find(' ') + 1
+        if raw_msg.startswith(':', command_start):
+            command_start = raw_msg.find(' ', command_start) + 1
+        if command_start <= 0 or not raw_msg.startswith('PRIVMSG #', command_start):
+            return False
+
+        channel_start = command_start + len('PRIVMSG #')
+        msg_start = raw_msg.find(' :', channel_start)
+        if msg_start < 0:
+            return False
+
+        # All channel commands start with '!'
+        if not raw_msg.startswith('!', msg_start + 2):
+            return True
+        return raw_msg[channel_start:msg_start] not in self.channel_manager.channel_settings
+
     def handle_msg(self, raw_msg):
         """
-        Given an arbitrary IRC message, handle it as necessary.
+        Given an arbitrary IRC message, handle it as necessary. Chat that can't be a command is dropped right away.
         :param raw_msg: str - The IRC raw message
         """
+        self.lines_received += 1
+        if self.is_ignored_chat(raw_msg):
+            self.lines_fast_rejected += 1
+            return
+
         super().handle_msg(raw_msg)
 
-        lower_msg = raw_msg.lower()
-        if lower_msg in [':tmi.twitch.tv notice * :error logging in', ':tmi.twitch.tv notice * :login unsuccessful']:
+        message = IRCMessage(raw_msg)
+        if message.command == 'NOTICE' and raw_msg.lower() in [
+                ':tmi.twitch.tv notice * :error logging in', ':tmi.twitch.tv notice * :login unsuccessful']:
             raise RuntimeError('Failed to login, most likely invalid login credentials.')
 
-        raw_msg_tokens = raw_msg.split()
-        if len(raw_msg_tokens) < 3:
-            return
         try:
-            if raw_msg_tokens[2] == 'PRIVMSG':
-                self.handle_channel_msg(raw_msg)
-            elif raw_msg_tokens[2] == 'WHISPER':
-                self.handle_whisper(raw_msg)
+            if message.command == 'PRIVMSG':
+                self.handle_channel_msg(message)
+            elif message.command == 'WHISPER' and self.receiving_primary():
+                self.handle_whisper(message)
+            elif message.command == 'USERSTATE':
+                self.handle_user_state(message)
         except Exception as e:
             log_error('IRC message handler error', e)
@@ -0,0 +1,180 @@
+import asyncio
+
+from utils.async_irc_connection import AsyncIRCConnection
+from utils.irc_bot import IRCBot
+from utils.logger import log
+from utils.send_queue import SendPriority
+from utils.timing import Timer
+
+
+class AsyncIRCBot(IRCBot):
+    """
+    Runs the IRC bot on an asyncio event loop. Receiving on each connection, timer callbacks and rate-limited sends
+    each run as their own task, so waiting on a rate limit never holds up handling input.
+    """
+    def __init__(self, bot_name, owner_name, oauth):
+        """
+        :param bot_name: str - The bot's username
+        :param owner_name: str - The owner's username
+        :param oauth: str - The bot's oauth
+        """
+        super().__init__(bot_name, owner_name, oauth)
+
+        self.loop = asyncio.new_event_loop()
+        # Before Python 3.10, events and connections bind to the thread's event loop when they're created, so it has
+        # to be this one before any of them are
+        asyncio.set_event_loop(self.loop)
+        # Every running task, and the first failure among them
+        self.tasks = set()
+        self.failure = None
+
+        # Wakes send_loop when a message is queued
+        self.send_ready = asyncio.Event()
+        # Wakes timer_loop when handling input may have started or changed a timer
+        self.timers_changed = asyncio.Event()
+
+    def create_connection(self, index):
+        """
+        Creates a connection for the pool. Connections added while running open and start reading in their own task;
+        anything sent on them before then is held.
+        :param index: int - The position of the connection in the pool
+        :return: AsyncIRCConnection - The new connection
+        """
+        connection = AsyncIRCConnection(index)
+        if self.connected:
+            log('Opening IRC connection {}...'.format(index))
+            self.login(connection)
+            connection.recv_task = self.start_task(self.recv_loop(connection))
+        return connection
+
+    def open_connection(self, connection):
+        """
+        Opens a connection to the IRC server and logs in on it.
+        :param connection: AsyncIRCConnection - The connection to open
+        """
+        self.loop.run_until_complete(connection.open())
+        self.login(connection)
+
+    def send_raw(self, msg_str, lane_key=None, priority=SendPriority.result, coalesce_key=None, coalesce_name=None):
+        """
+        Queues a raw IRC message to be sent by send_loop as soon as the rate limit allows. Returns immediately.
+        :param msg_str: str - The raw IRC message to be sent, or a template with a single {} if coalescing
+        :param lane_key: hashable - Which lane's rate limits apply to this message
+        :param priority: SendPriority - How urgent the message is compared to everything else queued
+        :param coalesce_key: hashable - Repeats with the same key in the same lane are merged into one message
+        :param coalesce_name: str - The name to fill the template with, joined with the names of merged repeats
+        """
+        super().send_raw(msg_str, lane_key, priority, coalesce_key, coalesce_name)
+        self.send_ready.set()
+
+    async def send_loop(self):
+        """
+        Sends queued messages as the rate limits allow, sleeping until either the next one is ready or a new one is
+        queued.
+        """
+        while True:
+            self.send_ready.clear()
+            self.flush_send_queue()
+            for connection in list(self.pool.connections):
+                await connection.drain()
+
+            next_send_time = self.next_send_time()
+            timeout = None if next_send_time is None else max(0, next_send_time - self.clock.now())
+            try:
+                await asyncio.wait_for(self.send_ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def recv_loop(self, connection):
+        """
+        Handles every complete IRC line from a connection as soon as it arrives.
+        :param connection: AsyncIRCConnection - The connection to read from, opened first if it isn't yet
+        """
+        if connection.writer is None:
+            await connection.open()
+
+        while True:
+            raw_msgs = await connection.recv()
+
+            self.receiving_connection = connection
+            try:
+                for raw_msg in raw_msgs:
+                    self.handle_msg(raw_msg)
+            finally:
+                self.receiving_connection = None
+                self.timers_changed.set()
+
+    async def timer_loop(self):
+        """
+        Activates the callbacks of completed timers, sleeping until either the next one completes or input was handled.
+        """
+        while True:
+            self.timers_changed.clear()
+            Timer.check_timers()
+
+            next_deadline = Timer.next_deadline()
+            timeout = None if next_deadline is None else max(0, next_deadline - Timer.clock.now())
+            try:
+                await asyncio.wait_for(self.timers_changed.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def create_tasks(self):
+        """
+        Creates the coroutines that make up the bot. Subclasses can add their own.
+        :return: list<coroutine> - The coroutines to run concurrently
+        """
+        return [self.recv_loop(connection) for connection in self.pool.connections] + [
+            self.timer_loop(), self.send_loop()]
+
+    def start_task(self, coroutine):
+        """
+        Runs a coroutine alongside the others. If it fails, the whole bot stops.
+        :param coroutine: coroutine - The coroutine to run
+        :return: asyncio.Task - The running task
+        """
+        task = self.loop.create_task(coroutine)
+        self.tasks.add(task)
+        task.add_done_callback(self.task_done)
+        return task
+
+    def task_done(self, task):
+        """
+        Forgets a finished task and records its failure, if it's the first one.
+        :param task: asyncio.Task - The finished task
+        """
+        self.tasks.discard(task)
+        if task.cancelled() or self.failure.done():
+            return
+        if task.exception() is not None:
+            self.failure.set_exception(task.exception())
+
+    async def run_tasks(self):
+        """
+        Runs every task until one of them fails, then cancels the rest and re-raises the failure.
+        """
+        self.failure = self.loop.create_future()
+        for coroutine in self.create_tasks():
+            self.start_task(coroutine)
+
+        try:
+            await self.failure
+        finally:
+            tasks = list(self.tasks)
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def run(self):
+        """
+        Core update loop for the bot. Runs all tasks on the event loop until one of them fails.
+        """
+        try:
+            self.loop.run_until_complete(self.run_tasks())
+        finally:
+            for connection in self.pool.connections:
+                connection.close()
+            self.loop.close()
+            self.shutdown()
+
+        raise RuntimeError('Exited execution loop.')
@@ -0,0 +1,76 @@
+import asyncio
+
+import settings
+from utils.line_buffer import LineBuffer
+from utils.logger import log
+
+
+class AsyncIRCConnection:
+    """
+    A single asyncio connection to the IRC server. Messages sent before it's open are held until it is.
+    """
+    def __init__(self, index):
+        """
+        :param index: int - The position of this connection in its pool
+        """
+        self.index = index
+        self.closed = False
+
+        self.reader = None
+        self.writer = None
+        # Raw bytes sent before the connection was open
+        self.unsent = []
+        # The task reading from this connection, cancelled when it's closed
+        self.recv_task = None
+
+        # Bytes received that don't make up a complete line yet
+        self.recv_buffer = LineBuffer()
+
+    async def open(self):
+        """
+        Opens the connection to the IRC server and sends everything that was held until now.
+        """
+        self.reader, self.writer = await asyncio.open_connection(settings.IRC_SERVER, settings.IRC_PORT)
+        for data in self.unsent:
+            self.writer.write(data)
+        self.unsent = []
+
+    def close(self):
+        """
+        Closes the connection and stops reading from it. Anything still unsent or unread is lost.
+        """
+        self.closed = True
+        if self.recv_task is not None:
+            self.recv_task.cancel()
+        if self.writer is not None:
+            self.writer.close()
+
+    def send(self, msg_str):
+        """
+        Sends a raw IRC message with no rate-limiting concerns.
+        :param msg_str: str - The raw IRC message to be sent
+        """
+        log('{}> {}'.format(self.index or '', msg_str))
+        data = bytes(msg_str + '\r\n', 'UTF-8')
+        if self.writer is None:
+            self.unsent.append(data)
+        else:
+            self.writer.write(data)
+
+    async def drain(self):
+        """
+        Waits until the write buffer is flushed enough to keep writing.
+        """
+        if self.writer is not None:
+            await self.writer.drain()
+
+    async def recv(self):
+        """
+        Waits for input and frames it into complete IRC lines.
+        :return: list<str> - The complete raw IRC messages received
+        """
+        buf = await self.reader.read(settings.IRC_RECV_SIZE)
+        if not buf:
+            raise Exception('Socket connection broken.')
+
+        return self.recv_buffer.feed(buf)
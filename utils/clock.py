@@ -0,0 +1,40 @@
+import time
+
+
+class Clock:
+    """
+    The time source shared by timers and rate limiters. Uses a monotonic clock, so a step in the system time never
+    fires every timer at once or stalls sends for the size of the jump.
+    """
+    def now(self):
+        """
+        :return: float - The current time in seconds, only meaningful compared to other times from this clock
+        """
+        return time.monotonic()
+
+
+class FakeClock(Clock):
+    """
+    A clock that only moves when told to, for testing and benchmarking timers and rate limiters without sleeping.
+    """
+    def __init__(self, start=0):
+        """
+        :param start: float - The time the clock starts at
+        """
+        self.time = start
+
+    def now(self):
+        """
+        :return: float - The time the clock was last set or advanced to
+        """
+        return self.time
+
+    def advance(self, seconds):
+        """
+        Moves the clock forward.
+        :param seconds: float - How far to move it
+        """
+        self.time += seconds
+
+
+default_clock = Clock()
@@ -1,5 +1,14 @@
 import msvcrt
+import signal
+import sys
 
 
 def pause():
     msvcrt.getch()
+
+
+def exit_on_terminate():
+    """
+    Turns being terminated into a normal exit, so cleanup like saving players still runs.
+    """
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
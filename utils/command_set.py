@@ -1,7 +1,18 @@
+from collections import Counter, OrderedDict
+import weakref
+
 from utils.logger import log_error
 
 
 class CommandSet:
+    """
+    Commands triggered by the first word of a message, along with child command sets whose commands are run as well.
+    The whole tree is compiled into a single table from command word to handlers the first time it's used, and only
+    recompiled after the tree changes.
+    """
+    # How many live command sets have each command word, so words that nothing handles can be dropped up front
+    registered_words = Counter()
+
     def __init__(self, exact_match_commands=None, starts_with_commands=None, children=None):
         if exact_match_commands is None:
             self.exact_match_commands = {}
@@ -12,34 +23,132 @@ class CommandSet:
         else:
             self.starts_with_commands = starts_with_commands
 
-        # Commands are executed on all children as well
-        if children is None:
-            self.children = set()
-        else:
-            self.children = children
+        # Commands are executed on all children as well, in the order the children were added. Used as an ordered set
+        self.children = OrderedDict()
+        # Every command set this one is a child of, so changes can invalidate their tables too
+        self.parents = []
+        # dict<str, tuple<tuple<Function, bool>>> - Handlers by command word, each with whether it takes params
+        self.table = None
 
-    def execute_command(self, display_name, full_command):
+        # Every word this set has commands for. Released from the global index once the set is garbage collected
+        self.words = set()
+        self.register_words(self.exact_match_commands)
+        self.register_words(self.starts_with_commands)
+        weakref.finalize(self, CommandSet.release_words, self.words)
+
+        if children is not None:
+            for child in children:
+                self.add_command_set(child)
+
+    @staticmethod
+    def tokenize(full_command):
         """
-        Given a command, try to execute it if it matches any of the given patterns.
-        :param display_name: str - The user executing the command
+        Splits a message into its command word and the rest of the message.
         :param full_command: str - The entire message
+        :return: tuple<str, str> - The lowercase command word and the parameters, which may be empty
         """
         split_command = full_command.split(maxsplit=1)
-        command = split_command[0].lower()
+        command = split_command[0].lower() if split_command else ''
         params = split_command[1] if len(split_command) == 2 else ''
+        return command, params
+
+    def register_words(self, words):
+        """
+        Adds any new command words of this set to the global index.
+        :param words: iterable<str> - The command words
+        """
+        for word in words:
+            if word not in self.words:
+                self.words.add(word)
+                CommandSet.registered_words[word] += 1
+
+    @staticmethod
+    def release_words(words):
+        """
+        Removes the command words of a set that's gone from the global index.
+        :param words: set<str> - The command words
+        """
+        for word in words:
+            CommandSet.registered_words[word] -= 1
+            if CommandSet.registered_words[word] <= 0:
+                del CommandSet.registered_words[word]
+
+    @staticmethod
+    def is_registered(command):
+        """
+        Checks the global index for any command set, anywhere, with a command word.
+        :param command: str - The lowercase command word
+        :return: bool - True if some command set might handle it, False if none can
+        """
+        return command in CommandSet.registered_words
+
+    def invalidate(self):
+        """
+        Throws away the compiled table of this command set and of every command set it's a child of.
+        """
+        if self.table is None:
+            return
+
+        self.table = None
+        for parent in self.parents:
+            parent.invalidate()
+
+    def compile(self):
+        """
+        Flattens this command set and all of its children into one table. For each command word, the exact match
+        handler runs first, then the starts with handler, then the handlers of each child in order.
+        :return: dict<str, tuple<tuple<Function, bool>>> - Handlers by command word, each with whether it takes params
+        """
+        table = {}
+        for command, function in self.exact_match_commands.items():
+            table[command] = [(function, False)]
+        for command, function in self.starts_with_commands.items():
+            table.setdefault(command, []).append((function, True))
+        for child in self.children:
+            for command, handlers in child.get_table().items():
+                table.setdefault(command, []).extend(handlers)
 
-        try:
-            if command in self.exact_match_commands:
-                self.exact_match_commands[command](display_name)
+        return {command: tuple(handlers) for command, handlers in table.items()}
 
-            if command in self.starts_with_commands:
-                self.starts_with_commands[command](display_name, params)
+    def get_table(self):
+        """
+        Gets the compiled table, compiling it first if anything changed since it was last used.
+        :return: dict<str, tuple<tuple<Function, bool>>> - Handlers by command word, each with whether it takes params
+        """
+        if self.table is None:
+            self.table = self.compile()
+        return self.table
+
+    def dispatch(self, display_name, command, params, owner=None):
+        """
+        Runs every handler for a command word that was already split out of the message.
+        :param display_name: str - The user executing the command
+        :param command: str - The lowercase command word
+        :param params: str - The rest of the message
+        :param owner: object - Passed to every handler before the display name, for command sets shared between owners
+        """
+        handlers = self.get_table().get(command)
+        if handlers is None:
+            return
 
-            # Recursively run the commands of all children
-            for child in self.children:
-                child.execute_command(display_name, full_command)
-        except Exception as e:
-            log_error('Error executing command {}'.format(command), e)
+        args = (display_name,) if owner is None else (owner, display_name)
+        for function, takes_params in handlers:
+            try:
+                if takes_params:
+                    function(*args, params)
+                else:
+                    function(*args)
+            except Exception as e:
+                log_error('Error executing command {}'.format(command), e)
+
+    def execute_command(self, display_name, full_command):
+        """
+        Given a command, try to execute it if it matches any of the given patterns.
+        :param display_name: str - The user executing the command
+        :param full_command: str - The entire message
+        """
+        command, params = self.tokenize(full_command)
+        self.dispatch(display_name, command, params)
 
     def add_commands(self, exact_match_commands=None, starts_with_commands=None):
         """
@@ -49,8 +158,11 @@ class CommandSet:
         """
         if exact_match_commands:
             self.exact_match_commands.update(exact_match_commands)
+            self.register_words(exact_match_commands)
         if starts_with_commands:
             self.starts_with_commands.update(starts_with_commands)
+            self.register_words(starts_with_commands)
+        self.invalidate()
 
     def has_command(self, full_command):
         """
@@ -58,25 +170,96 @@ class CommandSet:
         :param full_command: str - The entire message
         :return: bool - True if we have this command, False otherwise
         """
-        command = full_command.split(maxsplit=1)[0].lower()
+        command = self.tokenize(full_command)[0]
         return command in self.exact_match_commands or command in self.starts_with_commands
 
     def clear_children(self):
         """
         Remove all child command sets.
         """
-        self.children = set()
+        for child in self.children:
+            child.parents.remove(self)
+        self.children = OrderedDict()
+        self.invalidate()
 
     def add_command_set(self, child):
         """
         Add a child command set.
         :param child: Commands - A child command set to add to the current set
         """
-        self.children.add(child)
+        if child in self.children:
+            return
+
+        self.children[child] = None
+        child.parents.append(self)
+        self.invalidate()
 
     def remove_command_set(self, child):
         """
         Remove a child command set.
         :param child: Commands - A child command set to remove from the current set
         """
-        self.children.discard(child)
+        if child not in self.children:
+            return
+
+        del self.children[child]
+        child.parents.remove(self)
+        self.invalidate()
+
+
+# Shared by everything that currently has no commands. Never add commands to it
+EMPTY_COMMAND_SET = CommandSet()
+
+
+class CommandBinding:
+    """
+    A command set that's shared between many owners, along with the owner its handlers run against. Handlers of a
+    shared set take the owner before the display name, so moving an owner to a different set of commands only swaps
+    references instead of building new command sets.
+    """
+    def __init__(self, command_set=EMPTY_COMMAND_SET, owner=None):
+        """
+        :param command_set: CommandSet - The commands, whose handlers take the owner first if there is one
+        :param owner: object - What the handlers run against, or None for a command set that isn't shared
+        """
+        self.command_set = command_set
+        self.owner = owner
+
+    def bind(self, command_set, owner):
+        """
+        Switches to another command set and owner.
+        :param command_set: CommandSet - The commands, whose handlers take the owner first if there is one
+        :param owner: object - What the handlers run against, or None for a command set that isn't shared
+        """
+        self.command_set = command_set
+        self.owner = owner
+
+    def unbind(self):
+        """
+        Switches to having no commands at all.
+        """
+        self.bind(EMPTY_COMMAND_SET, None)
+
+    def get_table(self):
+        """
+        :return: dict<str, tuple<tuple<Function, bool>>> - The compiled table of the bound command set
+        """
+        return self.command_set.get_table()
+
+    def dispatch(self, display_name, command, params):
+        """
+        Runs every handler for a command word that was already split out of the message against the owner.
+        :param display_name: str - The user executing the command
+        :param command: str - The lowercase command word
+        :param params: str - The rest of the message
+        """
+        self.command_set.dispatch(display_name, command, params, self.owner)
+
+    def execute_command(self, display_name, full_command):
+        """
+        Given a command, try to execute it if it matches any of the bound commands.
+        :param display_name: str - The user executing the command
+        :param full_command: str - The entire message
+        """
+        command, params = CommandSet.tokenize(full_command)
+        self.dispatch(display_name, command, params)
@@ -0,0 +1,126 @@
+import bisect
+import hashlib
+import math
+
+
+def stable_hash(key):
+    """
+    Hashes a string the same way in every process, unlike the built-in hash.
+    :param key: str - The string to hash
+    :return: int - A 64-bit hash of the string
+    """
+    return int.from_bytes(hashlib.md5(key.encode('UTF-8')).digest()[:8], 'big')
+
+
+class ConnectionPool:
+    """
+    Spreads channels over several connections with consistent hashing on the channel name. The pool grows as channels
+    are assigned and shrinks as they're unassigned, and only the channels whose owner changed have to move.
+    """
+    def __init__(self, connection_factory, channels_per_connection, max_connections, replicas):
+        """
+        :param connection_factory: Function<int, connection> - Creates the connection at a given index of the pool
+        :param channels_per_connection: int - How many channels a connection should carry before the pool grows
+        :param max_connections: int - The most connections the pool will ever open
+        :param replicas: int - Points on the hash ring per connection; more points spread channels more evenly
+        """
+        self.connection_factory = connection_factory
+        self.channels_per_connection = channels_per_connection
+        self.max_connections = max_connections
+        self.replicas = replicas
+
+        self.connections = []
+        # Sorted list of (hash, connection index)
+        self.ring = []
+        # The connection each channel was last assigned to
+        self.channel_connections = {}
+
+    @property
+    def primary(self):
+        """
+        :return: connection - The first connection, which is never removed
+        """
+        return self.connections[0]
+
+    def add_connection(self):
+        """
+        Creates another connection and adds its points to the hash ring.
+        :return: connection - The new connection
+        """
+        index = len(self.connections)
+        connection = self.connection_factory(index)
+        self.connections.append(connection)
+        for replica in range(self.replicas):
+            bisect.insort(self.ring, (stable_hash('{}-{}'.format(index, replica)), index))
+        return connection
+
+    def remove_connection(self):
+        """
+        Closes the newest connection and removes its points from the hash ring.
+        :return: connection - The removed connection
+        """
+        connection = self.connections.pop()
+        self.ring = [point for point in self.ring if point[1] != connection.index]
+        connection.close()
+        return connection
+
+    def owner(self, channel_name):
+        """
+        Gets the connection that should carry a channel.
+        :param channel_name: str - The channel to look up
+        :return: connection - The first connection clockwise from the channel on the hash ring
+        """
+        if len(self.connections) == 1:
+            return self.primary
+
+        position = bisect.bisect(self.ring, (stable_hash(channel_name), len(self.connections)))
+        return self.connections[self.ring[position % len(self.ring)][1]]
+
+    def assign(self, channel_name):
+        """
+        Records that a channel is being joined, growing the pool if it's now too full.
+        :param channel_name: str - The channel being joined
+        :return: list<tuple<str, connection>> - Channels that moved to a new connection, with their old connection
+        """
+        self.channel_connections[channel_name] = None
+        moves = self.resize()
+        self.channel_connections[channel_name] = self.owner(channel_name)
+        return moves
+
+    def unassign(self, channel_name):
+        """
+        Records that a channel was left, shrinking the pool if it's now mostly empty.
+        :param channel_name: str - The channel that was left
+        :return: list<tuple<str, connection>> - Channels that moved to a new connection, with their old connection
+        """
+        self.channel_connections.pop(channel_name, None)
+        return self.resize()
+
+    def resize(self):
+        """
+        Grows or shrinks the pool to fit the assigned channels and reassigns channels whose owner changed. Shrinks
+        only once the pool is well under capacity so a channel count on a boundary doesn't open and close
+        connections over and over.
+        :return: list<tuple<str, connection>> - Channels that moved to a new connection, with their old connection
+        """
+        channel_count = len(self.channel_connections)
+        connection_count = len(self.connections)
+
+        needed = min(self.max_connections, max(1, math.ceil(channel_count / self.channels_per_connection)))
+        while len(self.connections) < needed:
+            self.add_connection()
+        while len(self.connections) > 1 and (
+                channel_count <= (len(self.connections) - 1.5) * self.channels_per_connection):
+            self.remove_connection()
+
+        if len(self.connections) == connection_count:
+            return []
+
+        moves = []
+        for channel_name, connection in self.channel_connections.items():
+            owner = self.owner(channel_name)
+            if connection is not owner:
+                if connection is not None:
+                    moves.append((channel_name, connection))
+                self.channel_connections[channel_name] = owner
+        return moves
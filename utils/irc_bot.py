@@ -1,7 +1,10 @@
-import socket
-import time
+import select
 
 import settings
+from utils.clock import default_clock
+from utils.connection_pool import ConnectionPool
+from utils.irc_connection import IRCConnection
+from utils.send_queue import SendPriority, SendQueue, TokenBucket, control_lane
 from utils.timing import Timer
 from utils.logger import log
 
@@ -10,6 +13,9 @@ class IRCBot:
     """
     Sends and receives messages to and from IRC channels.
     """
+    # Shared by the send queue and anything else that waits on rate limits
+    clock = default_clock
+
     def __init__(self, bot_name, owner_name, oauth):
         """
         :param bot_name: str - The bot's username
@@ -20,69 +26,121 @@ class IRCBot:
         self.owner_name = owner_name
         self.oauth = oauth
 
-        self.last_message_send_time = 0
+        # Outbound messages are queued and sent from the run loop as the rate limit allows
+        self.send_bucket = TokenBucket(settings.IRC_SEND_LIMIT, settings.IRC_SEND_PERIOD)
+        self.send_queue = SendQueue(
+            self.send_buckets,
+            deadlines={SendPriority[priority]: deadline for priority, deadline in settings.IRC_SEND_DEADLINES.items()},
+            coalesce_window=settings.IRC_COALESCE_WINDOW, duplicate_window=settings.IRC_DUPLICATE_WINDOW,
+            clock=self.clock)
 
-        # Initializing socket
-        self.irc_sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.irc_sock.settimeout(settings.IRC_POLL_TIMEOUT)
+        # Channels are spread over a pool of connections; the first one is created now and opened by connect
+        self.connected = False
+        self.receiving_connection = None
+        self.pool = ConnectionPool(self.create_connection, settings.IRC_CHANNELS_PER_CONNECTION,
+                                   settings.IRC_MAX_CONNECTIONS, settings.IRC_HASH_REPLICAS)
+        self.pool.add_connection()
 
-    def send_raw_instant(self, msg_str):
+    def create_connection(self, index):
+        """
+        Creates a connection for the pool. Connections added after connecting are opened and logged in right away.
+        :param index: int - The position of the connection in the pool
+        :return: IRCConnection - The new connection
+        """
+        connection = IRCConnection(index)
+        if self.connected:
+            log('Opening IRC connection {}...'.format(index))
+            self.open_connection(connection)
+        return connection
+
+    def open_connection(self, connection):
         """
-        Sends a raw IRC message with no rate-limiting concerns.
-        :param msg_str:
-        :return:
+        Opens a connection to the IRC server and logs in on it.
+        :param connection: IRCConnection - The connection to open
         """
-        log('> ' + msg_str)
-        self.irc_sock.send(bytes(msg_str + '\r\n', 'UTF-8'))
+        connection.open()
+        self.login(connection)
 
-    def send_raw(self, msg_str):
+    def login(self, connection):
+        """
+        Logs in on a newly opened connection.
+        :param connection: IRCConnection - The connection to log in on
+        """
+        connection.send('PASS ' + self.oauth)
+        connection.send('NICK ' + self.nickname)
+
+    def send_raw_instant(self, msg_str):
         """
-        Sends a raw IRC message with post-delay to be consistent with rate-limiting.
+        Sends a raw IRC message on the primary connection with no rate-limiting concerns.
         :param msg_str: str - The raw IRC message to be sent
         """
-        # Wait until the cooldown is over
-        required_wait_time = settings.IRC_SEND_COOLDOWN - (time.time() - self.last_message_send_time)
-        if required_wait_time > 0:
-            time.sleep(required_wait_time)
+        self.pool.primary.send(msg_str)
 
-        self.send_raw_instant(msg_str)
+    def connection_for(self, lane_key):
+        """
+        Gets the connection that messages in a lane should be sent on.
+        :param lane_key: hashable - A channel name, or a control lane for a specific connection
+        :return: IRCConnection - The connection to send on
+        """
+        if isinstance(lane_key, tuple):
+            index = lane_key[1]
+            if index < len(self.pool.connections):
+                return self.pool.connections[index]
+            return self.pool.primary
+        if isinstance(lane_key, str):
+            return self.pool.channel_connections.get(lane_key) or self.pool.owner(lane_key)
+        return self.pool.primary
+
+    def send_buckets(self, lane_key):
+        """
+        Gets the rate limits that apply to a lane of outbound messages.
+        :param lane_key: hashable - The lane messages are being queued in
+        :return: list<TokenBucket> - Every bucket a message in that lane needs a token from
+        """
+        return [self.send_bucket]
 
-        # Block further messages until we set the send_msg_cooldown event
-        self.last_message_send_time = time.time()
+    def send_raw(self, msg_str, lane_key=None, priority=SendPriority.result, coalesce_key=None, coalesce_name=None):
+        """
+        Queues a raw IRC message to be sent as soon as the rate limit allows. Returns immediately.
+        :param msg_str: str - The raw IRC message to be sent, or a template with a single {} if coalescing
+        :param lane_key: hashable - Which lane's rate limits apply to this message
+        :param priority: SendPriority - How urgent the message is compared to everything else queued
+        :param coalesce_key: hashable - Repeats with the same key in the same lane are merged into one message
+        :param coalesce_name: str - The name to fill the template with, joined with the names of merged repeats
+        """
+        self.send_queue.put(msg_str, lane_key, priority, coalesce_key=coalesce_key, coalesce_name=coalesce_name)
 
-    def recv_raw(self):
+    def flush_send_queue(self):
         """
-        Receives a raw IRC message.
-        :return: str - The raw IRC message received
+        Sends every queued message that the rate limits currently allow.
         """
-        try:
-            buf = self.irc_sock.recv(settings.IRC_RECV_SIZE)
-            total_data = buf
-
-            if not buf:
-                raise Exception('Socket connection broken.')
-
-            # Keep trying to pull until there's nothing left.
-            while len(buf) == settings.IRC_RECV_SIZE:
-                buf = self.irc_sock.recv(settings.IRC_RECV_SIZE)
-                total_data += buf
-                # Sometimes there's a delay between different parts of the message
-                time.sleep(settings.IRC_CHUNK_DELAY)
-                if not buf:
-                    raise Exception('Socket connection broken.')
-            return str(total_data, encoding='UTF-8').strip('\r\n')
-        except socket.timeout:
-            # We quickly time out if there's no messages to receive as set by socket set timeout in the init
+        for lane_key, msg_str in self.send_queue.pop_ready():
+            self.connection_for(lane_key).send(msg_str)
+
+    def next_send_time(self):
+        """
+        Gets when the next queued message can be sent.
+        :return: float - The time the next message can be sent, or None if nothing is queued
+        """
+        return self.send_queue.next_ready_time()
+
+    def recv_timeout(self):
+        """
+        Gets how long to wait for input before a queued message can be sent or a timer completes.
+        :return: float - The number of seconds to wait, or None to wait until input arrives
+        """
+        deadlines = [deadline for deadline in [self.next_send_time(), Timer.next_deadline()] if deadline is not None]
+        if not deadlines:
             return None
+        return max(0, min(deadlines) - self.clock.now())
 
     def connect(self):
         """
         Connect to the IRC server.
         """
         log('Connecting to IRC service...')
-        self.irc_sock.connect((settings.IRC_SERVER, settings.IRC_PORT))
-        self.send_raw_instant('PASS ' + self.oauth)
-        self.send_raw_instant('NICK ' + self.nickname)
+        self.open_connection(self.pool.primary)
+        self.connected = True
 
     def send_pong(self, server):
         """
@@ -90,7 +148,9 @@ class IRCBot:
         :param server: str - IRC server that sent a PING
         """
         # Guaranteed to be at least two string tokens from the check in the main run loop
-        self.send_raw_instant('PONG ' + server)
+        # Answer on the connection that was pinged
+        connection = self.receiving_connection or self.pool.primary
+        self.send_raw('PONG ' + server, control_lane(connection.index), SendPriority.pong)
 
     def handle_msg(self, raw_msg):
         """
@@ -105,23 +165,48 @@ class IRCBot:
         if lower_msg.startswith('ping '):
             self.send_pong(raw_msg.split()[1])
 
-    def run(self):
+    def handle_connection(self, connection):
         """
-        Core update loop for the bot. Checks for completed timer callbacks and then handles input.
+        Handles every complete line that arrived on a connection.
+        :param connection: IRCConnection - A connection with input waiting
         """
-        while True:
-            # Check to see if any timers completed and activate their callbacks
-            Timer.check_timers()
+        raw_msgs = connection.recv()
 
-            raw_msgs = self.recv_raw()
+        # We return None if we timed out on the receive
+        if raw_msgs is None:
+            return
 
-            # We return None if we timed out on the receive in settings.IRC_POLL_TIMEOUT seconds to check our timers
-            # or if we failed to receive messages
-            if raw_msgs is None:
-                continue
-
-            # Splitting on \r\n allows reading of multiple commands with one recv
-            for raw_msg in raw_msgs.split('\r\n'):
+        self.receiving_connection = connection
+        try:
+            for raw_msg in raw_msgs:
                 self.handle_msg(raw_msg)
+        finally:
+            self.receiving_connection = None
+
+    def shutdown(self):
+        """
+        Called when the update loop stops for any reason, including crashes and signals. Override this to save
+        anything that's still only in memory!
+        """
+
+    def run(self):
+        """
+        Core update loop for the bot. Checks for completed timer callbacks and queued messages, then handles input
+        from every connection that has some.
+        """
+        try:
+            while True:
+                # Check to see if any timers completed and activate their callbacks
+                Timer.check_timers()
+                self.flush_send_queue()
+
+                # Sleeps until input arrives or the next timer or queued message is due
+                readable, _, _ = select.select(self.pool.connections, [], [], self.recv_timeout())
+                for connection in readable:
+                    # Handling input from one connection can close another
+                    if not connection.closed:
+                        self.handle_connection(connection)
+        finally:
+            self.shutdown()
 
         raise RuntimeError('Exited execution loop.')
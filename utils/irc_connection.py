@@ -0,0 +1,68 @@
+import socket
+
+import settings
+from utils.line_buffer import LineBuffer
+from utils.logger import log
+
+
+class IRCConnection:
+    """
+    A single connection to the IRC server and the partial line received on it.
+    """
+    def __init__(self, index):
+        """
+        :param index: int - The position of this connection in its pool
+        """
+        self.index = index
+        self.closed = False
+
+        # Bytes received that don't make up a complete line yet
+        self.recv_buffer = LineBuffer()
+
+        # Initializing socket
+        self.irc_sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.irc_sock.settimeout(settings.IRC_POLL_TIMEOUT)
+
+    def fileno(self):
+        """
+        Lets the connection be waited on with select.
+        :return: int - The file descriptor of the socket
+        """
+        return self.irc_sock.fileno()
+
+    def open(self):
+        """
+        Opens the connection to the IRC server.
+        """
+        self.irc_sock.connect((settings.IRC_SERVER, settings.IRC_PORT))
+
+    def close(self):
+        """
+        Closes the connection. Anything still unsent or unread is lost.
+        """
+        self.closed = True
+        self.irc_sock.close()
+
+    def send(self, msg_str):
+        """
+        Sends a raw IRC message with no rate-limiting concerns.
+        :param msg_str: str - The raw IRC message to be sent
+        """
+        log('{}> {}'.format(self.index or '', msg_str))
+        self.irc_sock.send(bytes(msg_str + '\r\n', 'UTF-8'))
+
+    def recv(self):
+        """
+        Receives whatever is available on the socket and frames it into complete IRC lines. A line that was split
+        across reads is held in the receive buffer until the rest of it arrives.
+        :return: list<str> - The complete raw IRC messages received, or None if nothing arrived before the timeout
+        """
+        try:
+            buf = self.irc_sock.recv(settings.IRC_RECV_SIZE)
+        except socket.timeout:
+            return None
+
+        if not buf:
+            raise Exception('Socket connection broken.')
+
+        return self.recv_buffer.feed(buf)
@@ -0,0 +1,196 @@
+TAG_ESCAPES = {
+    ':': ';',
+    's': ' ',
+    '\\': '\\',
+    'r': '\r',
+    'n': '\n'
+}
+
+
+def unescape_tag_value(value):
+    """
+    Decodes the escape sequences IRCv3 uses in tag values.
+    :param value: str - The raw tag value
+    :return: str - The value with \\: \\s \\\\ \\r and \\n decoded; other escaped characters stand for themselves
+    """
+    if '\\' not in value:
+        return value
+
+    chars = []
+    escaped = False
+    for char in value:
+        if escaped:
+            chars.append(TAG_ESCAPES.get(char, char))
+            escaped = False
+        elif char == '\\':
+            escaped = True
+        else:
+            chars.append(char)
+    # A trailing lone backslash is dropped
+    return ''.join(chars)
+
+
+class IRCMessage:
+    """
+    A raw IRC line with IRCv3 tags. Only the positions of each part are found up front; tags and parameters are
+    sliced out and decoded when they're read, so lines that are thrown away after a glance cost almost nothing.
+
+        @badges=moderator/1;display-name=CoolMod;mod=1 :coolmod!coolmod@coolmod.tmi.twitch.tv PRIVMSG #channel :!quest
+    """
+    __slots__ = ('raw', 'tags_end', 'prefix_start', 'prefix_end', 'command_start', 'command_end', 'trailing_start')
+
+    def __init__(self, raw):
+        """
+        :param raw: str - The raw IRC line, without the line ending
+        """
+        self.raw = raw
+
+        position = 0
+        # Tags run from after the @ up to the first space
+        if raw.startswith('@'):
+            self.tags_end = raw.find(' ')
+            if self.tags_end < 0:
+                self.tags_end = len(raw)
+            position = self.tags_end + 1
+        else:
+            self.tags_end = 0
+
+        if raw.startswith(':', position):
+            self.prefix_start = position + 1
+            self.prefix_end = raw.find(' ', position)
+            if self.prefix_end < 0:
+                self.prefix_end = len(raw)
+            position = self.prefix_end + 1
+        else:
+            self.prefix_start = self.prefix_end = position
+
+        self.command_start = position
+        self.command_end = raw.find(' ', position)
+        if self.command_end < 0:
+            self.command_end = len(raw)
+
+        # Nothing before the trailing parameter can contain ' :'
+        self.trailing_start = raw.find(' :', self.command_end)
+        if self.trailing_start >= 0:
+            self.trailing_start += 2
+
+    def __repr__(self):
+        return 'IRCMessage({!r})'.format(self.raw)
+
+    def tag(self, key):
+        """
+        Finds a single tag without splitting the others apart. Values may contain = and are unescaped.
+        :param key: str - The tag to look up
+        :return: str - The tag's value, '' if it has none, or None if the message doesn't have the tag
+        """
+        raw = self.raw
+        tags_end = self.tags_end
+        key_length = len(key)
+
+        # Jump straight to each place the key starts a tag, rather than walking every tag
+        start = 1 if raw.startswith(key, 1) else raw.find(';' + key, 1, tags_end) + 1
+        while 0 < start < tags_end:
+            value_start = start + key_length
+            if value_start >= tags_end or raw[value_start] == ';':
+                return ''
+            if raw[value_start] == '=':
+                end = raw.find(';', value_start, tags_end)
+                return unescape_tag_value(raw[value_start + 1:tags_end if end < 0 else end])
+            # Only the start of a longer key matched
+            start = raw.find(';' + key, value_start, tags_end) + 1
+
+        return None
+
+    @property
+    def prefix(self):
+        """
+        :return: str - Who sent the message, like nick!user@host, or '' if there's no prefix
+        """
+        return self.raw[self.prefix_start:self.prefix_end]
+
+    @property
+    def nick(self):
+        """
+        :return: str - The nickname from the prefix
+        """
+        end = self.raw.find('!', self.prefix_start, self.prefix_end)
+        return self.raw[self.prefix_start:self.prefix_end if end < 0 else end]
+
+    @property
+    def command(self):
+        """
+        :return: str - The IRC command or numeric, like PRIVMSG
+        """
+        return self.raw[self.command_start:self.command_end]
+
+    @property
+    def params(self):
+        """
+        :return: list<str> - Every parameter before the trailing one
+        """
+        end = len(self.raw) if self.trailing_start < 0 else self.trailing_start - 2
+        return self.raw[self.command_end:end].split()
+
+    @property
+    def target(self):
+        """
+        :return: str - The first parameter, such as #channel or a whisper target, or None if there are no parameters
+        """
+        end = len(self.raw) if self.trailing_start < 0 else self.trailing_start - 2
+        start = self.command_end + 1
+        if start >= end:
+            return None
+        target_end = self.raw.find(' ', start, end)
+        return self.raw[start:end if target_end < 0 else target_end]
+
+    @property
+    def trailing(self):
+        """
+        :return: str - The trailing parameter after ' :', such as the chat message, or None if there isn't one
+        """
+        if self.trailing_start < 0:
+            return None
+        return self.raw[self.trailing_start:]
+
+    @property
+    def display_name(self):
+        """
+        :return: str - The sender's display name, falling back to the nickname when the tag is missing or empty
+        """
+        return self.tag('display-name') or self.nick
+
+    @property
+    def is_mod(self):
+        """
+        :return: bool - Whether the sender is a mod in the channel
+        """
+        return self.tag('mod') == '1'
+
+    @property
+    def is_sub(self):
+        """
+        :return: bool - Whether the sender is subscribed to the channel
+        """
+        return self.tag('subscriber') == '1'
+
+    @property
+    def user_id(self):
+        """
+        :return: str - The sender's Twitch user ID, or None if it wasn't sent
+        """
+        return self.tag('user-id')
+
+    @property
+    def badges(self):
+        """
+        :return: dict<str, str> - The version of each of the sender's badges, by badge name
+        """
+        raw_badges = self.tag('badges')
+        if not raw_badges:
+            return {}
+
+        badges = {}
+        for raw_badge in raw_badges.split(','):
+            name, _, version = raw_badge.partition('/')
+            badges[name] = version
+        return badges
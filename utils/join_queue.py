@@ -0,0 +1,95 @@
+from collections import OrderedDict
+
+from utils.clock import default_clock
+
+
+class JoinQueue:
+    """
+    Channels waiting to be joined. Joins are packed into comma-separated JOIN lines as far as the join rate limit
+    allows, so thousands of channels take as few lines and as little time as possible.
+    """
+    def __init__(self, bucket, max_line_length, clock=default_clock):
+        """
+        :param bucket: TokenBucket - The join rate limit; every channel joined spends a token
+        :param max_line_length: int - The longest JOIN line the server accepts, including the line ending
+        :param clock: Clock - Where the current time comes from when it isn't given
+        """
+        self.bucket = bucket
+        self.clock = clock
+        self.max_line_length = max_line_length
+
+        # Used as an ordered set of channel names
+        self.channels = OrderedDict()
+
+    def __len__(self):
+        return len(self.channels)
+
+    def put(self, channel_name):
+        """
+        Queues a channel to be joined. Queuing a channel that's already waiting does nothing.
+        :param channel_name: str - The channel to join
+        """
+        self.channels[channel_name] = None
+
+    def discard(self, channel_name):
+        """
+        Stops waiting to join a channel, such as when it's left before it was joined.
+        :param channel_name: str - The channel to stop joining
+        """
+        self.channels.pop(channel_name, None)
+
+    def pop_channels(self, now=None):
+        """
+        Pops as many channels as the rate limit allows right now.
+        :param now: float - The current time, from the queue's clock if not given
+        :return: list<str> - The channels to join, in the order they were queued
+        """
+        if now is None:
+            now = self.clock.now()
+
+        channel_names = []
+        for _ in range(min(len(self.channels), self.bucket.available(now))):
+            channel_name, _ = self.channels.popitem(last=False)
+            self.bucket.consume(now)
+            channel_names.append(channel_name)
+        return channel_names
+
+    def pack(self, channel_names):
+        """
+        Packs channels into as few JOIN lines as the line length allows.
+        :param channel_names: list<str> - The channels to join
+        :return: list<str> - The raw JOIN messages to send
+        """
+        join_msgs = []
+        targets = []
+        line_length = len('JOIN \r\n')
+        for channel_name in channel_names:
+            target = '#' + channel_name
+            # Account for the separating comma after the first target
+            target_length = len(target.encode('UTF-8')) + (1 if targets else 0)
+            if targets and line_length + target_length > self.max_line_length:
+                join_msgs.append('JOIN ' + ','.join(targets))
+                targets = []
+                line_length = len('JOIN \r\n')
+                target_length -= 1
+
+            targets.append(target)
+            line_length += target_length
+
+        if targets:
+            join_msgs.append('JOIN ' + ','.join(targets))
+
+        return join_msgs
+
+    def next_ready_time(self, now=None):
+        """
+        Gets the earliest time at which a queued channel can be joined.
+        :param now: float - The current time, from the queue's clock if not given
+        :return: float - The time the next channel can be joined, or None if nothing is queued
+        """
+        if now is None:
+            now = self.clock.now()
+
+        if not self.channels:
+            return None
+        return self.bucket.next_available_time(now)
@@ -0,0 +1,111 @@
+import json
+import os
+import shutil
+
+from utils.logger import log
+
+
+class Journal:
+    """
+    An append-only file of compact JSON records, one per line. Records are appended in batches with a single fsync,
+    and the journal can be rotated aside while what it holds is folded into a snapshot somewhere else.
+    """
+    def __init__(self, path):
+        """
+        :param path: str - The journal file
+        """
+        self.path = path
+        # Where the journal is moved while its records are being folded into a snapshot
+        self.rotated_path = path + '.old'
+        # Opened the first time something is appended
+        self.file = None
+
+    def append(self, records):
+        """
+        Writes records to the end of the journal and waits for them to reach the disk.
+        :param records: list<list> - The records, each a list of JSON-serializable values
+        """
+        if not records:
+            return
+
+        if self.file is None:
+            directory = os.path.dirname(self.path)
+            if directory and not os.path.exists(directory):
+                os.makedirs(directory)
+            self.file = open(self.path, 'a')
+
+        self.file.write(''.join(json.dumps(record, separators=(',', ':')) + '\n' for record in records))
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def size(self):
+        """
+        :return: int - How many bytes the journal holds, not counting a rotated journal
+        """
+        if self.file is not None:
+            return self.file.tell()
+        if os.path.exists(self.path):
+            return os.path.getsize(self.path)
+        return 0
+
+    def close(self):
+        """
+        Closes the journal file. It's opened again by the next append.
+        """
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def rotate(self):
+        """
+        Moves the journal aside and starts an empty one. If an earlier rotated journal was never removed, the journal
+        is added to the end of it instead, so no records are lost.
+        """
+        self.close()
+        if not os.path.exists(self.path):
+            return
+
+        if os.path.exists(self.rotated_path):
+            with open(self.path) as read_file, open(self.rotated_path, 'a') as rotated_file:
+                shutil.copyfileobj(read_file, rotated_file)
+                rotated_file.flush()
+                os.fsync(rotated_file.fileno())
+            os.remove(self.path)
+        else:
+            os.replace(self.path, self.rotated_path)
+
+    def remove_rotated(self):
+        """
+        Throws away the rotated journal once everything in it is safely somewhere else.
+        """
+        if os.path.exists(self.rotated_path):
+            os.remove(self.rotated_path)
+
+    def replay(self):
+        """
+        Reads back every record, the rotated journal first. A line cut short by a crash ends that file's records and
+        is cut off the file, so later appends start on a fresh line.
+        :return: generator<list> - The records in the order they were appended
+        """
+        for path in [self.rotated_path, self.path]:
+            if not os.path.exists(path):
+                continue
+
+            # Byte offset of the end of the last whole record
+            end = 0
+            with open(path, 'rb') as read_file:
+                for line in read_file:
+                    try:
+                        # A record is only whole once its line ending was written
+                        if not line.endswith(b'\n'):
+                            raise ValueError('Missing line ending')
+                        record = json.loads(line.decode('UTF-8'))
+                    except ValueError:
+                        log('Cutting off broken record at byte {} of {}.'.format(end, path))
+                        break
+                    end += len(line)
+                    yield record
+
+            if end < os.path.getsize(path):
+                with open(path, 'r+b') as write_file:
+                    write_file.truncate(end)
@@ -0,0 +1,33 @@
+class LineBuffer:
+    """
+    Frames a raw IRC byte stream into complete lines. Any partial line at the end of a read is kept until the rest of
+    it arrives in a later read.
+    """
+    delimiter = b'\r\n'
+
+    def __init__(self):
+        self.buffer = bytearray()
+
+    def feed(self, data):
+        """
+        Adds newly received bytes to the buffer and pops off every line that is now complete.
+        :param data: bytes - The raw bytes that were just received
+        :return: list<str> - The complete, decoded lines in the order they were received, without line endings
+        """
+        self.buffer += data
+
+        end = self.buffer.rfind(self.delimiter)
+        if end == -1:
+            return []
+
+        complete = self.buffer[:end]
+        del self.buffer[:end + len(self.delimiter)]
+
+        return [str(line, encoding='UTF-8', errors='replace')
+                for line in complete.split(self.delimiter) if line]
+
+    def clear(self):
+        """
+        Throws away any partially received line, such as after a reconnect.
+        """
+        self.buffer.clear()
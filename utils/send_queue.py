@@ -0,0 +1,357 @@
+from collections import deque, OrderedDict
+import enum
+import heapq
+import itertools
+
+from utils.clock import default_clock
+from utils.logger import log
+from utils.string_parsing import list_to_string
+
+
+@enum.unique
+class SendPriority(enum.IntEnum):
+    """
+    Classes of outbound traffic, most urgent first. When the rate limits are saturated, more urgent messages are sent
+    first and less urgent ones that went stale are dropped.
+    """
+    pong = 0
+    result = 1
+    whisper = 2
+    info = 3
+
+
+# Control traffic like PONG isn't rate-limited
+CONTROL_LANE = '/control'
+
+
+def control_lane(connection_index):
+    """
+    Gets the lane for control traffic that has to go out on a specific connection.
+    :param connection_index: int - The index of the connection in its pool
+    :return: tuple<str, int> - The lane key
+    """
+    return CONTROL_LANE, connection_index
+
+
+def is_control_lane(lane_key):
+    """
+    :param lane_key: hashable - The lane key to check
+    :return: bool - Whether messages in the lane skip rate limits
+    """
+    return lane_key == CONTROL_LANE or (isinstance(lane_key, tuple) and lane_key[0] == CONTROL_LANE)
+
+
+def suppresses_duplicates(lane_key, priority):
+    """
+    Only informational replies are suppressed when repeated. A repeated result, like the same player winning two duels
+    in a row, is news every time.
+    :param lane_key: hashable - The lane the message is in
+    :param priority: SendPriority - How urgent the message is
+    :return: bool - Whether exact repeats of the message are suppressed
+    """
+    return priority == SendPriority.info and not is_control_lane(lane_key)
+
+
+class TokenBucket:
+    """
+    Allows up to capacity sends in any period seconds. Each spent token returns to the bucket exactly period seconds
+    after it was spent, so a full bucket can burst all of its tokens at once without ever going over the limit for a
+    sliding window.
+    """
+    def __init__(self, capacity, period):
+        """
+        :param capacity: int - How many sends are allowed in any window of period seconds
+        :param period: float - The length of the rate-limit window in seconds
+        """
+        self.capacity = capacity
+        self.period = period
+
+        # When each spent token returns to the bucket, oldest first
+        self.refill_times = deque()
+
+    def refill(self, now):
+        """
+        Returns every token whose period has elapsed to the bucket.
+        :param now: float - The current time
+        """
+        while self.refill_times and self.refill_times[0] <= now:
+            self.refill_times.popleft()
+
+    def next_available_time(self, now):
+        """
+        Gets the earliest time at which a token can be spent.
+        :param now: float - The current time
+        :return: float - now if a token is available already, otherwise when the next one returns
+        """
+        self.refill(now)
+        overdrawn = len(self.refill_times) - self.capacity
+        if overdrawn < 0:
+            return now
+        return self.refill_times[overdrawn]
+
+    def available(self, now):
+        """
+        Gets how many tokens can be spent right now.
+        :param now: float - The current time
+        :return: int - The number of tokens left in the bucket
+        """
+        self.refill(now)
+        return max(0, self.capacity - len(self.refill_times))
+
+    def consume(self, now):
+        """
+        Spends a token. Callers should check next_available_time first.
+        :param now: float - The current time
+        """
+        self.refill_times.append(now + self.period)
+
+
+class QueuedMessage:
+    """
+    A message waiting in a send lane. Coalesced messages are templates whose {} is filled with every name that asked
+    for the same message before it was sent.
+    """
+    __slots__ = ('msg_str', 'expire_time', 'ready_time', 'coalesce_key', 'names')
+
+    def __init__(self, msg_str, expire_time, ready_time=None, coalesce_key=None, name=None):
+        """
+        :param msg_str: str - The raw IRC message, or a template with a single {} if coalesce_key is given
+        :param expire_time: float - When the message goes stale and is dropped instead of sent
+        :param ready_time: float - The earliest the message may be sent, giving repeats time to coalesce into it
+        :param coalesce_key: hashable - Messages in the same lane with the same key are merged into one
+        :param name: str - The name this message was queued for, if coalescing
+        """
+        self.msg_str = msg_str
+        self.expire_time = expire_time
+        self.ready_time = ready_time
+        self.coalesce_key = coalesce_key
+        self.names = [name] if coalesce_key is not None else None
+
+    def render(self):
+        """
+        :return: str - The raw IRC message to send
+        """
+        if self.names is None:
+            return self.msg_str
+        return self.msg_str.format(list_to_string(self.names))
+
+
+class SendLane:
+    """
+    Messages that share the same rate limits, most urgent first and in the order they were queued within a priority.
+    """
+    def __init__(self, buckets):
+        """
+        :param buckets: list<TokenBucket> - Every bucket that needs a token for a message in this lane to be sent
+        """
+        self.buckets = buckets
+        # Heap of (priority, sequence, QueuedMessage)
+        self.messages = []
+        # Queued messages that later repeats get merged into, by coalesce key or by exact text
+        self.pending = {}
+
+    def next_ready_time(self, now):
+        """
+        Gets the earliest time at which the next message in this lane can be sent.
+        :param now: float - The current time
+        :return: float - The time at which every bucket has a token available and the message is done coalescing
+        """
+        ready_time = now
+        for bucket in self.buckets:
+            ready_time = max(ready_time, bucket.next_available_time(now))
+        if self.messages and self.messages[0][2].ready_time is not None:
+            ready_time = max(ready_time, self.messages[0][2].ready_time)
+        return ready_time
+
+    def pop(self):
+        """
+        Pops the most urgent message.
+        :return: tuple<SendPriority, QueuedMessage> - The message and its priority
+        """
+        priority, _, message = heapq.heappop(self.messages)
+        pending_key = message.msg_str if message.coalesce_key is None else message.coalesce_key
+        if self.pending.get(pending_key) is message:
+            del self.pending[pending_key]
+        return priority, message
+
+    def drop_stale(self, now):
+        """
+        Drops messages at the front of the lane that went past their deadline without being sent.
+        :param now: float - The current time
+        :return: int - How many messages were dropped
+        """
+        dropped = 0
+        while self.messages and self.messages[0][2].expire_time < now:
+            priority, message = self.pop()
+            log('Dropped stale {} message: {}'.format(priority.name, message.render()))
+            dropped += 1
+        return dropped
+
+
+class SendQueue:
+    """
+    Outbound messages waiting on rate limits. Callers put messages and return immediately; the owner of the
+    connection pops whatever the buckets allow and sends it. Repeats of a message that's still queued cost nothing.
+    """
+    def __init__(self, bucket_factory, deadlines=None, coalesce_window=0, duplicate_window=0, clock=default_clock):
+        """
+        :param bucket_factory: Function<hashable, list<TokenBucket>> - Gets the buckets for a lane the first time a
+                               message is queued in it
+        :param deadlines: dict<SendPriority, float> - How many seconds a message of each priority may wait before
+                          it's dropped instead of sent; missing priorities never expire
+        :param coalesce_window: float - How long a coalescing message waits for repeats before it can be sent
+        :param duplicate_window: float - How long after an info message is sent that the exact same one is suppressed
+        :param clock: Clock - Where the current time comes from when it isn't given
+        """
+        self.bucket_factory = bucket_factory
+        self.clock = clock
+        self.deadlines = deadlines if deadlines is not None else {}
+        self.coalesce_window = coalesce_window
+        self.duplicate_window = duplicate_window
+
+        # Only lanes with messages waiting in them
+        self.lanes = {}
+        # Keeps messages of the same priority in the order they were queued, even across lanes
+        self.sequence = itertools.count()
+        # When each recently sent message was sent, by (lane key, message), in the order they were sent
+        self.recently_sent = OrderedDict()
+        # How many messages went stale and were never sent
+        self.dropped = 0
+        # How many messages were merged into or suppressed by one that was already queued or recently sent
+        self.coalesced = 0
+
+    def __len__(self):
+        return sum(len(lane.messages) for lane in self.lanes.values())
+
+    def put(self, msg_str, lane_key=None, priority=SendPriority.result, now=None, coalesce_key=None,
+            coalesce_name=None):
+        """
+        Queues a message to be sent as soon as the rate limits of its lane allow. Exact repeats of an info message
+        that's still queued or was just sent are suppressed.
+        :param msg_str: str - The raw IRC message to be sent, or a template with a single {} if coalescing
+        :param lane_key: hashable - Which lane's rate limits apply to this message
+        :param priority: SendPriority - How urgent the message is
+        :param now: float - The current time, from the queue's clock if not given
+        :param coalesce_key: hashable - Messages queued in the same lane with the same key within the coalesce window
+                             are sent as one, with every coalesce_name filling the template
+        :param coalesce_name: str - The name to add to the template
+        """
+        if now is None:
+            now = self.clock.now()
+
+        lane = self.lanes.get(lane_key)
+        if lane is None:
+            lane = SendLane([] if is_control_lane(lane_key) else self.bucket_factory(lane_key))
+            self.lanes[lane_key] = lane
+
+        if coalesce_key is None:
+            if suppresses_duplicates(lane_key, priority):
+                sent_time = self.recently_sent.get((lane_key, msg_str))
+                if msg_str in lane.pending or (sent_time is not None and now - sent_time < self.duplicate_window):
+                    self.coalesced += 1
+                    return
+        else:
+            message = lane.pending.get(coalesce_key)
+            if message is not None:
+                # Keep the newest wording, such as an updated time remaining
+                message.msg_str = msg_str
+                if coalesce_name not in message.names:
+                    message.names.append(coalesce_name)
+                self.coalesced += 1
+                return
+
+        deadline = self.deadlines.get(priority)
+        expire_time = float('inf') if deadline is None else now + deadline
+        if coalesce_key is None:
+            message = QueuedMessage(msg_str, expire_time)
+            if suppresses_duplicates(lane_key, priority):
+                lane.pending[msg_str] = message
+        else:
+            message = QueuedMessage(msg_str, expire_time, now + self.coalesce_window, coalesce_key, coalesce_name)
+            lane.pending[coalesce_key] = message
+        heapq.heappush(lane.messages, (priority, next(self.sequence), message))
+
+    def update_lane(self, lane_key):
+        """
+        Gets fresh buckets for a lane whose rate limits changed. Lanes that are created later get them anyway.
+        :param lane_key: hashable - The lane whose rate limits changed
+        """
+        lane = self.lanes.get(lane_key)
+        if lane is not None and not is_control_lane(lane_key):
+            lane.buckets = self.bucket_factory(lane_key)
+
+    def drop_stale(self, now):
+        """
+        Drops stale messages from the front of every lane, forgets lanes that are left empty and forgets sent messages
+        that can no longer be duplicated.
+        :param now: float - The current time
+        """
+        for lane_key in list(self.lanes):
+            lane = self.lanes[lane_key]
+            self.dropped += lane.drop_stale(now)
+            if not lane.messages:
+                del self.lanes[lane_key]
+
+        # Suppressed duplicates are never re-sent within the window, so this is in the order they were sent
+        expired = []
+        for sent_key, sent_time in self.recently_sent.items():
+            if now - sent_time < self.duplicate_window:
+                break
+            expired.append(sent_key)
+        for sent_key in expired:
+            del self.recently_sent[sent_key]
+
+    def pop_ready(self, now=None):
+        """
+        Pops every message that can be sent right now, spending a token from each bucket of its lane. The most urgent
+        ready message always goes first.
+        :param now: float - The current time, from the queue's clock if not given
+        :return: list<tuple<hashable, str>> - The lane key and raw IRC message of each message to send, in order
+        """
+        if now is None:
+            now = self.clock.now()
+
+        self.drop_stale(now)
+
+        ready_msgs = []
+        while self.lanes:
+            ready_lane_key = None
+            ready_order = None
+            for lane_key, lane in self.lanes.items():
+                order = lane.messages[0][:2]
+                if (ready_order is None or order < ready_order) and lane.next_ready_time(now) <= now:
+                    ready_lane_key = lane_key
+                    ready_order = order
+
+            if ready_lane_key is None:
+                break
+
+            lane = self.lanes[ready_lane_key]
+            priority, message = lane.pop()
+            ready_msgs.append((ready_lane_key, message.render()))
+            for bucket in lane.buckets:
+                bucket.consume(now)
+            if (message.coalesce_key is None and suppresses_duplicates(ready_lane_key, priority) and
+                    self.duplicate_window > 0):
+                sent_key = (ready_lane_key, message.msg_str)
+                self.recently_sent[sent_key] = now
+                self.recently_sent.move_to_end(sent_key)
+
+            self.dropped += lane.drop_stale(now)
+            if not lane.messages:
+                del self.lanes[ready_lane_key]
+
+        return ready_msgs
+
+    def next_ready_time(self, now=None):
+        """
+        Gets the earliest time at which any queued message can be sent.
+        :param now: float - The current time, from the queue's clock if not given
+        :return: float - The time the next message can be sent, or None if nothing is queued
+        """
+        if now is None:
+            now = self.clock.now()
+
+        if not self.lanes:
+            return None
+        return min(lane.next_ready_time(now) for lane in self.lanes.values())
@@ -0,0 +1,662 @@
+from array import array
+from contextlib import contextmanager
+import json
+import mmap
+import os
+import sqlite3
+import struct
+import sys
+import threading
+import time
+
+import settings
+from utils.logger import log
+
+
+# Written next to a file and then moved over it, so a crash never leaves a half-written file behind
+TEMP_SUFFIX = '.tmp'
+# Seconds after which a temporary file must have been left by a crash, rather than being written by another process
+STALE_TEMP_AGE = 60
+# Added to a file that can't be read, so it's kept for inspection but never read again
+CORRUPT_SUFFIX = '.corrupt'
+RECORD_SUFFIX = '.txt'
+
+
+def write_atomically(path, text):
+    """
+    Replaces a file's contents all at once by writing a temporary file, waiting for it to reach the disk and then
+    moving it over the original. Readers and crashes see either the old file or the new one, never a mix.
+    :param path: str - The file to write
+    :param text: str - The new contents
+    """
+    temp_path = path + TEMP_SUFFIX
+    with open(temp_path, 'w') as temp_file:
+        temp_file.write(text)
+        temp_file.flush()
+        os.fsync(temp_file.fileno())
+    os.replace(temp_path, path)
+    sync_directory(path)
+
+
+def sync_directory(path):
+    """
+    Waits for a file that was just moved into place to stay there, even through a power loss.
+    :param path: str - The file that was moved
+    """
+    # The move itself is only durable once the directory is synced, which Windows can't do and doesn't need
+    if hasattr(os, 'O_DIRECTORY'):
+        directory_fd = os.open(os.path.dirname(path) or '.', os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(directory_fd)
+        finally:
+            os.close(directory_fd)
+
+
+class JSONDirectoryStore:
+    """
+    Keeps each record as its own pretty-printed JSON file in a directory, named after the record. Files are replaced
+    atomically, and files that can't be read are set aside instead of stopping the bot from starting.
+    """
+    def __init__(self, path):
+        """
+        :param path: str - The directory the files are kept in
+        """
+        self.path = path
+
+    def file_path(self, name):
+        """
+        :param name: str - The name of the record
+        :return: str - The file the record is kept in
+        """
+        return os.path.join(self.path, name + RECORD_SUFFIX)
+
+    def load_all(self):
+        """
+        Reads every record, skipping any that can't be read.
+        :return: generator<dict> - The data of each record
+        """
+        for name in self.names():
+            data = self.load(name)
+            if data is not None:
+                yield data
+
+    def names(self):
+        """
+        Lists the records without reading them. Temporary files old enough to have been left by a write that crashed
+        are removed.
+        :return: list<str> - The name of every record
+        """
+        if not os.path.exists(self.path):
+            os.makedirs(self.path)
+
+        names = []
+        for filename in os.listdir(self.path):
+            if filename.endswith(TEMP_SUFFIX):
+                self.remove_stale_temp_file(os.path.join(self.path, filename))
+            elif filename.endswith(RECORD_SUFFIX):
+                names.append(filename[:-len(RECORD_SUFFIX)])
+        return names
+
+    @staticmethod
+    def remove_stale_temp_file(temp_path):
+        """
+        Removes a temporary file unless another process may still be writing it.
+        :param temp_path: str - The temporary file
+        """
+        try:
+            if time.time() - os.path.getmtime(temp_path) > STALE_TEMP_AGE:
+                os.remove(temp_path)
+        except FileNotFoundError:
+            # Its write finished and moved it into place
+            pass
+
+    def load(self, name):
+        """
+        Reads a single record. A record that can't be read is quarantined and treated as missing.
+        :param name: str - The name of the record
+        :return: dict - The record's data, or None if there's no such record
+        """
+        file_path = self.file_path(name)
+        try:
+            with open(file_path) as read_file:
+                data = json.load(read_file)
+            if not isinstance(data, dict):
+                raise ValueError('Expected an object, got {}'.format(type(data).__name__))
+            return data
+        except FileNotFoundError:
+            return None
+        except ValueError as e:
+            os.replace(file_path, file_path + CORRUPT_SUFFIX)
+            log('Quarantined unreadable {} as {}: {}'.format(file_path, file_path + CORRUPT_SUFFIX, e))
+            return None
+
+    def save(self, name, data):
+        """
+        Writes a single record, replacing what was there all at once.
+        :param name: str - The name of the record
+        :param data: dict - The data to write
+        """
+        write_atomically(self.file_path(name), json.dumps(data, indent=4, sort_keys=True))
+
+    @contextmanager
+    def batch(self):
+        """
+        Groups several saves together. Every file is written on its own, so this does nothing.
+        """
+        yield
+
+    def close(self):
+        """
+        Nothing stays open between reads and writes, so this does nothing.
+        """
+        pass
+
+
+class SQLiteStore:
+    """
+    Keeps every record as a row of JSON in one table of a SQLite database, in write-ahead logging mode so reads never
+    wait on writes. Saves made inside a batch are committed together in one transaction.
+    """
+    def __init__(self, database_path, table):
+        """
+        :param database_path: str - The database file, shared by every table
+        :param table: str - The table the records are kept in
+        """
+        self.database_path = database_path
+        self.table = table
+
+        # Opened the first time it's used. The player state process uses it from several threads
+        self.connection = None
+        self.lock = threading.RLock()
+        # How many batches are open; saves are only committed once the outermost one closes
+        self.batch_depth = 0
+
+    def connect(self):
+        """
+        Opens the database the first time it's needed and makes sure the table exists.
+        :return: sqlite3.Connection - The open database
+        """
+        if self.connection is None:
+            directory = os.path.dirname(self.database_path)
+            if directory and not os.path.exists(directory):
+                os.makedirs(directory)
+
+            self.connection = sqlite3.connect(self.database_path, check_same_thread=False)
+            self.connection.execute('PRAGMA journal_mode=WAL')
+            # Safe against crashes of the bot in WAL mode, only a power loss can lose the last commits
+            self.connection.execute('PRAGMA synchronous=NORMAL')
+            self.connection.execute(
+                'CREATE TABLE IF NOT EXISTS {} (name TEXT PRIMARY KEY, data TEXT NOT NULL)'.format(self.table))
+            self.connection.commit()
+        return self.connection
+
+    def load_all(self):
+        """
+        Reads every record.
+        :return: list<dict> - The data of each record
+        """
+        with self.lock:
+            rows = self.connect().execute('SELECT data FROM {}'.format(self.table)).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def names(self):
+        """
+        Lists the records without reading them.
+        :return: list<str> - The name of every record
+        """
+        with self.lock:
+            rows = self.connect().execute('SELECT name FROM {}'.format(self.table)).fetchall()
+        return [row[0] for row in rows]
+
+    def load(self, name):
+        """
+        Reads a single record.
+        :param name: str - The name of the record
+        :return: dict - The record's data, or None if there's no such record
+        """
+        with self.lock:
+            row = self.connect().execute(
+                'SELECT data FROM {} WHERE name = ?'.format(self.table), (name,)).fetchone()
+        return None if row is None else json.loads(row[0])
+
+    def save(self, name, data):
+        """
+        Writes a single record, replacing what was there. Committed right away unless inside a batch.
+        :param name: str - The name of the record
+        :param data: dict - The data to write
+        """
+        with self.batch():
+            self.connect().execute('INSERT OR REPLACE INTO {} (name, data) VALUES (?, ?)'.format(self.table),
+                                   (name, json.dumps(data, sort_keys=True)))
+
+    @contextmanager
+    def batch(self):
+        """
+        Commits every save made inside it in one transaction, or none of them if it raises.
+        """
+        with self.lock:
+            connection = self.connect()
+            self.batch_depth += 1
+            try:
+                yield
+            except BaseException:
+                if self.batch_depth == 1:
+                    connection.rollback()
+                raise
+            else:
+                if self.batch_depth == 1:
+                    connection.commit()
+            finally:
+                self.batch_depth -= 1
+
+    def close(self):
+        """
+        Closes the database. It's opened again the next time it's used.
+        """
+        with self.lock:
+            if self.connection is not None:
+                self.connection.close()
+                self.connection = None
+
+    def is_empty(self):
+        """
+        :return: bool - True if the table has no records
+        """
+        with self.lock:
+            return self.connect().execute('SELECT 1 FROM {} LIMIT 1'.format(self.table)).fetchone() is None
+
+
+# Binary snapshot layout, all little-endian:
+#   header: magic, record count, string table offset, string table length, index offset
+#   records: one encoded value per record, back to back
+#   string table: every key, string value and record name, UTF-8 and separated by NUL
+#   index: the string ID of each record's name (uint32), then where each record starts plus where the last ends (uint64)
+SNAPSHOT_MAGIC = b'XBS1'
+SNAPSHOT_HEADER = struct.Struct('<4sIQQQ')
+SNAPSHOT_SUFFIX = '.snapshot'
+UINT32 = struct.Struct('<I')
+INT64 = struct.Struct('<q')
+FLOAT64 = struct.Struct('<d')
+
+
+def encode_value(value, intern, out):
+    """
+    Packs a JSON-like value. Strings are written as IDs into the string table, so names of items and keys shared by
+    many records are only stored once.
+    :param value: None, bool, int, float, str, list or dict with str keys - The value to pack
+    :param intern: Function<str, int> - Gets the ID of a string in the string table
+    :param out: bytearray - Where the packed value is added
+    """
+    if value is None:
+        out += b'n'
+    elif value is True:
+        out += b't'
+    elif value is False:
+        out += b'f'
+    elif isinstance(value, int):
+        out += b'i' + INT64.pack(value)
+    elif isinstance(value, float):
+        out += b'd' + FLOAT64.pack(value)
+    elif isinstance(value, str):
+        out += b's' + UINT32.pack(intern(value))
+    elif isinstance(value, dict):
+        out += b'm' + UINT32.pack(len(value))
+        for key, item in value.items():
+            out += UINT32.pack(intern(key))
+            encode_value(item, intern, out)
+    elif isinstance(value, (list, tuple)):
+        out += b'l' + UINT32.pack(len(value))
+        for item in value:
+            encode_value(item, intern, out)
+    else:
+        raise TypeError('Can\'t store values of type {}'.format(type(value).__name__))
+
+
+def decode_value(buffer, position, strings):
+    """
+    Unpacks a value packed by encode_value.
+    :param buffer: bytes or mmap.mmap - What the value was packed into
+    :param position: int - Where the value starts
+    :param strings: list<str> - The string table
+    :return: tuple<object, int> - The value and where the next value starts
+    """
+    tag = buffer[position:position + 1]
+    position += 1
+    if tag == b'n':
+        return None, position
+    if tag == b't':
+        return True, position
+    if tag == b'f':
+        return False, position
+    if tag == b'i':
+        return INT64.unpack_from(buffer, position)[0], position + INT64.size
+    if tag == b'd':
+        return FLOAT64.unpack_from(buffer, position)[0], position + FLOAT64.size
+    if tag == b's':
+        return strings[UINT32.unpack_from(buffer, position)[0]], position + UINT32.size
+    if tag == b'm':
+        count = UINT32.unpack_from(buffer, position)[0]
+        position += UINT32.size
+        value = {}
+        for _ in range(count):
+            key = strings[UINT32.unpack_from(buffer, position)[0]]
+            value[key], position = decode_value(buffer, position + UINT32.size, strings)
+        return value, position
+    if tag == b'l':
+        count = UINT32.unpack_from(buffer, position)[0]
+        position += UINT32.size
+        value = []
+        for _ in range(count):
+            item, position = decode_value(buffer, position, strings)
+            value.append(item)
+        return value, position
+
+    raise ValueError('Unknown value tag {!r} at byte {}'.format(tag, position - 1))
+
+
+def read_array(typecode, buffer, start, count):
+    """
+    Reads a run of little-endian numbers straight into an array.
+    :param typecode: str - The array typecode, I for uint32 or Q for uint64
+    :param buffer: mmap.mmap - Where the numbers are
+    :param start: int - Where the first number starts
+    :param count: int - How many numbers there are
+    :return: array - The numbers
+    """
+    numbers = array(typecode)
+    numbers.frombytes(buffer[start:start + count * numbers.itemsize])
+    if sys.byteorder == 'big':
+        numbers.byteswap()
+    return numbers
+
+
+def array_bytes(numbers):
+    """
+    :param numbers: array - Numbers to write
+    :return: bytes - The numbers as little-endian bytes
+    """
+    if sys.byteorder == 'big':
+        numbers = array(numbers.typecode, numbers)
+        numbers.byteswap()
+    return numbers.tobytes()
+
+
+class SnapshotStore:
+    """
+    Keeps every record in one compact binary file that's memory-mapped instead of read. Opening it only reads the
+    string table and the index; each record is decoded the first time it's loaded. Saves are held until the end of
+    their batch, which rewrites the file once, copying the bytes of every unchanged record as they are. Only one
+    process may use a snapshot, since each keeps its own copy mapped.
+    """
+    def __init__(self, path):
+        """
+        :param path: str - The snapshot file
+        """
+        self.path = path
+
+        # The player state process uses it from several threads
+        self.lock = threading.RLock()
+        # How many batches are open; the file is only rewritten once the outermost one closes
+        self.batch_depth = 0
+        # Records saved in the current batch, by name
+        self.updates = {}
+
+        # All None until the snapshot is opened the first time it's used
+        self.file = None
+        self.map = None
+        # list<str> - The string table, indexed by string ID
+        self.strings = None
+        # dict<str, int> - The position of each record in the index, by name, in the order they're stored
+        self.positions = None
+        # array<int> - Where each record starts, plus where the last one ends
+        self.offsets = None
+
+    def open(self):
+        """
+        Maps the snapshot the first time it's needed and reads its string table and index. A snapshot that can't be
+        read is quarantined and the store starts empty.
+        """
+        if self.strings is not None:
+            return
+
+        self.strings = []
+        self.positions = {}
+        self.offsets = array('Q', [SNAPSHOT_HEADER.size])
+        if not os.path.exists(self.path) or os.path.getsize(self.path) == 0:
+            return
+
+        try:
+            self.file = open(self.path, 'rb')
+            self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, record_count, strings_offset, strings_length, index_offset = SNAPSHOT_HEADER.unpack_from(self.map)
+            if magic != SNAPSHOT_MAGIC:
+                raise ValueError('Not a snapshot file')
+
+            strings = self.map[strings_offset:strings_offset + strings_length].decode('UTF-8')
+            strings = strings.split('\0') if strings else []
+            name_ids = read_array('I', self.map, index_offset, record_count)
+            offsets = read_array('Q', self.map, index_offset + record_count * name_ids.itemsize, record_count + 1)
+            if len(offsets) != record_count + 1 or offsets[-1] > strings_offset:
+                raise ValueError('Index is cut short')
+
+            self.strings = strings
+            self.positions = {strings[name_id]: position for position, name_id in enumerate(name_ids)}
+            self.offsets = offsets
+        except (ValueError, IndexError, struct.error) as e:
+            self.close()
+            os.replace(self.path, self.path + CORRUPT_SUFFIX)
+            log('Quarantined unreadable {} as {}: {}'.format(self.path, self.path + CORRUPT_SUFFIX, e))
+            self.open()
+
+    def close(self):
+        """
+        Unmaps the snapshot. It's opened again the next time it's used.
+        """
+        if self.map is not None:
+            self.map.close()
+            self.map = None
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+        self.strings = None
+        self.positions = None
+        self.offsets = None
+
+    def names(self):
+        """
+        Lists the records without decoding them.
+        :return: list<str> - The name of every record
+        """
+        with self.lock:
+            self.open()
+            return list(self.positions) + [name for name in self.updates if name not in self.positions]
+
+    def load(self, name):
+        """
+        Decodes a single record.
+        :param name: str - The name of the record
+        :return: dict - The record's data, or None if there's no such record
+        """
+        with self.lock:
+            if name in self.updates:
+                return self.updates[name]
+
+            self.open()
+            position = self.positions.get(name)
+            if position is None:
+                return None
+            return decode_value(self.map, self.offsets[position], self.strings)[0]
+
+    def load_all(self):
+        """
+        Decodes every record.
+        :return: list<dict> - The data of each record
+        """
+        with self.lock:
+            return [self.load(name) for name in self.names()]
+
+    def save(self, name, data):
+        """
+        Saves a single record, replacing what was there. Written right away unless inside a batch.
+        :param name: str - The name of the record
+        :param data: dict - The data to write
+        """
+        with self.batch():
+            self.updates[name] = data
+
+    def is_empty(self):
+        """
+        :return: bool - True if there are no records
+        """
+        with self.lock:
+            self.open()
+            return not self.positions and not self.updates
+
+    @contextmanager
+    def batch(self):
+        """
+        Writes every save made inside it with one rewrite of the snapshot, or none of them if it raises.
+        """
+        with self.lock:
+            self.batch_depth += 1
+            try:
+                yield
+                if self.batch_depth == 1 and self.updates:
+                    self.write()
+            finally:
+                self.batch_depth -= 1
+                # Whether they were written or not, saves never outlive their outermost batch
+                if self.batch_depth == 0:
+                    self.updates = {}
+
+    def write(self):
+        """
+        Writes a new snapshot with the saved records next to the old one, then moves it into place.
+        """
+        self.open()
+        # Existing string IDs stay the same, so unchanged records can be copied without decoding them
+        strings = list(self.strings)
+        string_ids = {string: string_id for string_id, string in enumerate(strings)}
+
+        def intern(string):
+            string_id = string_ids.get(string)
+            if string_id is None:
+                if '\0' in string:
+                    raise ValueError('Can\'t store strings containing NUL')
+                string_id = string_ids[string] = len(strings)
+                strings.append(string)
+            return string_id
+
+        names = list(self.positions) + [name for name in self.updates if name not in self.positions]
+        name_ids = array('I')
+        offsets = array('Q')
+        temp_path = self.path + TEMP_SUFFIX
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+
+        with open(temp_path, 'wb') as temp_file:
+            temp_file.write(bytes(SNAPSHOT_HEADER.size))
+            end = SNAPSHOT_HEADER.size
+            for name in names:
+                if name in self.updates:
+                    record = bytearray()
+                    encode_value(self.updates[name], intern, record)
+                else:
+                    position = self.positions[name]
+                    record = self.map[self.offsets[position]:self.offsets[position + 1]]
+                name_ids.append(intern(name))
+                offsets.append(end)
+                temp_file.write(record)
+                end += len(record)
+            offsets.append(end)
+
+            strings_data = '\0'.join(strings).encode('UTF-8')
+            temp_file.write(strings_data)
+            temp_file.write(array_bytes(name_ids))
+            temp_file.write(array_bytes(offsets))
+
+            temp_file.seek(0)
+            temp_file.write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, len(names), end, len(strings_data),
+                                                 end + len(strings_data)))
+            temp_file.flush()
+            os.fsync(temp_file.fileno())
+
+        # Windows can't replace a file that's still mapped
+        self.close()
+        os.replace(temp_path, self.path)
+        sync_directory(self.path)
+
+
+def migrate_json_directory(json_store, store):
+    """
+    Copies every record of a JSON directory into an empty store in one batch, then renames the directory so it's
+    never migrated again.
+    :param json_store: JSONDirectoryStore - The directory written by older versions
+    :param store: SQLiteStore or SnapshotStore - The store to fill
+    """
+    if not os.path.isdir(json_store.path) or not store.is_empty():
+        return
+
+    log('Migrating {} to {}...'.format(json_store.path, settings.STORAGE_BACKEND))
+    count = 0
+    with store.batch():
+        for name in json_store.names():
+            data = json_store.load(name)
+            if data is None:
+                continue
+            # Very old records may not have a name; they're left behind in the migrated directory
+            if not data.get('name'):
+                log('Skipped {}, which has no name.'.format(json_store.file_path(name)))
+                continue
+            store.save(name.lower(), data)
+            count += 1
+    os.rename(json_store.path, json_store.path + settings.MIGRATED_SUFFIX)
+    log('Migrated {} records from {}.'.format(count, json_store.path))
+
+
+def create_backend_store(table):
+    """
+    Creates the store for one kind of record using the STORAGE_BACKEND setting, unless records are kept as JSON.
+    :param table: str - The SQLite table or snapshot file name for the records
+    :return: SQLiteStore or SnapshotStore - The store, or None if STORAGE_BACKEND is json
+    """
+    if settings.STORAGE_BACKEND == 'json':
+        return None
+    if settings.STORAGE_BACKEND == 'sqlite':
+        return SQLiteStore(settings.DATABASE_PATH, table)
+    if settings.STORAGE_BACKEND == 'snapshot':
+        return SnapshotStore(os.path.join(settings.DATA_FOLDER, table + SNAPSHOT_SUFFIX))
+
+    raise ValueError('Unknown STORAGE_BACKEND {}, use json, sqlite or snapshot.'.format(settings.STORAGE_BACKEND))
+
+
+def create_store(table, json_path):
+    """
+    Creates the store for one kind of record using the STORAGE_BACKEND setting. Switching away from JSON migrates
+    the existing JSON directory the first time.
+    :param table: str - The SQLite table or snapshot file name for the records
+    :param json_path: str - The directory for the records when kept as JSON files
+    :return: JSONDirectoryStore, SQLiteStore or SnapshotStore - The store
+    """
+    json_store = JSONDirectoryStore(json_path)
+    store = create_backend_store(table)
+    if store is None:
+        return json_store
+
+    migrate_json_directory(json_store, store)
+    return store
+
+
+def migrate_stores():
+    """
+    Migrates the JSON directories of players and channels up front. Run before starting processes that share
+    storage, so they never race each other to migrate.
+    """
+    for table, json_path in [('players', settings.PLAYER_DATA_PATH), ('channels', settings.CHANNEL_DATA_PATH)]:
+        store = create_backend_store(table)
+        if store is None:
+            return
+
+        migrate_json_directory(JSONDirectoryStore(json_path), store)
+        store.close()
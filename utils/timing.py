@@ -1,20 +1,58 @@
-import time
+import heapq
+import itertools
+
+from utils.clock import default_clock
 
 
 class Timer:
     """
-    A timer that can be canceled.
+    A timer that can be canceled. Active timers are kept in a heap ordered by when they end, so checking them only
+    looks at the timers that are done.
     """
-    active_timers = []
+    # Every timer shares one clock, which can be swapped for a FakeClock in tests and benchmarks
+    clock = default_clock
+    # Heap of [end_time, sequence, timer]. Canceled and reset timers leave their old entry behind, which is skipped
+    # when it's popped
+    heap = []
+    # Keeps timers that end at the same time in the order they were started
+    sequence = itertools.count()
+    # How many entries in the heap belong to no timer anymore
+    stale_entries = 0
 
     def __init__(self, duration, callback):
         self.callback = callback
 
         # When we're done we set this
-        self.start_time = time.time()
-        self.duration = duration
+        self.start_time = Timer.clock.now()
+        # Heap entries are compared by end time, so it has to be a real number
+        self.duration = float(duration)
+
+        # This timer's live entry in the heap, or None if it's done or canceled
+        self.entry = None
+        self.schedule()
 
-        Timer.active_timers.append(self)
+    def schedule(self):
+        """
+        Adds the timer to the heap at its current end time, replacing any entry it already had.
+        """
+        self.unschedule()
+        self.entry = [self.start_time + self.duration, next(Timer.sequence), self]
+        heapq.heappush(Timer.heap, self.entry)
+
+    def unschedule(self):
+        """
+        Abandons the timer's entry in the heap without searching for it. The heap is rebuilt once most of it is
+        abandoned entries.
+        """
+        if self.entry is None:
+            return
+
+        self.entry = None
+        Timer.stale_entries += 1
+        if Timer.stale_entries > len(Timer.heap) // 2:
+            Timer.heap = [entry for entry in Timer.heap if entry[2].entry is entry]
+            heapq.heapify(Timer.heap)
+            Timer.stale_entries = 0
 
     def is_complete(self):
         """
@@ -22,7 +60,7 @@ class Timer:
         :return: Function - The Function callback specified at creation if the timer has finished, or
                             None if the timer has not yet completed
         """
-        if self.start_time + self.duration < time.time():
+        if self.start_time + self.duration <= Timer.clock.now():
             return self.callback
 
         return None
@@ -30,40 +68,55 @@ class Timer:
     @staticmethod
     def check_timers():
         """
-        Check to see if any timers completed and activate their callbacks and remove ones that are completed.
-        Then, run all timer callbacks that have completed successfully.
+        Pop every timer that completed, then run their callbacks in the order the timers ended. A callback that
+        cancels or resets another completed timer stops that timer's callback from running.
         """
-        callbacks = []
-        remaining_timers = []
-        for timer in Timer.active_timers:
-            callback = timer.is_complete()
-            if callback:
-                callbacks.append(callback)
+        now = Timer.clock.now()
+        completed = []
+        while Timer.heap and Timer.heap[0][0] <= now:
+            entry = heapq.heappop(Timer.heap)
+            if entry[2].entry is entry:
+                completed.append(entry)
             else:
-                remaining_timers.append(timer)
-        Timer.active_timers = remaining_timers
+                Timer.stale_entries -= 1
+
+        for entry in completed:
+            timer = entry[2]
+            if timer.entry is entry:
+                timer.entry = None
+                timer.callback()
+
+    @staticmethod
+    def next_deadline():
+        """
+        Gets when the next timer completes, discarding canceled entries at the front of the heap.
+        :return: float - The time the next timer completes, or None if no timer is active
+        """
+        while Timer.heap and Timer.heap[0][2].entry is not Timer.heap[0]:
+            heapq.heappop(Timer.heap)
+            Timer.stale_entries -= 1
 
-        for callback in callbacks:
-            callback()
+        return Timer.heap[0][0] if Timer.heap else None
 
     def cancel(self):
         """
         Cancel the timer.
         """
-        if self in Timer.active_timers:
-            Timer.active_timers.remove(self)
+        self.unschedule()
 
     def remaining(self):
         """
         Get the remaining timer time.
         :return: int - The remaining time in seconds
         """
-        return int(self.start_time + self.duration - time.time())
+        return int(self.start_time + self.duration - Timer.clock.now())
 
     def set(self, duration):
         """
-        Resets the timer with a new duration.
+        Resets the timer with a new duration. Timers that are done or canceled stay that way.
         :param duration: float - How much time to set the timer to
         """
-        self.start_time = time.time()
-        self.duration = duration
+        self.start_time = Timer.clock.now()
+        self.duration = float(duration)
+        if self.entry is not None:
+            self.schedule()
@@ -1,10 +1,11 @@
 import os
 import time
 
+from quest_bot.async_quest_bot import AsyncQuestBot
 from quest_bot.quest_bot import QuestBot
 import settings
 from utils.auto_update import try_update
-from utils.cmd import pause
+from utils.cmd import exit_on_terminate, pause
 from utils.logger import log, log_error
 
 
@@ -14,7 +15,8 @@ def run_bot():
     """
     try:
         # Create the bot
-        bot = QuestBot(settings.BOT_NAME, settings.BROADCASTER_NAME, settings.BOT_OAUTH)
+        bot_type = AsyncQuestBot if settings.USE_ASYNCIO else QuestBot
+        bot = bot_type(settings.BOT_NAME, settings.BROADCASTER_NAME, settings.BOT_OAUTH)
         bot.connect()
         bot.run()
     except Exception as e2:
@@ -38,6 +40,7 @@ def clear_temp_files():
 
 
 if __name__ == '__main__':
+    exit_on_terminate()
     clear_temp_files()
     try:
         try_update()